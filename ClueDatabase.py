@@ -1,20 +1,152 @@
+import os
 import re
 import csv
+import queue
+import hashlib
 import random
+import sqlite3
+import threading
+from contextlib import contextmanager
+from WordTrie import WordTrie
 
 
 class WordList():
-    def __init__(self):
+    def __init__(self, filename="WordList.txt", backend="list", compact=True, min_score=None, cache=None):
         """Reads in words from WordList.txt and stores them in a list. Assumes that all 
         words in the file are alphabetized, separated by newlines, and are all capitalized
-        and that all words are unique."""
+        and that all words are unique. Lines may also be scored as WORD;SCORE, in which case
+        only words scoring at least min_score are used.
+        backend is 'list' to answer prefix and suffix queries by scanning the list or 'trie'
+        to answer them from a pair of WordTrie objects (compact selects array backed nodes).
+        cache is an optional PatternCache memoizing pattern and count queries."""
+
+        if backend not in ("list", "trie"):
+            raise ValueError("Backend must be 'list' or 'trie'.")
 
         words = []
 
-        with open ("wordlist.txt", "r") as file:
+        with open (filename, "r") as file:
             words = file.read().splitlines()
 
+        #Scored word lists as written by WordImport
+        self.scores = None
+        if words and ';' in words[0]:
+            self.scores = {}
+            for line in words:
+                word, _, score = line.rpartition(';')
+                self.scores[word] = int(score)
+            words = list(self.scores)
+
+        self.filename = filename
+        self.all_words = words
+        self.min_score = None
+        self.fingerprint = None #Hash of the words, computed by cache_token() when first needed
         self.words = words
+        self.backend = backend
+        self.compact = compact
+        self.cache = cache
+
+        #Prefix and suffix tries, built on first use by the trie backend
+        self.prefix_trie = None
+        self.suffix_trie = None
+
+        #Per length letter bitmasks for pattern lookups and fill checks, see letter_masks()
+        self.length_masks = {}
+
+        if min_score is not None:
+            self.set_score_cutoff(min_score)
+
+    def cache_token(self):
+        """Identifies the current word list contents in PatternCache keys: a hash of the words
+        and the score cutoff, so equal word lists share entries and changed ones never do."""
+        if self.fingerprint is None:
+            data = "\n".join(self.words).encode("utf-8")
+            self.fingerprint = hashlib.blake2b(data, digest_size=16).hexdigest()
+        return (self.fingerprint, self.min_score)
+
+    def set_words(self, words):
+        """Replaces the word list, dropping indexes built from the old words and their locally
+        cached queries."""
+        if self.cache is not None:
+            self.cache.invalidate(self.cache_token())
+
+        self.words = words
+        self.fingerprint = None
+        self.prefix_trie = None
+        self.suffix_trie = None
+        self.length_masks = {}
+
+    def set_score_cutoff(self, min_score):
+        """Uses only the words scoring at least min_score (all words if min_score is None).
+        Requires a scored word list."""
+        if self.scores is None and min_score is not None:
+            raise ValueError("Word list has no scores.")
+
+        words = self.all_words
+        if min_score is not None:
+            words = [word for word in self.all_words if self.scores[word] >= min_score]
+        self.set_words(words)
+        self.min_score = min_score
+
+    def letter_masks(self, length):
+        """Returns (words, masks) for the words of the given length. words is a sorted tuple and
+        masks[position][letter] is an int whose bit i is set if words[i] has the letter
+        (0 for 'A' to 25 for 'Z') at that position. Built on first use for each length."""
+        if length in self.length_masks:
+            return self.length_masks[length]
+
+        words = tuple(sorted(word for word in self.words if len(word) == length))
+        bits = [[bytearray((len(words) + 7) // 8) for _ in range(26)] for _ in range(length)]
+        for i, word in enumerate(words):
+            byte, bit = i >> 3, 1 << (i & 7)
+            for position, letter in enumerate(word):
+                letter_index = ord(letter) - 65
+                if 0 <= letter_index < 26:
+                    bits[position][letter_index][byte] |= bit
+
+        masks = [[int.from_bytes(letter_bits, "little") for letter_bits in position_bits] for position_bits in bits]
+        self.length_masks[length] = (words, masks)
+        return words, masks
+
+    def pattern_domain(self, pattern):
+        """Returns (words, domain) for a fixed length pattern where '?' (or ' ') stands for any
+        single letter: words is the sorted tuple of words of the pattern's length and bit i of
+        domain is set if words[i] matches. One big integer AND per letter of the pattern."""
+        words, masks = self.letter_masks(len(pattern))
+        domain = (1 << len(words)) - 1
+        for position, letter in enumerate(pattern):
+            if letter in '? ':
+                continue
+            letter_index = ord(letter) - 65
+            if not 0 <= letter_index < 26:
+                return words, 0
+            domain &= masks[position][letter_index]
+            if not domain:
+                break
+        return words, domain
+
+    def pattern_words(self, pattern):
+        """Returns the words matching a fixed length pattern (see pattern_domain()) in sorted order."""
+        words, domain = self.pattern_domain(pattern)
+        if domain == (1 << len(words)) - 1:
+            return list(words)
+
+        matches = []
+        for byte_index, byte in enumerate(domain.to_bytes((len(words) + 7) // 8, "little")):
+            while byte:
+                low = byte & -byte
+                matches.append(words[byte_index * 8 + low.bit_length() - 1])
+                byte ^= low
+        return matches
+
+    def get_candidates(self, pattern):
+        """Returns the set of words matching a fixed length pattern where '?' (or ' ') stands
+        for any single letter. Uses the letter bitmasks instead of scanning the whole list."""
+        return set(self.pattern_words(pattern))
+
+    def has_match(self, pattern):
+        """Returns True if at least one word matches the fixed length pattern, False otherwise."""
+        return self.pattern_domain(pattern)[1] != 0
 
     def get_words_of_length(self, length):
         """Returns a list of words of a given length."""
@@ -22,13 +154,23 @@ class WordList():
     
     def get_words_starting_with(self, prefix):
         """Returns a list of words starting with a given prefix."""
+        if self.backend == "trie":
+            if self.prefix_trie is None:
+                self.prefix_trie = WordTrie(self.words, compact=self.compact)
+            return self.prefix_trie.query(prefix)
+
         prefix_length = len(prefix)
         return [word for word in self.words if word[:prefix_length] == prefix]
     
     def get_words_ending_with(self, suffix):
-        """Returns a list of words ending with a given suffix."""
-        suffix_length = len(suffix)
-        return [word for word in self.words if word[-suffix_length:] == suffix]
+        """Returns a list of words ending with a given suffix, alphabetical with either backend."""
+        if self.backend == "trie":
+            if self.suffix_trie is None:
+                self.suffix_trie = WordTrie(self.words, reverse=True, compact=self.compact)
+            #The suffix trie orders words by their reversed spelling
+            return sorted(self.suffix_trie.query(suffix))
+
+        return [word for word in self.words if word.endswith(suffix)]
     
     def get_words_containing(self, substring):
         """Returns a list of words containing a given substring."""
@@ -37,6 +179,29 @@ class WordList():
     def get_words_matching_pattern(self, pattern):
         """Returns a list of words matching a given pattern.
         The pattern can contain '?' for any character and '*' for zero or more characters."""
+        if self.cache is not None:
+            key = (self.cache_token(), "match", pattern)
+            return list(self.cache.get_or_compute(key, lambda: tuple(self.match_pattern(pattern))))
+        return self.match_pattern(pattern)
+
+    def count_words_matching_pattern(self, pattern):
+        """Returns the number of words matching a given pattern (see get_words_matching_pattern)."""
+        if self.cache is not None:
+            key = (self.cache_token(), "count", pattern)
+            return self.cache.get_or_compute(key, lambda: self.count_pattern(pattern))
+        return self.count_pattern(pattern)
+
+    def count_pattern(self, pattern):
+        """Counts the words matching a pattern without the cache."""
+        if '*' not in pattern:
+            return self.pattern_domain(pattern)[1].bit_count()
+        return len(self.match_pattern(pattern))
+
+    def match_pattern(self, pattern):
+        """Returns the words matching a pattern without the cache."""
+        if '*' not in pattern:
+            return self.pattern_words(pattern)
+
         # Convert the pattern to a regex pattern
         regex_pattern = pattern.replace('?', '.').replace('*', '.*')
         return [word for word in self.words if re.fullmatch(regex_pattern, word)]
@@ -55,14 +220,15 @@ class WordList():
     
 
 class ClueDict():
-    def __init__(self):
+    def __init__(self, filename="ClueDict.csv"):
         """Reads in words and clues from ClueDict.csv and stores them in a dictionary. Assumes 
         that the CSV file contains two columns: the first column is the word in all caps
         and the second column is the clue."""
 
+        self.filename = filename
         self.clue_dict = {}
 
-        with open("ClueDict.csv", "r") as file:
+        with open(filename, "r") as file:
             reader = csv.reader(file)
             for row in reader:
                 word, clue = row
@@ -80,7 +246,148 @@ class ClueDict():
         if clues:
             return random.choice(clues)
         return None
-    
 
-    
+    def items(self):
+        """Yields every (word, clue) pair."""
+        for word, clues in self.clue_dict.items():
+            for clue in clues:
+                yield word, clue
+
+
+class SQLiteClueDict():
+    """Clue database stored in SQLite instead of memory. Has the same lookup interface as
+    ClueDict so many processes can share one clue store without each loading ClueDict.csv.
+    Connections are pooled: each thread borrows its own connection while it runs a query and
+    the pool is recreated after a fork, since SQLite connections can not cross processes.
+    Every connection to ':memory:' (or '') is a separate database, so those are rejected."""
 
+    #Number of answers looked up per query by get_clues_for_words(). Every batch uses the same
+    #statement so SQLite can reuse the prepared statement.
+    BATCH_SIZE = 256
+
+    def __init__(self, database="ClueDict.db", pool_size=4):
+        if database in (":memory:", ""):
+            raise ValueError("SQLiteClueDict needs a database file, every connection to an in-memory database is a new database.")
+        self.database = database
+        self.pool_size = pool_size
+        self.pool_lock = threading.Lock()
+        self.pid = None
+        self.pool = None
+
+        with self.connection() as connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS clues "
+                               "(id INTEGER PRIMARY KEY, answer TEXT NOT NULL, clue TEXT NOT NULL)")
+            connection.execute("CREATE INDEX IF NOT EXISTS clues_answer ON clues (answer)")
+            connection.commit()
+
+    def connect(self):
+        """Opens a new connection to the database."""
+        connection = sqlite3.connect(self.database, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL") #Readers do not block each other or the writer
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    @contextmanager
+    def connection(self):
+        """Borrows a connection from the pool for the duration of a with block."""
+        with self.pool_lock:
+            if self.pid != os.getpid():
+                #Connections inherited from a parent process must not be used
+                self.pid = os.getpid()
+                self.pool = queue.LifoQueue()
+
+            pool = self.pool
+
+        try:
+            connection = pool.get_nowait()
+        except queue.Empty:
+            connection = self.connect()
+
+        try:
+            yield connection
+        finally:
+            if pool.qsize() < self.pool_size:
+                pool.put(connection)
+            else:
+                connection.close()
+
+    def close(self):
+        """Closes every pooled connection of this process."""
+        with self.pool_lock:
+            if self.pid != os.getpid():
+                return
+            while not self.pool.empty():
+                self.pool.get_nowait().close()
+
+    def add_clues(self, clues, batch_size=10000):
+        """Adds (answer, clue) pairs from any iterable in one transaction, inserting batch_size
+        rows per executemany call. Returns the number of clues added."""
+        count = 0
+        with self.connection() as connection:
+            with connection:
+                batch = []
+                for answer, clue in clues:
+                    batch.append((answer, clue))
+                    if len(batch) >= batch_size:
+                        connection.executemany("INSERT INTO clues (answer, clue) VALUES (?, ?)", batch)
+                        count += len(batch)
+                        batch = []
+                if batch:
+                    connection.executemany("INSERT INTO clues (answer, clue) VALUES (?, ?)", batch)
+                    count += len(batch)
+        return count
+
+    def import_csv(self, filename="ClueDict.csv", batch_size=10000):
+        """Streams a ClueDict.csv style file (answer, clue rows) into the database.
+        Returns the number of clues imported."""
+        with open(filename, "r", newline="") as file:
+            return self.add_clues(((row[0], row[1]) for row in csv.reader(file) if len(row) == 2), batch_size)
+
+    def get_clues_for_word(self, word):
+        """Returns a list of clues for a given word."""
+        with self.connection() as connection:
+            rows = connection.execute("SELECT clue FROM clues WHERE answer = ? ORDER BY id", (word,))
+            return [row[0] for row in rows]
+
+    def get_clues_for_words(self, words):
+        """Returns a dictionary mapping each of the given words to its list of clues."""
+        words = list(dict.fromkeys(words))
+        clues = {word: [] for word in words}
+        query = ("SELECT answer, clue FROM clues WHERE answer IN (" + ", ".join("?" * self.BATCH_SIZE)
+                 + ") ORDER BY id")
+
+        with self.connection() as connection:
+            for start in range(0, len(words), self.BATCH_SIZE):
+                batch = words[start:start + self.BATCH_SIZE]
+                batch += [None] * (self.BATCH_SIZE - len(batch)) #Pad so the statement is reused
+                for answer, clue in connection.execute(query, batch):
+                    clues[answer].append(clue)
+        return clues
+
+    def get_random_clue_for_word(self, word):
+        """Returns a random clue for a given word."""
+        clues = self.get_clues_for_word(word)
+        if clues:
+            return random.choice(clues)
+        return None
+
+    def items(self):
+        """Yields every (word, clue) pair, ordered by word."""
+        with self.connection() as connection:
+            yield from connection.execute("SELECT answer, clue FROM clues ORDER BY answer, id")
+
+    def __len__(self):
+        """Returns the number of clues in the database."""
+        with self.connection() as connection:
+            return connection.execute("SELECT COUNT(*) FROM clues").fetchone()[0]
+
+    def content_signature(self):
+        """Identifies the current contents of the database for ClueIndex.load_or_build(): the
+        path, number of clues and highest id, which change on every import."""
+        with self.connection() as connection:
+            count, last_id = connection.execute("SELECT COUNT(*), MAX(id) FROM clues").fetchone()
+        return (os.path.abspath(self.database), count, last_id)
+
+    def __repr__(self):
+        """Returns a string representation of the clue database."""
+        return f"SQLiteClueDict at {self.database} with {len(self)} clues."
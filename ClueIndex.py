@@ -0,0 +1,267 @@
+import os
+import re
+import pickle
+import hashlib
+import tempfile
+from array import array
+from bisect import bisect_left, bisect_right
+
+
+"""Full text search over clue text. Every clue is a document and every lowercase word in it a
+term. A term's postings are a sorted array of the documents containing it, so queries start
+from the rarest term's documents and probe the other terms by binary search instead of
+materializing every list. The word positions within each document are kept separately as
+delta encoded variable length integers and only decoded for phrase checks."""
+
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+QUERY_PATTERN = re.compile(r'"([^"]*)"|(\S+)')
+
+INDEX_VERSION = 2
+
+
+def tokenize(text):
+    """Splits text into lowercase alphanumeric terms."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def encode_varint(value, output):
+    """Appends value to the bytearray output as a variable length integer."""
+    while value >= 0x80:
+        output.append((value & 0x7F) | 0x80)
+        value >>= 7
+    output.append(value)
+
+
+def decode_positions(data, start, end):
+    """Decodes the delta encoded positions stored in data[start:end]."""
+    positions = []
+    position = 0
+    value = 0
+    shift = 0
+    for i in range(start, end):
+        byte = data[i]
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            position += value
+            positions.append(position)
+            value = 0
+            shift = 0
+    return positions
+
+
+def source_signature(clue_dict):
+    """Identifies the contents of a clue source: the content_signature() of a SQLiteClueDict
+    (its file does not change on every write in WAL mode), the path, size and modification time
+    of the file behind a ClueDict, or a hash of its clues if it has no file."""
+    if hasattr(clue_dict, "content_signature"):
+        return clue_dict.content_signature()
+
+    path = getattr(clue_dict, "filename", None)
+    if path and os.path.exists(path):
+        stat = os.stat(path)
+        return (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+    digest = hashlib.blake2b(digest_size=16)
+    for answer, clue in clue_dict.items():
+        digest.update(f"{answer}\t{clue}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ClueIndex():
+    def __init__(self, clues=(), source=None):
+        """Builds the index from an iterable of (answer, clue) pairs, for example
+        ClueDict.items(). Clues are stored sorted by answer so that the clues of an answer are
+        a contiguous range of documents. source is saved with the index to tell whether it is
+        still current, see load_or_build()."""
+        pairs = sorted(clues, key=lambda pair: pair[0])
+        self.clues = [clue for _, clue in pairs]
+        self.source = source
+
+        #Distinct answers and the first document of each
+        self.answers = []
+        self.answer_starts = array('i')
+        for document, (answer, _) in enumerate(pairs):
+            if not self.answers or self.answers[-1] != answer:
+                self.answers.append(answer)
+                self.answer_starts.append(document)
+        self.answer_ids = {answer: i for i, answer in enumerate(self.answers)}
+
+        #term -> sorted documents, offset of each document's positions, encoded positions
+        self.postings = {}
+        for document, clue in enumerate(self.clues):
+            positions = {}
+            for position, term in enumerate(tokenize(clue)):
+                positions.setdefault(term, []).append(position)
+
+            for term, term_positions in positions.items():
+                postings = self.postings.get(term)
+                if postings is None:
+                    postings = self.postings[term] = (array('i'), array('I'), bytearray())
+                documents, offsets, data = postings
+                documents.append(document)
+                offsets.append(len(data))
+                previous = 0
+                for position in term_positions:
+                    encode_varint(position - previous, data)
+                    previous = position
+
+        self.postings = {term: (documents, offsets, bytes(data)) for term, (documents, offsets, data) in self.postings.items()}
+
+    def save(self, filename):
+        """Writes the index to a file so it does not have to be rebuilt at startup. The index is
+        written to a temporary file first, so an interrupted save never leaves a truncated index."""
+        file_descriptor, temp_path = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(os.path.abspath(filename)))
+        try:
+            with os.fdopen(file_descriptor, "wb") as file:
+                pickle.dump({"version": INDEX_VERSION,
+                             "source": self.source,
+                             "clues": self.clues,
+                             "answers": self.answers,
+                             "answer_starts": self.answer_starts,
+                             "postings": self.postings}, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, filename)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    @classmethod
+    def load(cls, filename):
+        """Reads an index written by save()."""
+        with open(filename, "rb") as file:
+            data = pickle.load(file)
+        if data.get("version") != INDEX_VERSION:
+            raise ValueError(f"{filename} is not a version {INDEX_VERSION} clue index.")
+
+        index = cls.__new__(cls)
+        index.source = data["source"]
+        index.clues = data["clues"]
+        index.answers = data["answers"]
+        index.answer_starts = data["answer_starts"]
+        index.answer_ids = {answer: i for i, answer in enumerate(index.answers)}
+        index.postings = data["postings"]
+        return index
+
+    @classmethod
+    def load_or_build(cls, filename, clue_dict):
+        """Loads the index from filename if it was built from clue_dict's current contents (see
+        source_signature()), otherwise builds it from clue_dict.items() and saves it there."""
+        source = source_signature(clue_dict)
+        try:
+            index = cls.load(filename)
+            if index.source == source:
+                return index
+        except (FileNotFoundError, ValueError, EOFError, KeyError, pickle.UnpicklingError):
+            pass #Missing, outdated or damaged, so rebuild it
+
+        index = cls(clue_dict.items(), source)
+        index.save(filename)
+        return index
+
+    def document_count(self, term):
+        """Returns the number of documents containing term."""
+        postings = self.postings.get(term)
+        return len(postings[0]) if postings else 0
+
+    def find(self, term, document):
+        """Returns the position of document in term's postings, or -1 if term is not in it."""
+        postings = self.postings.get(term)
+        if postings is None:
+            return -1
+        documents = postings[0]
+        i = bisect_left(documents, document)
+        return i if i < len(documents) and documents[i] == document else -1
+
+    def positions(self, term, document):
+        """Returns the word positions of term in a document (empty if it does not occur)."""
+        i = self.find(term, document)
+        if i < 0:
+            return []
+        documents, offsets, data = self.postings[term]
+        end = offsets[i + 1] if i + 1 < len(offsets) else len(data)
+        return decode_positions(data, offsets[i], end)
+
+    def answer_of(self, document):
+        """Returns the answer of a document."""
+        return self.answers[bisect_right(self.answer_starts, document) - 1]
+
+    def documents_for_answers(self, answers):
+        """Returns the sorted list of documents whose answer is in answers."""
+        documents = []
+        for answer in answers:
+            i = self.answer_ids.get(answer)
+            if i is None:
+                continue
+            end = self.answer_starts[i + 1] if i + 1 < len(self.answer_starts) else len(self.clues)
+            documents.extend(range(self.answer_starts[i], end))
+        documents.sort()
+        return documents
+
+    def matching_answers(self, pattern, word_list=None):
+        """Returns the answers in the index matching a WordList pattern ('?' for one letter,
+        '*' for any number). Uses word_list's index if given, otherwise scans the answers."""
+        if word_list is not None:
+            return [answer for answer in word_list.get_words_matching_pattern(pattern) if answer in self.answer_ids]
+        regex = re.compile(pattern.replace('?', '.').replace('*', '.*'))
+        return [answer for answer in self.answers if regex.fullmatch(answer)]
+
+    def search(self, query="", answer_pattern=None, word_list=None, limit=None):
+        """Returns (answer, clue) pairs for the clues matching every term of the query. Quoted
+        parts of the query ("grand opera") must appear as a phrase. If answer_pattern is given
+        only clues for answers matching it are returned; with an empty query that is every clue
+        for those answers."""
+        phrases = []
+        for phrase, term in QUERY_PATTERN.findall(query):
+            tokens = tokenize(phrase or term)
+            if tokens:
+                phrases.append(tokens)
+
+        #Walk the smallest candidate list and probe the others from the rarest term up
+        terms = sorted({token for tokens in phrases for token in tokens}, key=self.document_count)
+        if terms and not self.document_count(terms[0]):
+            return []
+
+        if answer_pattern is not None:
+            candidates = self.documents_for_answers(self.matching_answers(answer_pattern, word_list))
+            if terms and self.document_count(terms[0]) < len(candidates):
+                answer_documents = candidates
+                candidates = [document for document in self.postings[terms[0]][0]
+                              if self.contains_document(answer_documents, document)]
+        elif terms:
+            candidates = self.postings[terms[0]][0]
+        else:
+            return []
+
+        results = []
+        for document in candidates:
+            if all(self.find(term, document) >= 0 for term in terms) and \
+               all(self.contains_phrase(document, tokens) for tokens in phrases if len(tokens) > 1):
+                results.append((self.answer_of(document), self.clues[document]))
+                if limit is not None and len(results) >= limit:
+                    break
+        return results
+
+    @staticmethod
+    def contains_document(documents, document):
+        """Returns True if the sorted list documents contains document."""
+        i = bisect_left(documents, document)
+        return i < len(documents) and documents[i] == document
+
+    def contains_phrase(self, document, tokens):
+        """Returns True if the tokens appear consecutively in the document."""
+        starts = set(self.positions(tokens[0], document))
+        for offset, token in enumerate(tokens[1:], 1):
+            starts.intersection_update(position - offset for position in self.positions(token, document))
+            if not starts:
+                return False
+        return True
+
+    def __len__(self):
+        """Returns the number of clues in the index."""
+        return len(self.clues)
+
+    def __repr__(self):
+        """Returns a string representation of the index."""
+        return f"ClueIndex with {len(self.clues)} clues and {len(self.postings)} terms."
@@ -1,4 +1,9 @@
+import os
+import time
 import random
+import logging
+import GridFill
+from Profiler import Profiler
 
 
 """TO DO:
@@ -11,12 +16,21 @@ import random
 
 
 
+logger = logging.getLogger(__name__)
+
+#Call counts and timings of the CrosswordGrid hot paths. Disabled by default, see Profiler.
+profiler = Profiler()
+
+#Clue of CrosswordWords that have not been given one. Never exported or rendered, see CrosswordWord.clue_text().
+PLACEHOLDER_CLUE = "TEST"
+
+
 def generate_random_numbers(n, min_value, max_value):
     """Generates a list of n random numbers between min_value and max_value."""
     return [random.randint(min_value, max_value) for _ in range(n)]
 
 class CrosswordWord:
-    def __init__(self, row, col, direction, word="TEST", clue="TEST", word_length=0):
+    def __init__(self, row, col, direction, word="TEST", clue=PLACEHOLDER_CLUE, word_length=0):
         """Direction is either 'horizontal' or 'vertical'."""
         self.word = word
         self.clue = clue
@@ -41,12 +55,31 @@ class CrosswordWord:
         """Returns a string representation of the crossword word."""
         return self.word + '(' + str(self.length) + ')'
 
+    def clue_text(self):
+        """Returns the clue of the word, or an empty string if it has only the placeholder clue."""
+        return "" if self.clue is None or self.clue == PLACEHOLDER_CLUE else self.clue
+
+
+class GridJournal():
+    """Records the cell changes made to a CrosswordGrid so that they can be rolled back to a
+    checkpoint or undone and redone one committed edit at a time."""
+
+    def __init__(self):
+        self.changes = [] #(row, col, old value, new value) in the order they were made
+        self.marks = [0] #Number of changes at the end of each committed edit
+        self.redo_stack = [] #Undone edits, each a list of changes
+
+    def __len__(self):
+        """Returns the number of recorded changes."""
+        return len(self.changes)
+
 
 class CrosswordGrid:
     def __init__(self, size):
         """Size is a tuple (rows, columns) representing the grid dimensions."""
         self.size = size
-        self.grid = [[' ' for _ in range(size[0])] for _ in range(size[1])]
+        self.grid = [[' ' for _ in range(size[1])] for _ in range(size[0])]
+        self.journal = GridJournal()
 
         self.mini = False
         if self.size[0] <= 10 or self.size[1] <= 10:
@@ -57,11 +90,20 @@ class CrosswordGrid:
         self.across_words = {} #To be populated with CrosswordWord objects
         self.down_words = {} #Same here
 
+        #Theme slots that black square generation must leave intact
+        self.theme_slots = [] #(row, col, direction, length) including symmetric counterparts
+        self.fixed_white_squares = set()
+        self.fixed_black_squares = set()
+
+        #Word list that generated grids must pass a fill prescreen against, see enable_fill_prescreen()
+        self.prescreen_word_list = None
+        self.max_fill_difficulty = 1.0
+
     def generate_black_squares(self, max_black_squares_p=0.225, min_black_squares_p=0.175, iterations_per_try=100,
                                max_iterations=100, default_black_square_weight=0.75, 
                                default_black_island_weight=0.4, default_black_island_row_col_weight=0.011,
                                default_black_island_row_col_weight_offset=0.335, row_col_reset_chance=0.25, 
-                               max_word_count=152, row_col_3_reset_chance=0.9):
+                               max_word_count=152, row_col_3_reset_chance=0.9, deadline=None):
         """Generates a grid with black squares (represented by '#') and white squares (represented by ' ').
         Rules for crossword grids:
         1. All words must be at least 3 letters long.
@@ -69,14 +111,38 @@ class CrosswordGrid:
         3. All black squares must be rotationally symmetric.
         4. Black squares must not occupy more than 20% of the grid.
         5. The whole grid must be coninuously connected.
+        Restarts from an empty grid until a grid satisfies the rules (and the fill prescreen, if enabled),
+        at most max_iterations times, and no more once time.monotonic() has passed deadline if one is
+        given. Returns True on success, False if every attempt failed.
         """
 
-        black_squares_count = 0
+        for attempt in range(max_iterations):
+            if deadline is not None and time.monotonic() > deadline:
+                logger.warning("Gave up generating black squares after %d attempts at the deadline", attempt)
+                return False
+            if self.attempt_black_squares(max_black_squares_p, min_black_squares_p, iterations_per_try,
+                                          max_iterations, default_black_square_weight,
+                                          default_black_island_weight, default_black_island_row_col_weight,
+                                          default_black_island_row_col_weight_offset, row_col_reset_chance,
+                                          max_word_count, row_col_3_reset_chance):
+                self.commit()
+                return True
+
+        logger.warning("Failed to generate black squares after %d attempts", max_iterations)
+        return False
+
+    def attempt_black_squares(self, max_black_squares_p, min_black_squares_p, iterations_per_try,
+                              max_iterations, default_black_square_weight,
+                              default_black_island_weight, default_black_island_row_col_weight,
+                              default_black_island_row_col_weight_offset, row_col_reset_chance,
+                              max_word_count, row_col_3_reset_chance):
+        """Makes one attempt at generating black squares with the parameters of generate_black_squares().
+        Returns True if the grid is valid, otherwise resets the grid and returns False."""
 
         if not self.mini:
-            black_squares_count = self.place_edge_black_squares()
+            self.place_edge_black_squares()
         else:
-            print("Cannot handle minis yet...")
+            logger.error("Cannot handle minis yet...")
             raise Exception
 
         total_cells = self.size[0] * self.size[1]
@@ -85,12 +151,12 @@ class CrosswordGrid:
 
         iterations = 0
         #Random placement of interior squares until an acceptable number of black squares is reached
-        while black_squares_count < min_black_squares:
+        while self.num_black_squares < min_black_squares:
             iterations += 1
             if iterations > iterations_per_try:
-                print("Failed to generate a valid crossword grid after 100 iterations. Restarting...")
-                self.reset()
-                return self.generate_black_squares()
+                self.restart_generation("iterations_per_try",
+                                        f"Failed to generate a valid crossword grid after {iterations_per_try} iterations")
+                return False
 
             cols_to_search = self.size[1] - 1
             # low_range = 0 if iterations > 2 else 1
@@ -113,14 +179,8 @@ class CrosswordGrid:
                         black_square_weight -= black_islands_in_col * black_island_col_weight #Decrease weight based on black squares in the column
 
                     if random.random() < black_square_weight \
-                    and self.validate_black_square(row, col, black_squares_count, max_black_squares):
-                        self.grid[row][col] = '#'
-                        self.grid[self.size[0] - 1 - row][self.size[1] - 1 - col] = '#'
-
-                        if row == self.size[0] -1 - row and col == self.size[1] - 1 - col:
-                            black_square_count += 1 #There is no symmetric counterpart
-                        else:
-                            black_squares_count += 2  #Count both the square and its symmetric counterpart
+                    and self.validate_black_square(row, col, self.num_black_squares, max_black_squares):
+                        self.place_black_square(row, col) #Also places the symmetric counterpart
             
             #Randomly delete the center row or column of the grid
             if random.random() < row_col_reset_chance:
@@ -134,91 +194,223 @@ class CrosswordGrid:
                     if random.random() < 0.5:
                         row = self.size[0] // 2
                         for col in range(self.size[1]):
-                            if self.grid[row][col] == '#':
-                                black_squares_count -= 1
-                            self.grid[row][col] = ' '
+                            if (row, col) not in self.fixed_black_squares:
+                                self.set_cell(row, col, ' ')
                     else:
                         col = self.size[1] // 2
                         for row in range(self.size[0]):
-                            if self.grid[row][col] == '#':
-                                black_squares_count -= 1
-                            self.grid[row][col] = ' '
+                            if (row, col) not in self.fixed_black_squares:
+                                self.set_cell(row, col, ' ')
                 elif odd_rows:  #Odd number of rows, even number of columns
                     row = self.size[0] // 2
                     for col in range(self.size[1]):
-                        if self.grid[row][col] == '#':
-                            black_squares_count -= 1
-                        self.grid[row][col] = ' '
+                        if (row, col) not in self.fixed_black_squares:
+                            self.set_cell(row, col, ' ')
                 elif odd_cols:  #Even number of rows, odd number of columns
                     col = self.size[1] // 2
                     for row in range(self.size[0]):
-                        if self.grid[row][col] == '#':
-                            black_squares_count -= 1
-                        self.grid[row][col] = ' '
+                        if (row, col) not in self.fixed_black_squares:
+                            self.set_cell(row, col, ' ')
 
             #Force black square placement in row 3 or column 3
             if random.random() < 0.1:
                 if self.black_islands_in_row(2) == 0 and self.black_islands_in_col(2) == 0:
                     if random.random() < 0.5:
-                        self.force_black_square_in_col(2, black_squares_count, max_black_squares)
+                        self.force_black_square_in_col(2, self.num_black_squares, max_black_squares)
                     else:
-                        self.force_black_square_in_row(2, black_squares_count, max_black_squares)
+                        self.force_black_square_in_row(2, self.num_black_squares, max_black_squares)
                 elif self.black_islands_in_row(2) == 0:
-                    self.force_black_square_in_row(2, black_squares_count, max_black_squares)
+                    self.force_black_square_in_row(2, self.num_black_squares, max_black_squares)
                 elif self.black_islands_in_col(2) == 0:
-                    self.force_black_square_in_col(2, black_squares_count, max_black_squares)
+                    self.force_black_square_in_col(2, self.num_black_squares, max_black_squares)
 
 
-            self.num_black_squares = black_squares_count
-            self.black_square_proportion = round(black_squares_count / total_cells, 3)
+            self.black_square_proportion = round(self.num_black_squares / total_cells, 3)
         #End while loop
 
         #If the number of black squares exceeds the maximum allowed, reset and try again
-        if black_squares_count > max_black_squares:
-            print("Exceeded maximum number of black squares. Resetting...")
-            self.reset()
-            return self.generate_black_squares()
+        if self.num_black_squares > max_black_squares:
+            self.restart_generation("max_black_squares", "Exceeded maximum number of black squares")
+            return False
         
         #If no black squares in row 3 and column 3, reset and try again
         if self.black_islands_in_row(2) == 0 and self.black_islands_in_col(2) == 0:
-            print("No black squares in row 3 and column 3. Resetting...")
-            self.reset()
-            return self.generate_black_squares()
+            self.restart_generation("no_black_square_in_row_3_and_col_3", "No black squares in row 3 and column 3")
+            return False
         elif self.black_islands_in_row(2) == 0:
             if random.random() < row_col_3_reset_chance:
-                print("No black squares in row 3. Resetting...")
-                self.reset()
-                return self.generate_black_squares()
+                self.restart_generation("no_black_square_in_row_3", "No black squares in row 3")
+                return False
         elif self.black_islands_in_col(2) == 0:
             if random.random() < row_col_3_reset_chance:
-                print("No black squares in column 3. Resetting...")
-                self.reset()
-                return self.generate_black_squares()
+                self.restart_generation("no_black_square_in_col_3", "No black squares in column 3")
+                return False
         
         self.update_words()  # Update the words after placing black squares"""
 
+        #Removing black squares to force others can leave words under three letters behind
+        if any(word.length < 3 for words in (self.across_words, self.down_words) for word in words.values()):
+            self.restart_generation("short_word", "Grid has words shorter than three letters")
+            return False
+
+        #Make sure no theme slot was broken up or extended
+        if not self.theme_slots_intact():
+            self.restart_generation("theme_slots_broken", "Theme slots were broken")
+            return False
+
         if len(self.across_words) + len(self.down_words) > max_word_count:
-            print("Exceeded maximum number of words. Resetting...")
-            self.reset()
-            return self.generate_black_squares()
+            self.restart_generation("max_word_count", "Exceeded maximum number of words")
+            return False
+
+        #Reject grids that can not be filled from the word list before anyone tries to fill them
+        if self.prescreen_word_list is not None:
+            result = self.prescreen(self.prescreen_word_list, self.max_fill_difficulty)
+            if not result["fillable"]:
+                self.restart_generation("fill_prescreen", "Failed fill prescreen (" + result["reason"] + ")")
+                return False
         
         return True
 
+    def enable_fill_prescreen(self, word_list, max_difficulty=1.0):
+        """Makes generate_black_squares() reject grids that fail GridFill.prescreen() against word_list.
+        Pass None to turn the prescreen off."""
+        self.prescreen_word_list = word_list
+        self.max_fill_difficulty = max_difficulty
+
+    def prescreen(self, word_list, max_difficulty=1.0):
+        """Returns the GridFill.prescreen() report for the current grid. Assumes update_words() is current."""
+        return GridFill.prescreen(self, word_list, max_difficulty)
+
+    def restart_generation(self, reason, message):
+        """Logs and counts a restart of black square generation and resets the grid."""
+        logger.info("%s. Resetting...", message)
+        if profiler.counting_restarts():
+            profiler.count_restart(reason)
+        self.reset()
+
+    def generate_themed_black_squares(self, theme_entries, max_iterations=100, layout_iterations=20, **kwargs):
+        """Generates black squares around a set of fixed theme slots. theme_entries is a list
+        whose items are either a length (the slot is positioned automatically) or a tuple
+        (length, row, col, direction). Every entry also fixes its rotationally symmetric
+        counterpart, so a pair of equal lengths given as plain lengths fills one symmetric pair.
+        Automatically positioned entries are laid out again after every layout_iterations failed
+        attempts, as some layouts rarely lead to a valid grid. Remaining keyword arguments are
+        passed on to generate_black_squares().
+        Returns True on success, False if the theme entries can not be laid out or all
+        max_iterations attempts failed."""
+        for start in range(0, max_iterations, layout_iterations):
+            self.clear_theme()
+            if not self.place_theme_entries(theme_entries):
+                self.clear_theme()
+                return False
+            if self.generate_black_squares(max_iterations=min(layout_iterations, max_iterations - start), **kwargs):
+                return True
+
+        return False
+
+    def place_theme_entries(self, theme_entries):
+        """Registers the given theme entries as fixed slots. See generate_themed_black_squares()
+        for the format of theme_entries. Returns True if all entries were placed, False otherwise."""
+        lengths = []
+        for entry in theme_entries:
+            if isinstance(entry, int):
+                lengths.append(entry)
+            elif not self.add_theme_slot(*entry):
+                return False
+
+        lengths.sort(reverse=True)
+        while lengths:
+            length = lengths.pop(0)
+            if length in lengths:
+                #Two equal lengths make a symmetric pair away from the center row. Rows at least
+                #three squares in from the edge are tried first, the edge rows last, since an entry
+                #there leaves no room for the edge black squares.
+                lengths.remove(length)
+                candidates = []
+                for rows in (range(3, self.size[0] // 2), range(1, min(3, self.size[0] // 2)), range(1)):
+                    tier = [(row, col) for row in rows for col in range(self.size[1] - length + 1)]
+                    random.shuffle(tier)
+                    candidates += tier
+            else:
+                #A single entry has to be its own symmetric counterpart
+                if self.size[0] % 2 == 0 or (self.size[1] - length) % 2 == 1:
+                    return False
+                candidates = [(self.size[0] // 2, (self.size[1] - length) // 2)]
+
+            if not any(self.add_theme_slot(length, row, col, 'across') for row, col in candidates):
+                return False
+
+        return True
+
+    def add_theme_slot(self, length, row, col, direction):
+        """Fixes a slot of the given length starting at (row, col) in the given direction along
+        with its rotationally symmetric counterpart. The squares before and after the slot become
+        fixed black squares. Returns True if the slot was added, False if it conflicts with the
+        grid or with theme slots that were already placed."""
+        d_row, d_col = (0, 1) if direction == 'across' else (1, 0)
+        if direction == 'across':
+            symmetric_start = (self.size[0] - 1 - row, self.size[1] - col - length)
+        elif direction == 'down':
+            symmetric_start = (self.size[0] - row - length, self.size[1] - 1 - col)
+        else:
+            raise ValueError("Direction must be 'across' or 'down'.")
+
+        new_slots = {(row, col, direction, length), (symmetric_start[0], symmetric_start[1], direction, length)}
+        if new_slots <= set(self.theme_slots):
+            return True #Already placed as the counterpart of another entry
+        if new_slots & set(self.theme_slots):
+            return False
+
+        new_white = set()
+        new_black = set()
+        for slot_row, slot_col, _, _ in new_slots:
+            cells = [(slot_row + i * d_row, slot_col + i * d_col) for i in range(length)]
+            if not all(self.in_grid(r, c) for r, c in cells):
+                return False
+            new_white.update(cells)
+
+            for r, c in [(slot_row - d_row, slot_col - d_col),
+                         (slot_row + length * d_row, slot_col + length * d_col)]:
+                if self.in_grid(r, c):
+                    new_black.add((r, c))
+
+        if new_white & (new_black | self.fixed_black_squares) or new_black & self.fixed_white_squares:
+            return False
+
+        checkpoint = self.checkpoint()
+        for r, c in new_black:
+            self.set_cell(r, c, '#')
+
+        #Theme black squares follow the same rules as any other black square
+        if any(self.creates_short_word(r, c) for r, c in new_black | self.fixed_black_squares) \
+        or not self.connected((0, 0), (self.size[0] - 1, self.size[1] - 1)):
+            self.rollback(checkpoint)
+            return False
+
+        self.theme_slots.extend(sorted(new_slots))
+        self.fixed_white_squares |= new_white
+        self.fixed_black_squares |= new_black
+        return True
+
+    def theme_slots_intact(self):
+        """Returns True if every theme slot is still exactly one word in the grid, False otherwise."""
+        for row, col, direction, length in self.theme_slots:
+            slot_row, slot_col, _, pattern = self.get_slot(row, col, direction)
+            if (slot_row, slot_col) != (row, col) or len(pattern) != length:
+                return False
+        return True
+
     def place_edge_black_squares(self):
         """Places edge squares on the top and left edge of the grid. Assumes that the grid is not a mini."""
 
-        black_square_count = 0
-
         #Place black squares on the top row
         black_square_probability = 0.25
         steps_since_last_black = 0
-        for col in range(3, self.size[0] - 3):
-            if random.random() < black_square_probability:
-                self.grid[0][col] = '#'
-                self.grid[self.size[0] - 1][self.size[1] - 1 - col] = '#'
+        for col in range(3, self.size[1] - 3):
+            if random.random() < black_square_probability and self.edge_square_allowed(0, col):
+                self.place_black_square(0, col)
                 black_square_probability = 0
                 steps_since_last_black = 0
-                black_square_count += 2
             elif steps_since_last_black >= 3:
                 black_square_probability += 0.25
                 steps_since_last_black += 1
@@ -228,25 +420,37 @@ class CrosswordGrid:
         #Place black squares on the left edge
         black_square_probability = 0.25
         steps_since_last_black = 0
-        for row in range(3, self.size[1] - 3):
-            if random.random() < black_square_probability:
-                self.grid[row][0] = '#'
-                self.grid[self.size[0] - 1 - row][self.size[1] - 1] = '#'
+        for row in range(3, self.size[0] - 3):
+            if random.random() < black_square_probability and self.edge_square_allowed(row, 0):
+                self.place_black_square(row, 0)
                 black_square_probability = 0
                 steps_since_last_black = 0
-                black_square_count += 2
             elif steps_since_last_black >= 3:
                 black_square_probability += 0.25
                 steps_since_last_black += 1
             else:
                 steps_since_last_black += 1
-        
-        return black_square_count
 
+    def edge_square_allowed(self, row, col):
+        """Returns True if an edge black square at (row, col) and its symmetric counterpart
+        would not break a theme slot. Always True when there is no theme."""
+        if not self.theme_slots:
+            return True
+
+        symmetric_row = self.size[0] - 1 - row
+        symmetric_col = self.size[1] - 1 - col
+        if (row, col) in self.fixed_white_squares or (symmetric_row, symmetric_col) in self.fixed_white_squares:
+            return False
+
+        checkpoint = self.checkpoint()
+        self.place_black_square(row, col)
+        allowed = not self.creates_short_word(row, col) and not self.creates_short_word(symmetric_row, symmetric_col)
+        self.rollback(checkpoint)
+        return allowed
 
     def validate_black_square(self, row, col, black_squares_count, max_black_squares):
         """Returns True if a black square can be placed at (row, col) without violating the rules,
-        False, otherwise"""
+        False, otherwise. The grid is left unchanged either way."""
 
         #If in (2, 2) return false
         if (row == 2 and col == 2) or (row == 2 and col == self.size[1] - 3) \
@@ -256,29 +460,32 @@ class CrosswordGrid:
         #Populate the grid with a black square at (row, col) and its symmetric counterpart
         symmetric_row = self.size[0] - 1 - row
         symmetric_col = self.size[1] - 1 - col
-        self.grid[row][col] = '#'
-        self.grid[symmetric_row][symmetric_col] = '#'
+
+        #Never place a black square inside a theme slot
+        if (row, col) in self.fixed_white_squares or (symmetric_row, symmetric_col) in self.fixed_white_squares:
+            return False
 
         #Ensure that placing black squares does not exceed the maximum allowed
         if black_squares_count >= max_black_squares:
-            self.grid[row][col] = ' '
-            self.grid[symmetric_row][symmetric_col] = ' '
             return False
-        
+
+        #Trial placement, rolled back before returning
+        checkpoint = len(self.journal.changes)
+        self.set_cell(row, col, '#')
+        self.set_cell(symmetric_row, symmetric_col, '#')
+        valid = self.trial_black_square_valid(row, col, symmetric_row, symmetric_col)
+        self.rollback(checkpoint)
+        return valid
+
+    def trial_black_square_valid(self, row, col, symmetric_row, symmetric_col):
+        """Checks the rules for a black square that has been placed at (row, col) and
+        (symmetric_row, symmetric_col) by validate_black_square()."""
+
         #Make sure this black square or its symmetric counterpart does not create any words 
         #that are less than 3 letters long
         for test_row, test_col in [(row, col), (symmetric_row, symmetric_col)]:
-            for dir in [[-1, 0], [1, 0], [0, -1], [0, 1]]:
-                count = 0
-                r, c = test_row + dir[0], test_col + dir[1]
-                while 0 <= r < self.size[0] and 0 <= c < self.size[1] and self.grid[r][c] != '#':
-                    count += 1
-                    r += dir[0]
-                    c += dir[1]
-                if count < 3 and count != 0:
-                    self.grid[row][col] = ' '
-                    self.grid[symmetric_row][symmetric_col] = ' '
-                    return False
+            if self.creates_short_word(test_row, test_col):
+                return False
         
         #Make sure all letters are seen by two words (Check all letters in all new words that are 
         #created by placing this black square)
@@ -287,8 +494,6 @@ class CrosswordGrid:
                 r, c = test_row + dir[0], test_col + dir[1]
                 if 0 <= r < self.size[0] and 0 <= c < self.size[1] and self.grid[r][c] != '#':
                     if not self.is_crossed(r, c):
-                        self.grid[row][col] = ' '
-                        self.grid[symmetric_row][symmetric_col] = ' '
                         return False
                     
                     r += dir[0]
@@ -299,16 +504,29 @@ class CrosswordGrid:
 
         #Make sure grid is continuously connected
         if not self.connected((0, 0), (self.size[0] - 1, self.size[1] - 1)):
-            self.grid[row][col] = ' '
-            self.grid[symmetric_row][symmetric_col] = ' '
             return False
 
         return True
     
+    def creates_short_word(self, row, col):
+        """Returns True if the black square at (row, col) borders a word that is less than
+        3 letters long, False otherwise."""
+        for dir in [[-1, 0], [1, 0], [0, -1], [0, 1]]:
+            count = 0
+            r, c = row + dir[0], col + dir[1]
+            while 0 <= r < self.size[0] and 0 <= c < self.size[1] and self.grid[r][c] != '#':
+                count += 1
+                r += dir[0]
+                c += dir[1]
+            if count < 3 and count != 0:
+                return True
+        return False
+
     def force_black_square_in_row(self, row, black_squares_count, max_black_squares):
         """Forces a black square in the given row. Assumes that the row has no black squares.
         Will remove random black squares from a determined range of rows to make space for the 
-        new black square if need be."""
+        new black square if need be. Returns True if a black square was successfully placed,
+        False otherwise, in which case any removed black squares are restored."""
 
         possibilities = []
         for col in range(3, self.size[1] - 3):
@@ -317,41 +535,42 @@ class CrosswordGrid:
 
         if possibilities:
             black_square_column = random.choice(possibilities)  # Randomly choose a column from the possibilities
-            self.grid[row][black_square_column] = '#'
-            self.grid[self.size[0] - 1 - row][self.size[1] - 1 - black_square_column] = '#'
-            self.num_black_squares += 2  # Increment the count of black squares by 2 for the symmetric counterpart
+            self.place_black_square(row, black_square_column)
             return True
         
         #If no options were found, remove a random black square from the three adjacent rows on either side
         #that are not in the first or last three rows or cols of the grid
         nearby_black_squares = []
         for r in range(row - 3, row + 4):
-            if not (r < 3 or r >= self.size[1] - 3):
-                for c in range(3, self.size[0] - 3):
-                    if self.grid[r][c] == '#':
+            if not (r < 3 or r >= self.size[0] - 3):
+                for c in range(3, self.size[1] - 3):
+                    if self.grid[r][c] == '#' and (r, c) not in self.fixed_black_squares:
                         nearby_black_squares.append((r, c))
 
         if not nearby_black_squares:
             return False
         
+        checkpoint = self.checkpoint()
         random_square_to_remove = random.choice(nearby_black_squares)
         self.remove_black_square(random_square_to_remove[0], random_square_to_remove[1])
-        return self.force_black_square_in_col(row, black_squares_count - 2, max_black_squares)
+        if self.force_black_square_in_row(row, self.num_black_squares, max_black_squares):
+            return True
+        self.rollback(checkpoint)
+        return False
                 
     def force_black_square_in_col(self, col, black_squares_count, max_black_squares):
         """Forces a black square in the given column. Assumes that the column has no black squares.
-        Returns True if a black square was successfully placed, False otherwise."""
+        Returns True if a black square was successfully placed, False otherwise, in which case
+        any removed black squares are restored."""
 
         possibilities = []
-        for row in range(3, self.size[1] - 3):
+        for row in range(3, self.size[0] - 3):
             if self.validate_black_square(row, col, black_squares_count, max_black_squares):
-                possibilities.append(col)
+                possibilities.append(row)
         
         if possibilities:
-            black_square_row = random.choice(possibilities)  # Randomly choose a column from the possibilities
-            self.grid[black_square_row][col] = '#'
-            self.grid[self.size[0] - 1 - black_square_row][self.size[1] - 1 - col] = '#'
-            self.num_black_squares += 2
+            black_square_row = random.choice(possibilities)  # Randomly choose a row from the possibilities
+            self.place_black_square(black_square_row, col)
             return True
         
         #If no options were found, remove a random black square from the three adjacent cols on either side
@@ -360,22 +579,102 @@ class CrosswordGrid:
         for c in range(col - 3, col + 4):
             if not (c < 3 or c >= self.size[1] - 3):
                 for r in range(3, self.size[0] - 3):
-                    if self.grid[r][c] == '#':
+                    if self.grid[r][c] == '#' and (r, c) not in self.fixed_black_squares:
                         nearby_black_squares.append((r, c))
         
         if not nearby_black_squares:
             return False
         
+        checkpoint = self.checkpoint()
         random_square_to_remove = random.choice(nearby_black_squares)
         self.remove_black_square(random_square_to_remove[0], random_square_to_remove[1])
-        return self.force_black_square_in_col(col, black_squares_count - 2, max_black_squares)
+        if self.force_black_square_in_col(col, self.num_black_squares, max_black_squares):
+            return True
+        self.rollback(checkpoint)
+        return False
                 
     
     def remove_black_square(self, row, col):
         """Removes a black square at (row, col) and its symmetric counterpart."""
+        if (row, col) in self.fixed_black_squares:
+            return
         if self.grid[row][col] == '#':
-            self.grid[row][col] = ' '
-            self.grid[self.size[0] - 1 - row][self.size[1] - 1 - col] = ' '
+            self.set_cell(row, col, ' ')
+            self.set_cell(self.size[0] - 1 - row, self.size[1] - 1 - col, ' ')
+
+    def place_black_square(self, row, col):
+        """Places a black square at (row, col) and its symmetric counterpart."""
+        self.set_cell(row, col, '#')
+        self.set_cell(self.size[0] - 1 - row, self.size[1] - 1 - col, '#')
+
+    def set_cell(self, row, col, value):
+        """Sets the square at (row, col) to value ('#', ' ' or a letter), recording the change
+        in the journal and keeping num_black_squares up to date."""
+        old = self.grid[row][col]
+        if old == value:
+            return
+        self.journal.changes.append((row, col, old, value))
+        self.grid[row][col] = value
+        if value == '#':
+            self.num_black_squares += 1
+        elif old == '#':
+            self.num_black_squares -= 1
+
+    def checkpoint(self):
+        """Returns a checkpoint that rollback() can return the grid to."""
+        return len(self.journal.changes)
+
+    def rollback(self, checkpoint):
+        """Undoes every change made since the checkpoint, most recent first."""
+        changes = self.journal.changes
+        while len(changes) > checkpoint:
+            row, col, old, value = changes.pop()
+            self.grid[row][col] = old
+            if value == '#':
+                self.num_black_squares -= 1
+            elif old == '#':
+                self.num_black_squares += 1
+
+        marks = self.journal.marks
+        while marks[-1] > checkpoint:
+            marks.pop()
+
+    def commit(self):
+        """Ends the current edit so that undo() treats the changes since the last commit as one
+        step. Starting a new edit discards anything that could be redone."""
+        if len(self.journal.changes) > self.journal.marks[-1]:
+            self.journal.marks.append(len(self.journal.changes))
+            self.journal.redo_stack.clear()
+
+    def undo(self):
+        """Undoes the last committed edit (committing any pending changes first).
+        Returns True if an edit was undone, False if there was nothing to undo."""
+        self.commit()
+        if len(self.journal.marks) < 2:
+            return False
+
+        self.journal.marks.pop()
+        checkpoint = self.journal.marks[-1]
+        self.journal.redo_stack.append(self.journal.changes[checkpoint:])
+        self.rollback(checkpoint)
+        self.update_words()
+        return True
+
+    def redo(self):
+        """Redoes the last undone edit. Returns True if an edit was redone, False otherwise.
+        Changes made since the last commit start a new edit, so they are committed and
+        nothing is redone."""
+        if len(self.journal.changes) > self.journal.marks[-1]:
+            self.commit()
+            return False
+        if not self.journal.redo_stack:
+            return False
+
+        for row, col, _, value in self.journal.redo_stack.pop():
+            self.set_cell(row, col, value)
+        self.journal.marks.append(len(self.journal.changes))
+        self.update_words()
+        return True
     
     def good_edge_coverage(self, num_islands):
         """Checks to make sure there are at least the given number of islands of black squares on 
@@ -516,8 +815,73 @@ class CrosswordGrid:
         else:
             raise ValueError("Direction must be 'across' or 'down'.")
                 
-    def add_word(self, word, row, col, direction):
-        pass
+    def add_word(self, word, row, col, direction, word_list=None):
+        """Places word in the slot starting at (row, col) in the given direction ('across' or
+        'down') and updates the crossing letters. The word must fill the slot exactly. If a WordList
+        is given, every slot the word touches must still have at least one matching word, otherwise
+        the placement is undone. Returns True if the word was placed, False otherwise."""
+        if direction == 'across':
+            d_row, d_col = 0, 1
+        elif direction == 'down':
+            d_row, d_col = 1, 0
+        else:
+            raise ValueError("Direction must be 'across' or 'down'.")
+
+        word = word.upper()
+        cells = [(row + i * d_row, col + i * d_col) for i in range(len(word))]
+
+        #The word must be exactly one slot, not part of one
+        if not self.in_grid(row, col) or self.grid[row][col] == '#':
+            return False
+        slot_row, slot_col, _, pattern = self.get_slot(row, col, direction)
+        if (slot_row, slot_col) != (row, col) or len(pattern) != len(word):
+            return False
+
+        #The word must agree with letters already placed
+        for letter, placed in zip(word, pattern):
+            if placed != '?' and placed != letter:
+                return False
+
+        checkpoint = self.checkpoint()
+        for (r, c), letter in zip(cells, word):
+            self.set_cell(r, c, letter)
+
+        if word_list is not None and not self.placement_feasible(cells, direction, word_list):
+            self.rollback(checkpoint)
+            return False
+
+        self.commit()
+        self.update_words()
+        return True
+
+    def placement_feasible(self, cells, direction, word_list):
+        """Returns True if the slot containing the given cells and every slot crossing them
+        still has at least one matching word in word_list, False otherwise."""
+        cross_direction = 'down' if direction == 'across' else 'across'
+
+        slots = {self.get_slot(cells[0][0], cells[0][1], direction)}
+        for r, c in cells:
+            slots.add(self.get_slot(r, c, cross_direction))
+
+        for _, _, _, pattern in slots:
+            #Unchecked single letters are not words
+            if len(pattern) < 2:
+                continue
+            if not word_list.has_match(pattern):
+                return False
+        return True
+
+    def get_slot(self, row, col, direction):
+        """Returns (start_row, start_col, direction, pattern) for the slot running through
+        (row, col) in the given direction. Empty squares are returned as '?' in the pattern."""
+        d_row, d_col = (0, 1) if direction == 'across' else (1, 0)
+
+        while self.in_grid(row - d_row, col - d_col) and self.grid[row - d_row][col - d_col] != '#':
+            row -= d_row
+            col -= d_col
+
+        pattern = self.get_word(row, col, direction).replace(' ', '?')
+        return row, col, direction, pattern
 
     def connected(self, start, end):
         """Checks if the grid is continuously connected from start to end using BFS."""
@@ -542,15 +906,68 @@ class CrosswordGrid:
     def in_grid(self, row, col):
         """Returns True if (row, col) is within the grid boundaries, False otherwise."""
         return 0 <= row < self.size[0] and 0 <= col < self.size[1]
+
+    def validation_problems(self, word_list=None):
+        """Checks the grid against the usual construction rules: rotational symmetry, connected
+        white squares and no words under three letters. If word_list is given, filled words must
+        be in it and partly filled grids must pass the fill prescreen. Assumes update_words() is
+        current. Returns a list of problems, empty for a valid grid."""
+        problems = []
+        rows, cols = self.size
+        if any((self.grid[row][col] == '#') != (self.grid[rows - 1 - row][cols - 1 - col] == '#')
+               for row in range(rows) for col in range(cols)):
+            problems.append("black squares are not symmetric")
+
+        white_squares = [(row, col) for row in range(rows) for col in range(cols) if self.grid[row][col] != '#']
+        if white_squares:
+            reached = {white_squares[0]}
+            queue = [white_squares[0]]
+            while queue:
+                row, col = queue.pop()
+                for next_row, next_col in ((row + 1, col), (row - 1, col), (row, col + 1), (row, col - 1)):
+                    if (self.in_grid(next_row, next_col) and self.grid[next_row][next_col] != '#'
+                            and (next_row, next_col) not in reached):
+                        reached.add((next_row, next_col))
+                        queue.append((next_row, next_col))
+            if len(reached) != len(white_squares):
+                problems.append("white squares are not connected")
+
+        words = list(self.across_words.items()) + list(self.down_words.items())
+        for key, word in words:
+            if word.length < 3:
+                problems.append(f"{key} is shorter than three letters")
+
+        if word_list is not None:
+            for key, word in words:
+                if ' ' not in word.word and word.length >= 3 and not word_list.has_match(word.word):
+                    problems.append(f"{key} {word.word} is not in the word list")
+            if any(' ' in word.word for _, word in words):
+                result = self.prescreen(word_list)
+                if not result["fillable"]:
+                    problems.append(f"can not be filled ({result['reason']})")
+        return problems
     
     def reset(self):
         """Resets the crossword grid to its initial state."""
         self.grid = [[' ' for _ in range(self.size[1])] for _ in range(self.size[0])]
+        self.journal = GridJournal()
         self.num_black_squares = 0
         self.black_square_percentage = 0
         self.across_words.clear()
         self.down_words.clear()
 
+        #Theme black squares survive a reset so that restarts keep the theme layout
+        for row, col in self.fixed_black_squares:
+            self.grid[row][col] = '#'
+        self.num_black_squares = len(self.fixed_black_squares)
+
+    def clear_theme(self):
+        """Removes all theme slots and resets the grid."""
+        self.theme_slots = []
+        self.fixed_white_squares = set()
+        self.fixed_black_squares = set()
+        self.reset()
+
     def display(self, info=False):
         print('+' + '---' * self.size[1] + '+')
         for row in self.grid:
@@ -585,24 +1002,70 @@ class CrosswordGrid:
         """Returns a hash of the crossword grid."""
         return hash(tuple(tuple(row) for row in self.grid))
 
+    def to_dict(self):
+        """Returns the grid and its words as a JSON serializable dictionary."""
+        def words_to_dict(words):
+            return {key: {"row": word.row, "col": word.col, "length": word.length, "word": word.word, "clue": word.clue}
+                    for key, word in words.items()}
+
+        return {"size": list(self.size),
+                "grid": [''.join(row) for row in self.grid],
+                "black_squares": self.num_black_squares,
+                "across": words_to_dict(self.across_words),
+                "down": words_to_dict(self.down_words)}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Creates a grid from a dictionary made by to_dict(), keeping the clues it holds."""
+        grid = cls(tuple(data["size"]))
+        grid.load_rows(data["grid"])
+        for words, saved in ((grid.across_words, data.get("across", {})), (grid.down_words, data.get("down", {}))):
+            for key, word in words.items():
+                if key in saved:
+                    word.clue = saved[key]["clue"]
+        return grid
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Creates a grid with its words from a list of row strings ('#' for black squares)."""
+        grid = cls((len(rows), len(rows[0]) if rows else 0))
+        grid.load_rows(rows)
+        return grid
+
+    def load_rows(self, rows):
+        """Replaces the grid with a list of row strings or lists, starting a new journal."""
+        self.grid = [list(row) for row in rows]
+        if self.grid:
+            self.size = (len(self.grid), len(self.grid[0]))
+        self.journal = GridJournal()
+        self.num_black_squares = sum(row.count('#') for row in self.grid)
+        self.update_words()
+
     def write_to_file(self, filename=""):
-        """Writes the crossword grid to a file."""
+        """Writes the crossword grid to a file in the Grids directory. Returns the file path."""
         if not filename:
             filename = str(self.__hash__()) + ".txt"
 
-        filepath = "Grids/" + filename 
+        filepath = os.path.join("Grids", filename)
+        os.makedirs("Grids", exist_ok=True)
         
         with open(filepath, 'w') as f:
             for row in self.grid:
-                f.write(row + '\n')
+                f.write(''.join(row) + '\n')
+        return filepath
     
     def read_from_file(self, filepath):
         """Reads the crossword grid from a file."""
         with open(filepath, 'r') as f:
-            self.grid = [list(line.strip()) for line in f.readlines()]
-            self.size = (len(self.grid), len(self.grid[0])) if self.grid else (0, 0)
+            rows = [line.rstrip('\n') for line in f.readlines() if line.strip('\n')]
+        self.size = (0, 0)
+        self.load_rows(rows)
         
 
+profiler.instrument(CrosswordGrid, ["validate_black_square", "connected", "black_island_size", "is_crossed",
+                                   "update_words"])
+
+
 class CrosswordPuzzle():
     def __init__(self, grid):
         """Initializes a crossword puzzle with a given grid."""
@@ -610,9 +1073,31 @@ class CrosswordPuzzle():
         self.clue_dict = {}  # To be populated with clues for the words
         self.word_list = []  # To be populated with words from the grid
 
-    def generate_clues(self):
-        """Generates clues for the words in the crossword puzzle."""
-        pass  # Implementation to be added later
+    def generate_clues(self, clue_dict, recent=None):
+        """Picks a random clue from clue_dict (a ClueDict or SQLiteClueDict) for every word of the
+        filled grid. With a RecentUseFilter as recent, the least recently used clues of a word are
+        picked from. Returns the keys of the words no clue was found for."""
+        missing = []
+        for words in (self.grid.across_words, self.grid.down_words):
+            for key, word in words.items():
+                if recent is None:
+                    clue = clue_dict.get_random_clue_for_word(word.word)
+                else:
+                    clue = self.least_used_clue(clue_dict.get_clues_for_word(word.word), recent)
+                if clue is None:
+                    missing.append(key)
+                    continue
+                word.clue = clue
+                self.clue_dict[key] = clue
+        return missing
+
+    def least_used_clue(self, clues, recent):
+        """Returns a random clue among the clues used least in recent, or None if there are none."""
+        if not clues:
+            return None
+        uses = [recent.clue_count(clue) for clue in clues]
+        fewest = min(uses)
+        return random.choice([clue for clue, count in zip(clues, uses) if count == fewest])
 
     def display_grid(self):
         """Displays the crossword puzzle."""
@@ -627,6 +1112,13 @@ class CrosswordPuzzle():
             print(f"{key} (Down): {word.clue}")
 
 
+def split_puzzle(crossword):
+    """Returns (grid, puzzle) for a CrosswordGrid or a CrosswordPuzzle (puzzle is None for a grid)."""
+    if isinstance(crossword, CrosswordPuzzle):
+        return crossword.grid, crossword
+    return crossword, None
+
+
 def main():
     size = (21, 21)  # Example size
     grid = CrosswordGrid(size)
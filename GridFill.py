@@ -0,0 +1,226 @@
+import math
+import random
+
+
+"""Fill checks for crossword grids. Every slot's remaining candidate words are kept as a
+bitset over the WordList words of its length (see WordList.letter_masks()), so narrowing a
+slot by the letters its crossings allow is a handful of big integer ANDs and ORs."""
+
+
+ALL_LETTERS = (1 << 26) - 1
+
+
+class Slot():
+    def __init__(self, key, cells, words, masks):
+        """A slot of the grid with its candidate words as a bitset over words."""
+        self.key = key #Clue number such as '12A'
+        self.cells = cells
+        self.length = len(cells)
+        self.words = words
+        self.masks = masks
+        self.domain = (1 << len(words)) - 1
+
+    def letters(self, position):
+        """Returns the set of letters (bit 0 for 'A') still possible at position."""
+        letters = 0
+        domain = self.domain
+        for letter, mask in enumerate(self.masks[position]):
+            if domain & mask:
+                letters |= 1 << letter
+        return letters
+
+    def restrict(self, position, letters):
+        """Keeps only the candidates with one of the given letters at position.
+        Returns True if candidates were removed."""
+        allowed = 0
+        for letter, mask in enumerate(self.masks[position]):
+            if letters >> letter & 1:
+                allowed |= mask
+        domain = self.domain & allowed
+        changed = domain != self.domain
+        self.domain = domain
+        return changed
+
+    def candidate_count(self):
+        """Returns the number of candidate words left."""
+        return self.domain.bit_count()
+
+
+def grid_slots(grid, word_list):
+    """Builds a Slot for every across and down word of at least two squares in the grid, with
+    candidates narrowed to the letters already in the grid. Returns (slots, crossings) where
+    crossings maps each square to the (slot, position) pairs running through it."""
+    slots = []
+    crossings = {}
+    for words, (d_row, d_col) in ((grid.across_words, (0, 1)), (grid.down_words, (1, 0))):
+        for key, word in words.items():
+            if word.length < 2:
+                continue #A single square is not a word
+            cells = [(word.row + i * d_row, word.col + i * d_col) for i in range(word.length)]
+            slot = Slot(key, cells, *word_list.letter_masks(word.length))
+            for position, (row, col) in enumerate(cells):
+                letter = grid.grid[row][col]
+                if letter != ' ':
+                    slot.restrict(position, 1 << (ord(letter) - 65) if 'A' <= letter <= 'Z' else 0)
+                crossings.setdefault((row, col), []).append((slot, position))
+            slots.append(slot)
+    return slots, crossings
+
+
+def propagate(slots, crossings, queue=None):
+    """Runs arc consistency over the crossings: the letters a slot allows at a square limit the
+    candidates of the slot crossing it there, until nothing changes. Returns the first slot left
+    without candidates, or None."""
+    queue = list(slots) if queue is None else queue
+    queued = set(map(id, queue))
+    while queue:
+        slot = queue.pop()
+        queued.discard(id(slot))
+        if not slot.domain:
+            return slot
+
+        for position, cell in enumerate(slot.cells):
+            letters = None
+            for other, other_position in crossings[cell]:
+                if other is slot:
+                    continue
+                if letters is None:
+                    letters = slot.letters(position)
+                if other.restrict(other_position, letters):
+                    if not other.domain:
+                        return other
+                    if id(other) not in queued:
+                        queue.append(other)
+                        queued.add(id(other))
+    return None
+
+
+def prescreen(grid, word_list, max_difficulty=1.0):
+    """Cheaply estimates whether the grid (after update_words()) can be filled from word_list.
+    Checks that every slot length has enough words for all slots of that length and runs an
+    arc consistency pass over the crossings.
+
+    Returns a dictionary with 'fillable', 'reason' (None if fillable), 'difficulty',
+    'min_candidates' and 'tightest_slot'. difficulty is the average over slots of how much of
+    the supply for the slot's length was pruned on a log scale, from 0 (nothing pruned) to 1
+    (a single candidate left); grids above max_difficulty are reported as not fillable."""
+    result = {"fillable": False, "reason": None, "difficulty": 1.0, "min_candidates": 0, "tightest_slot": None}
+
+    slots, crossings = grid_slots(grid, word_list)
+
+    #Supply and demand of words per slot length
+    demand = {}
+    for slot in slots:
+        demand[slot.length] = demand.get(slot.length, 0) + 1
+    for length, count in sorted(demand.items()):
+        supply = len(word_list.letter_masks(length)[0])
+        if supply < count:
+            result["reason"] = f"{count} slots of length {length} but {supply} words"
+            return result
+
+    empty_slot = propagate(slots, crossings)
+    if empty_slot is not None:
+        result["reason"] = f"no words left for {empty_slot.key}"
+        result["tightest_slot"] = empty_slot.key
+        return result
+
+    difficulty = 0.0
+    tightest = None
+    for slot in slots:
+        candidates = slot.candidate_count()
+        supply = len(slot.words)
+        if supply > 1:
+            difficulty += 1 - math.log(candidates) / math.log(supply)
+        if tightest is None or candidates < tightest.candidate_count():
+            tightest = slot
+
+    result["difficulty"] = difficulty / len(slots) if slots else 0.0
+    result["min_candidates"] = tightest.candidate_count() if tightest else 0
+    result["tightest_slot"] = tightest.key if tightest else None
+    if result["difficulty"] > max_difficulty:
+        result["reason"] = f"difficulty {result['difficulty']:.3f} above {max_difficulty}"
+        return result
+
+    result["fillable"] = True
+    return result
+
+
+def candidate_indices(slot, word_list=None, rng=random, recent=None, exclude_recent=False):
+    """Returns the indices of a slot's remaining candidates, best scoring first if word_list has
+    scores and in random order otherwise (ties are shuffled too). With a RecentUseFilter as
+    recent, recently used answers are tried last, or left out if exclude_recent is True."""
+    indices = []
+    domain = slot.domain
+    while domain:
+        low = domain & -domain
+        indices.append(low.bit_length() - 1)
+        domain ^= low
+    rng.shuffle(indices)
+    if word_list is not None and word_list.scores is not None:
+        scores = word_list.scores
+        indices.sort(key=lambda index: -scores.get(slot.words[index], 0))
+    if recent is not None:
+        uses = {index: recent.answer_count(slot.words[index]) for index in indices}
+        if exclude_recent:
+            indices = [index for index in indices if not uses[index]]
+        else:
+            indices.sort(key=uses.__getitem__)
+    return indices
+
+
+def fill_grid(grid, word_list, max_steps=20000, rng=random, recent=None, exclude_recent=False):
+    """Fills the empty squares of the grid (after update_words()) with words from word_list by
+    backtracking search: the slot with the fewest candidates is filled next, and arc consistency
+    over the crossings prunes the other slots after every placement. No word is used twice.
+    Answers in the RecentUseFilter recent are penalized or excluded, see candidate_indices().
+    Returns True and writes the letters into the grid if a fill was found within max_steps
+    placements, otherwise leaves the grid unchanged and returns False."""
+    slots, crossings = grid_slots(grid, word_list)
+    if propagate(slots, crossings) is not None:
+        return False
+
+    assigned = {} #slot key -> word
+    used = set()
+    steps = 0
+
+    def search():
+        nonlocal steps
+        best = None
+        for slot in slots:
+            if slot.key not in assigned and (best is None or slot.candidate_count() < best.candidate_count()):
+                best = slot
+        if best is None:
+            return True
+
+        saved = [slot.domain for slot in slots]
+        for index in candidate_indices(best, word_list, rng, recent, exclude_recent):
+            word = best.words[index]
+            if word in used:
+                continue
+            steps += 1
+            if steps > max_steps:
+                return False
+
+            best.domain = 1 << index
+            assigned[best.key] = word
+            used.add(word)
+            if propagate(slots, crossings, [best]) is None and search():
+                return True
+            del assigned[best.key]
+            used.discard(word)
+            for slot, domain in zip(slots, saved):
+                slot.domain = domain
+            if steps > max_steps:
+                return False
+        return False
+
+    if not search():
+        return False
+
+    for slot in slots:
+        for (row, col), letter in zip(slot.cells, assigned[slot.key]):
+            if grid.grid[row][col] != letter:
+                grid.set_cell(row, col, letter)
+    grid.commit()
+    grid.update_words()
+    return True
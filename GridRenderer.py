@@ -0,0 +1,336 @@
+import os
+import zlib
+import struct
+import textwrap
+import unicodedata
+from xml.sax.saxutils import escape
+from concurrent.futures import ProcessPoolExecutor
+
+from CrossBuild import split_puzzle
+
+
+"""Headless rendering of crossword grids and puzzles to PNG and SVG files. PNG images are drawn
+into a grayscale pixel buffer with a built in 5x7 bitmap font and encoded without any imaging
+library, so previews can be produced in bulk on machines without a display or pygame. The font
+covers letters, digits and common punctuation; other characters in clues are drawn as their
+unaccented letter or as '?'."""
+
+
+#5x7 bitmap font for clue numbers, answer letters and clue text
+FONT = {
+    "A": (" ### ", "#   #", "#   #", "#####", "#   #", "#   #", "#   #"),
+    "B": ("#### ", "#   #", "#   #", "#### ", "#   #", "#   #", "#### "),
+    "C": (" ### ", "#   #", "#    ", "#    ", "#    ", "#   #", " ### "),
+    "D": ("#### ", "#   #", "#   #", "#   #", "#   #", "#   #", "#### "),
+    "E": ("#####", "#    ", "#    ", "#### ", "#    ", "#    ", "#####"),
+    "F": ("#####", "#    ", "#    ", "#### ", "#    ", "#    ", "#    "),
+    "G": (" ### ", "#   #", "#    ", "# ###", "#   #", "#   #", " ####"),
+    "H": ("#   #", "#   #", "#   #", "#####", "#   #", "#   #", "#   #"),
+    "I": (" ### ", "  #  ", "  #  ", "  #  ", "  #  ", "  #  ", " ### "),
+    "J": ("  ###", "   # ", "   # ", "   # ", "   # ", "#  # ", " ##  "),
+    "K": ("#   #", "#  # ", "# #  ", "##   ", "# #  ", "#  # ", "#   #"),
+    "L": ("#    ", "#    ", "#    ", "#    ", "#    ", "#    ", "#####"),
+    "M": ("#   #", "## ##", "# # #", "# # #", "#   #", "#   #", "#   #"),
+    "N": ("#   #", "#   #", "##  #", "# # #", "#  ##", "#   #", "#   #"),
+    "O": (" ### ", "#   #", "#   #", "#   #", "#   #", "#   #", " ### "),
+    "P": ("#### ", "#   #", "#   #", "#### ", "#    ", "#    ", "#    "),
+    "Q": (" ### ", "#   #", "#   #", "#   #", "# # #", "#  # ", " ## #"),
+    "R": ("#### ", "#   #", "#   #", "#### ", "# #  ", "#  # ", "#   #"),
+    "S": (" ####", "#    ", "#    ", " ### ", "    #", "    #", "#### "),
+    "T": ("#####", "  #  ", "  #  ", "  #  ", "  #  ", "  #  ", "  #  "),
+    "U": ("#   #", "#   #", "#   #", "#   #", "#   #", "#   #", " ### "),
+    "V": ("#   #", "#   #", "#   #", "#   #", "#   #", " # # ", "  #  "),
+    "W": ("#   #", "#   #", "#   #", "# # #", "# # #", "# # #", " # # "),
+    "X": ("#   #", "#   #", " # # ", "  #  ", " # # ", "#   #", "#   #"),
+    "Y": ("#   #", "#   #", " # # ", "  #  ", "  #  ", "  #  ", "  #  "),
+    "Z": ("#####", "    #", "   # ", "  #  ", " #   ", "#    ", "#####"),
+    "0": (" ### ", "#   #", "#  ##", "# # #", "##  #", "#   #", " ### "),
+    "1": ("  #  ", " ##  ", "  #  ", "  #  ", "  #  ", "  #  ", " ### "),
+    "2": (" ### ", "#   #", "    #", "   # ", "  #  ", " #   ", "#####"),
+    "3": ("#####", "   # ", "  #  ", "   # ", "    #", "#   #", " ### "),
+    "4": ("   # ", "  ## ", " # # ", "#  # ", "#####", "   # ", "   # "),
+    "5": ("#####", "#    ", "#### ", "    #", "    #", "#   #", " ### "),
+    "6": ("  ## ", " #   ", "#    ", "#### ", "#   #", "#   #", " ### "),
+    "7": ("#####", "    #", "   # ", "  #  ", " #   ", " #   ", " #   "),
+    "8": (" ### ", "#   #", "#   #", " ### ", "#   #", "#   #", " ### "),
+    "9": (" ### ", "#   #", "#   #", " ####", "    #", "   # ", " ##  "),
+    "a": ("     ", "     ", " ### ", "    #", " ####", "#   #", " ####"),
+    "b": ("#    ", "#    ", "# ## ", "##  #", "#   #", "#   #", "#### "),
+    "c": ("     ", "     ", " ### ", "#    ", "#    ", "#   #", " ### "),
+    "d": ("    #", "    #", " ## #", "#  ##", "#   #", "#   #", " ####"),
+    "e": ("     ", "     ", " ### ", "#   #", "#####", "#    ", " ### "),
+    "f": ("  ## ", " #  #", " #   ", "###  ", " #   ", " #   ", " #   "),
+    "g": ("     ", " ####", "#   #", "#   #", " ####", "    #", " ### "),
+    "h": ("#    ", "#    ", "# ## ", "##  #", "#   #", "#   #", "#   #"),
+    "i": ("  #  ", "     ", " ##  ", "  #  ", "  #  ", "  #  ", " ### "),
+    "j": ("   # ", "     ", "  ## ", "   # ", "   # ", "#  # ", " ##  "),
+    "k": ("#    ", "#    ", "#  # ", "# #  ", "##   ", "# #  ", "#  # "),
+    "l": (" ##  ", "  #  ", "  #  ", "  #  ", "  #  ", "  #  ", " ### "),
+    "m": ("     ", "     ", "## # ", "# # #", "# # #", "#   #", "#   #"),
+    "n": ("     ", "     ", "# ## ", "##  #", "#   #", "#   #", "#   #"),
+    "o": ("     ", "     ", " ### ", "#   #", "#   #", "#   #", " ### "),
+    "p": ("     ", "#### ", "#   #", "#   #", "#### ", "#    ", "#    "),
+    "q": ("     ", " ## #", "#  ##", "#   #", " ####", "    #", "    #"),
+    "r": ("     ", "     ", "# ## ", "##  #", "#    ", "#    ", "#    "),
+    "s": ("     ", "     ", " ####", "#    ", " ### ", "    #", "#### "),
+    "t": (" #   ", " #   ", "###  ", " #   ", " #   ", " #  #", "  ## "),
+    "u": ("     ", "     ", "#   #", "#   #", "#   #", "#  ##", " ## #"),
+    "v": ("     ", "     ", "#   #", "#   #", "#   #", " # # ", "  #  "),
+    "w": ("     ", "     ", "#   #", "#   #", "# # #", "# # #", " # # "),
+    "x": ("     ", "     ", "#   #", " # # ", "  #  ", " # # ", "#   #"),
+    "y": ("     ", "#   #", "#   #", "#   #", " ####", "    #", " ### "),
+    "z": ("     ", "     ", "#####", "   # ", "  #  ", " #   ", "#####"),
+    " ": ("     ", "     ", "     ", "     ", "     ", "     ", "     "),
+    ".": ("     ", "     ", "     ", "     ", "     ", " ##  ", " ##  "),
+    ",": ("     ", "     ", "     ", "     ", " ##  ", "  #  ", " #   "),
+    "'": ("  #  ", "  #  ", " #   ", "     ", "     ", "     ", "     "),
+    '"': (" # # ", " # # ", "     ", "     ", "     ", "     ", "     "),
+    "-": ("     ", "     ", "     ", " ### ", "     ", "     ", "     "),
+    "?": (" ### ", "#   #", "    #", "   # ", "  #  ", "     ", "  #  "),
+    "!": ("  #  ", "  #  ", "  #  ", "  #  ", "  #  ", "     ", "  #  "),
+    ":": ("     ", " ##  ", " ##  ", "     ", " ##  ", " ##  ", "     "),
+    ";": ("     ", " ##  ", " ##  ", "     ", " ##  ", "  #  ", " #   "),
+    "(": ("   # ", "  #  ", " #   ", " #   ", " #   ", "  #  ", "   # "),
+    ")": (" #   ", "  #  ", "   # ", "   # ", "   # ", "  #  ", " #   "),
+    "&": (" ##  ", "#  # ", "# #  ", " #   ", "# # #", "#  # ", " ## #"),
+    "/": ("     ", "    #", "   # ", "  #  ", " #   ", "#    ", "     "),
+    "_": ("     ", "     ", "     ", "     ", "     ", "     ", "#####"),
+}
+GLYPH_WIDTH = 5
+GLYPH_HEIGHT = 7
+
+WHITE = 255
+BLACK = 0
+
+#Characters per line of the PNG clue panel
+CLUE_COLUMNS = 36
+TEXT_REPLACEMENTS = str.maketrans({"\u2018": "'", "\u2019": "'", "\u201c": '"', "\u201d": '"',
+                                   "\u2013": "-", "\u2014": "-", "\u2026": "..."})
+
+#Scaled glyphs as lists of (row, start column, end column) runs, keyed by (character, scale)
+glyph_cache = {}
+
+
+def glyph_runs(character, scale):
+    """Returns the pixel runs of a character drawn at an integer scale, caching the result."""
+    key = (character, scale)
+    runs = glyph_cache.get(key)
+    if runs is None:
+        runs = []
+        for row, line in enumerate(FONT.get(character, ())):
+            column = 0
+            while column < GLYPH_WIDTH:
+                if line[column] == '#':
+                    end = column
+                    while end < GLYPH_WIDTH and line[end] == '#':
+                        end += 1
+                    for y in range(row * scale, (row + 1) * scale):
+                        runs.append((y, column * scale, end * scale))
+                    column = end
+                else:
+                    column += 1
+        glyph_cache[key] = runs
+    return runs
+
+
+class Canvas():
+    def __init__(self, width, height, color=WHITE):
+        """A grayscale pixel buffer."""
+        self.width = width
+        self.height = height
+        self.pixels = bytearray([color]) * (width * height)
+
+    def fill_rect(self, x, y, width, height, color):
+        """Fills a rectangle, clipped to the canvas."""
+        x0, x1 = max(x, 0), min(x + width, self.width)
+        if x0 >= x1:
+            return
+        row_bytes = bytes([color]) * (x1 - x0)
+        for row in range(max(y, 0), min(y + height, self.height)):
+            start = row * self.width
+            self.pixels[start + x0:start + x1] = row_bytes
+
+    def draw_text(self, text, x, y, scale, color=BLACK):
+        """Draws text with the bitmap font with its top left corner at (x, y)."""
+        for character in text:
+            for row, start, end in glyph_runs(character, scale):
+                self.fill_rect(x + start, y + row, end - start, 1, color)
+            x += (GLYPH_WIDTH + 1) * scale
+
+    def to_png(self):
+        """Encodes the canvas as an 8 bit grayscale PNG."""
+        raw = bytearray()
+        for row in range(self.height):
+            raw.append(0) #No filter
+            raw += self.pixels[row * self.width:(row + 1) * self.width]
+
+        def chunk(tag, data):
+            return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+        header = struct.pack(">IIBBBBB", self.width, self.height, 8, 0, 0, 0, 0)
+        return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header)
+                + chunk(b"IDAT", zlib.compress(bytes(raw), 6)) + chunk(b"IEND", b""))
+
+
+def font_text(text):
+    """Returns text with every character the bitmap font can not draw replaced, accented
+    letters by their plain letter and anything else by '?'."""
+    text = unicodedata.normalize("NFKD", text.translate(TEXT_REPLACEMENTS))
+    return "".join(character if character in FONT else '?' for character in text
+                   if not unicodedata.combining(character))
+
+
+def square_numbers(grid):
+    """Returns a dictionary of (row, col) -> clue number from the grid's word dictionaries."""
+    numbers = {}
+    for words in (grid.across_words, grid.down_words):
+        for key, word in words.items():
+            numbers[(word.row, word.col)] = int(key[:-1])
+    return numbers
+
+
+def clue_lines(grid):
+    """Returns the across and down clue lists of a grid as lists of 'number. clue' strings."""
+    return ([f"{key[:-1]}. {word.clue_text()}" for key, word in grid.across_words.items()],
+            [f"{key[:-1]}. {word.clue_text()}" for key, word in grid.down_words.items()])
+
+
+def render_png(crossword, filename=None, cell_size=32, margin=None, letters=True, clues=None):
+    """Renders a CrosswordGrid or CrosswordPuzzle grid with clue numbers and letters as PNG bytes,
+    also writing them to filename if given. Clue lists are drawn next to the grid for puzzles,
+    or for grids if clues is True. Text that would not fit (small cell sizes, for thumbnails)
+    is left out."""
+    grid, puzzle = split_puzzle(crossword)
+    rows, cols = grid.size
+    margin = max(1, cell_size // 4) if margin is None else margin
+    clues = puzzle is not None if clues is None else clues
+
+    grid_width = cols * cell_size + 2 * margin + 1
+    grid_height = rows * cell_size + 2 * margin + 1
+    clue_scale = max(1, cell_size // 16)
+    line_height = (GLYPH_HEIGHT + 3) * clue_scale
+    panel = []
+    if clues:
+        #(text, bold) lines of the clue panel, long clues wrapped with an indent
+        for title, lines in zip(("Across", "Down"), clue_lines(grid)):
+            panel.append((title, True))
+            for line in lines:
+                panel += [(text, False) for text in textwrap.wrap(font_text(line), CLUE_COLUMNS, subsequent_indent="   ")]
+            panel.append(("", False))
+    clue_width = (CLUE_COLUMNS * (GLYPH_WIDTH + 1) * clue_scale + margin) if clues else 0
+    canvas = Canvas(grid_width + clue_width, max(grid_height, len(panel) * line_height + 2 * margin))
+
+    #Grid lines, then squares inside them
+    canvas.fill_rect(margin, margin, cols * cell_size + 1, rows * cell_size + 1, BLACK)
+    for row in range(rows):
+        for col in range(cols):
+            if grid.grid[row][col] != '#':
+                canvas.fill_rect(margin + col * cell_size + 1, margin + row * cell_size + 1,
+                                 cell_size - 1, cell_size - 1, WHITE)
+
+    number_scale = cell_size // 24
+    letter_scale = cell_size * 5 // 9 // GLYPH_HEIGHT
+    if number_scale:
+        for (row, col), number in square_numbers(grid).items():
+            canvas.draw_text(str(number), margin + col * cell_size + 2 * number_scale,
+                             margin + row * cell_size + 2 * number_scale, number_scale)
+    if letters and letter_scale:
+        for row in range(rows):
+            for col in range(cols):
+                letter = grid.grid[row][col]
+                if letter in FONT:
+                    x = margin + col * cell_size + (cell_size - GLYPH_WIDTH * letter_scale) // 2
+                    y = margin + row * cell_size + cell_size - GLYPH_HEIGHT * letter_scale - cell_size // 8
+                    canvas.draw_text(letter, x, y, letter_scale)
+
+    y = margin
+    for text, bold in panel:
+        canvas.draw_text(text, grid_width, y, clue_scale)
+        if bold:
+            canvas.draw_text(text, grid_width + 1, y, clue_scale)
+        y += line_height
+
+    data = canvas.to_png()
+    if filename:
+        with open(filename, "wb") as file:
+            file.write(data)
+    return data
+
+
+def render_svg(crossword, filename=None, cell_size=32, margin=None, letters=True, clues=None):
+    """Renders a CrosswordGrid or CrosswordPuzzle as an SVG string, also writing it to filename if
+    given. Clue lists are drawn next to the grid for puzzles, or for grids if clues is True."""
+    grid, puzzle = split_puzzle(crossword)
+    rows, cols = grid.size
+    margin = max(1, cell_size // 4) if margin is None else margin
+    clues = puzzle is not None if clues is None else clues
+
+    grid_width = cols * cell_size + 2 * margin
+    grid_height = rows * cell_size + 2 * margin
+    across, down = clue_lines(grid) if clues else ([], [])
+    line_height = max(12, cell_size // 2)
+    clue_width = 24 * line_height if clues else 0
+    height = max(grid_height, (len(across) + len(down) + 4) * line_height + margin if clues else 0)
+
+    parts = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{grid_width + clue_width}" height="{height}" '
+             f'font-family="Helvetica, Arial, sans-serif">',
+             f'<rect width="{grid_width + clue_width}" height="{height}" fill="white"/>']
+    for row in range(rows):
+        for col in range(cols):
+            fill = "black" if grid.grid[row][col] == '#' else "white"
+            parts.append(f'<rect x="{margin + col * cell_size}" y="{margin + row * cell_size}" width="{cell_size}" '
+                         f'height="{cell_size}" fill="{fill}" stroke="black"/>')
+
+    number_size = cell_size * 3 // 10
+    for (row, col), number in square_numbers(grid).items():
+        parts.append(f'<text x="{margin + col * cell_size + 2}" y="{margin + row * cell_size + number_size + 1}" '
+                     f'font-size="{number_size}">{number}</text>')
+    if letters:
+        for row in range(rows):
+            for col in range(cols):
+                letter = grid.grid[row][col]
+                if letter not in "# ":
+                    parts.append(f'<text x="{margin + col * cell_size + cell_size // 2}" '
+                                 f'y="{margin + (row + 1) * cell_size - cell_size // 6}" font-size="{cell_size * 3 // 5}" '
+                                 f'text-anchor="middle">{escape(letter)}</text>')
+
+    if clues:
+        y = margin + line_height
+        for title, lines in (("Across", across), ("Down", down)):
+            parts.append(f'<text x="{grid_width}" y="{y}" font-size="{line_height}" font-weight="bold">{title}</text>')
+            y += line_height
+            for line in lines:
+                parts.append(f'<text x="{grid_width}" y="{y}" font-size="{line_height * 4 // 5}">{escape(line)}</text>')
+                y += line_height
+            y += line_height
+
+    parts.append("</svg>")
+    svg = "\n".join(parts) + "\n"
+    if filename:
+        with open(filename, "w", encoding="utf-8") as file:
+            file.write(svg)
+    return svg
+
+
+def render_file(crossword, filename, cell_size=32, clues=None):
+    """Renders to a PNG or SVG file depending on the file extension. Returns the filename."""
+    if filename.lower().endswith(".svg"):
+        render_svg(crossword, filename, cell_size, clues=clues)
+    else:
+        render_png(crossword, filename, cell_size, clues=clues)
+    return filename
+
+
+def render_file_arguments(arguments):
+    """Unpacks a (crossword, filename, cell_size, clues) tuple for render_file() in worker processes."""
+    return render_file(*arguments)
+
+
+def render_batch(crosswords, output_dir, image_format="png", cell_size=32, processes=None, chunksize=64, clues=None):
+    """Renders many grids or puzzles into output_dir as 000000.png, 000001.png, ... (or .svg)
+    across a process pool. Each worker keeps its own glyph cache. Returns the written filenames."""
+    os.makedirs(output_dir, exist_ok=True)
+    tasks = [(crossword, os.path.join(output_dir, f"{i:06d}.{image_format}"), cell_size, clues)
+             for i, crossword in enumerate(crosswords)]
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        return list(executor.map(render_file_arguments, tasks, chunksize=chunksize))
@@ -0,0 +1,166 @@
+import numpy as np
+
+
+"""Batch quality metrics for crossword grids. Grids are scored as one stacked boolean array of
+shape (grids, rows, columns) where True marks a black square, so every metric is computed for
+the whole stack at once instead of looping over grids in Python."""
+
+
+#Weights used by score_grids() when none are given. Positive weights reward a metric.
+DEFAULT_WEIGHTS = {"words": -0.5,
+                   "three_letter_words": -1.0,
+                   "long_slots": 1.0,
+                   "cheater_squares": -2.0,
+                   "max_black_island": -0.5,
+                   "open_area": 0.25}
+
+
+def grids_to_array(grids):
+    """Stacks CrosswordGrid objects (or lists of rows) of the same size into a boolean array
+    of shape (grids, rows, columns) where True marks a black square."""
+    rows = [grid.grid if hasattr(grid, "grid") else grid for grid in grids]
+    return np.array([[[square == '#' for square in row] for row in grid] for grid in rows], dtype=bool)
+
+
+def slot_lengths(black):
+    """Returns (grid_index, length) arrays for every across and down slot of at least two
+    squares in the stack."""
+    indices = []
+    lengths = []
+    for white in (~black, ~black.transpose(0, 2, 1)):
+        #Pad each line with a black square on either side so every run has a start and an end
+        padded = np.pad(white, ((0, 0), (0, 0), (1, 1)))
+        edges = np.diff(padded.astype(np.int8), axis=2)
+        grid_index, _, start = np.nonzero(edges == 1)
+        _, _, end = np.nonzero(edges == -1)
+        run_lengths = end - start
+        words = run_lengths >= 2
+        indices.append(grid_index[words])
+        lengths.append(run_lengths[words])
+    return np.concatenate(indices), np.concatenate(lengths)
+
+
+def slot_length_histogram(black):
+    """Returns an array of shape (grids, longest possible slot + 1) counting the slots of each
+    length in every grid."""
+    grid_index, lengths = slot_lengths(black)
+    max_length = max(black.shape[1], black.shape[2])
+    counts = np.bincount(grid_index * (max_length + 1) + lengths, minlength=len(black) * (max_length + 1))
+    return counts.reshape(len(black), max_length + 1)
+
+
+def cheater_squares(black):
+    """Returns the number of cheater squares in every grid: black squares that could be made
+    white without changing the word count because exactly one horizontal and exactly one
+    vertical neighbor is white. The grid border counts as black."""
+    padded = np.pad(black, ((0, 0), (1, 1), (1, 1)), constant_values=True)
+    up = ~padded[:, :-2, 1:-1]
+    down = ~padded[:, 2:, 1:-1]
+    left = ~padded[:, 1:-1, :-2]
+    right = ~padded[:, 1:-1, 2:]
+    cheaters = black & (left ^ right) & (up ^ down)
+    return cheaters.sum(axis=(1, 2))
+
+
+def black_island_labels(black):
+    """Labels the orthogonally connected black square islands of every grid. Returns an int32
+    array with the same shape as black holding the island label of black squares (the flat
+    index of the island's first square in the stack, so unique across the whole stack) and -1
+    for white squares."""
+    flat_index = np.arange(black.size, dtype=np.int64).reshape(black.shape)
+    #Pairs of orthogonally adjacent black squares, smaller index first
+    first = np.concatenate([flat_index[:, :-1, :][black[:, :-1, :] & black[:, 1:, :]],
+                            flat_index[:, :, :-1][black[:, :, :-1] & black[:, :, 1:]]])
+    second = np.concatenate([flat_index[:, 1:, :][black[:, :-1, :] & black[:, 1:, :]],
+                             flat_index[:, :, 1:][black[:, :, :-1] & black[:, :, 1:]]])
+
+    #Union-find on all pairs at once: hook the larger root onto the smaller one, then compress
+    #paths by pointer jumping, until both squares of every pair share a root
+    parent = np.arange(black.size, dtype=np.int64)
+    while True:
+        first_root = parent[first]
+        second_root = parent[second]
+        unmerged = first_root != second_root
+        if not unmerged.any():
+            break
+        first_root = first_root[unmerged]
+        second_root = second_root[unmerged]
+        np.minimum.at(parent, np.maximum(first_root, second_root), np.minimum(first_root, second_root))
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+
+    return np.where(black, parent.reshape(black.shape), -1).astype(np.int32)
+
+
+def black_island_stats(black):
+    """Returns (island count, largest island size) arrays for every grid in the stack."""
+    labels = black_island_labels(black)
+    sizes = np.bincount(labels[black], minlength=black.size)
+    island_labels = np.flatnonzero(sizes)
+    sizes = sizes[island_labels]
+    grid_index = island_labels // (black.shape[1] * black.shape[2])
+
+    counts = np.bincount(grid_index, minlength=len(black))
+    largest = np.zeros(len(black), dtype=np.int64)
+    np.maximum.at(largest, grid_index, sizes)
+    return counts, largest
+
+
+def open_area(black, window=3):
+    """Returns the number of all white window x window blocks in every grid."""
+    white = (~black).astype(np.int32)
+    integral = np.pad(white.cumsum(axis=1).cumsum(axis=2), ((0, 0), (1, 0), (1, 0)))
+    sums = (integral[:, window:, window:] - integral[:, :-window, window:]
+            - integral[:, window:, :-window] + integral[:, :-window, :-window])
+    return (sums == window * window).sum(axis=(1, 2))
+
+
+def grid_metrics(black, long_length=7):
+    """Computes every metric for a stack of grids. Returns a dictionary of arrays of shape
+    (grids,) plus 'slot_length_histogram' of shape (grids, longest slot + 1). Slots of at least
+    long_length squares count towards 'long_slots'."""
+    histogram = slot_length_histogram(black)
+    lengths = np.arange(histogram.shape[1])
+    words = histogram.sum(axis=1)
+    islands, largest_island = black_island_stats(black)
+
+    return {"slot_length_histogram": histogram,
+            "words": words,
+            "three_letter_words": histogram[:, 3],
+            "long_slots": histogram[:, long_length:].sum(axis=1),
+            "mean_word_length": (histogram * lengths).sum(axis=1) / np.maximum(words, 1),
+            "black_squares": black.sum(axis=(1, 2)),
+            "cheater_squares": cheater_squares(black),
+            "black_islands": islands,
+            "max_black_island": largest_island,
+            "open_area": open_area(black)}
+
+
+def score_grids(black, weights=None, long_length=7, chunk_size=10000):
+    """Scores every grid in the stack as the weighted sum of its metrics (see grid_metrics()).
+    weights maps metric names to weights and defaults to DEFAULT_WEIGHTS. Grids are processed
+    chunk_size at a time to bound memory. Returns an array of scores, higher is better."""
+    weights = DEFAULT_WEIGHTS if weights is None else weights
+    scores = np.empty(len(black))
+    for start in range(0, len(black), chunk_size):
+        metrics = grid_metrics(black[start:start + chunk_size], long_length)
+        chunk_scores = np.zeros(len(metrics["words"]))
+        for name, weight in weights.items():
+            chunk_scores += weight * metrics[name]
+        scores[start:start + chunk_size] = chunk_scores
+    return scores
+
+
+def rank_grids(black, weights=None, top_fraction=0.01, top_k=None, long_length=7, chunk_size=10000):
+    """Returns the indices of the best scoring grids in the stack, best first. Keeps top_k grids
+    if given, otherwise the top_fraction of the stack (at least one grid)."""
+    scores = score_grids(black, weights, long_length, chunk_size)
+    if top_k is None:
+        top_k = max(1, int(len(scores) * top_fraction))
+    top_k = min(top_k, len(scores))
+
+    best = np.argpartition(-scores, top_k - 1)[:top_k]
+    return best[np.argsort(-scores[best], kind="stable")]
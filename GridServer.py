@@ -0,0 +1,447 @@
+import os
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+from collections import deque
+from urllib.parse import urlsplit, parse_qs
+from concurrent.futures import ProcessPoolExecutor
+
+from CrossBuild import CrosswordGrid
+from cli import parse_size
+
+
+"""Local HTTP server for black square generation. Grids are generated in warm worker processes
+that load the word list once, concurrent requests for the same size are batched into shared
+generation jobs, and a buffer of ready grids is kept for the common sizes. Grids are streamed
+back as they are ready in a chunked JSON response.
+
+Routes:
+    GET /generate?size=15x15&count=1 - {"size": [15, 15], "grids": [CrosswordGrid.to_dict(), ...]}
+    GET /stats                       - latency and queue statistics as JSON
+    GET /metrics                     - the same statistics in the Prometheus text format"""
+
+
+logger = logging.getLogger(__name__)
+
+#Request latency histogram bucket bounds in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+#Word list of the worker process, loaded once by init_worker()
+worker_word_list = None
+worker_max_difficulty = 1.0
+
+
+def init_worker(word_list_filename, max_difficulty):
+    """Loads the word list used for the fill prescreen in a worker process."""
+    global worker_word_list, worker_max_difficulty
+    random.seed() #Forked workers would otherwise all generate the same grids
+    if word_list_filename:
+        from ClueDatabase import WordList
+        worker_word_list = WordList(word_list_filename)
+    worker_max_difficulty = max_difficulty
+
+
+def generate_grids(size, count, timeout=None):
+    """Generates count grids of the given size in a worker process. Returns them as JSON strings
+    so the server can stream them without encoding them again. Raises RuntimeError if generation
+    gives up, for example because no grid passes the fill prescreen or the job has run for more
+    than timeout seconds, which frees the worker for the next job."""
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    grids = []
+    for _ in range(count):
+        grid = CrosswordGrid(size)
+        if worker_word_list is not None:
+            grid.enable_fill_prescreen(worker_word_list, worker_max_difficulty)
+        if not grid.generate_black_squares(deadline=deadline):
+            raise RuntimeError(f"Could not generate a {size[0]}x{size[1]} grid")
+        grids.append(json.dumps(grid.to_dict()))
+    return grids
+
+
+class GridRequest():
+    def __init__(self, count):
+        """A request waiting for count generated grids, which are put on its queue as they arrive."""
+        self.remaining = count
+        self.queue = asyncio.Queue()
+
+
+class GridServer():
+    def __init__(self, workers=None, word_list=None, max_difficulty=1.0, buffered_sizes=((15, 15),), buffer_size=8,
+                 batch_window=0.005, max_batch=64, max_count=100, max_dimension=25, job_timeout=60.0,
+                 keepalive_interval=1.0):
+        """workers is the number of worker processes (the CPU count by default). If word_list (a
+        filename) is given, generated grids must pass the fill prescreen against it. buffer_size
+        ready grids are kept for each of buffered_sizes. Requests arriving within batch_window
+        seconds of each other are generated together, up to max_batch grids per round. A round
+        fails if one of its jobs takes longer than job_timeout seconds; the worker gives the job up
+        at the same time, so its process is free again. While a client waits for grids, whitespace
+        is written to it every keepalive_interval seconds to notice if it went away."""
+        self.workers = workers
+        self.word_list = word_list
+        self.max_difficulty = max_difficulty
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.max_count = max_count
+        self.max_dimension = max_dimension
+        self.job_timeout = job_timeout
+        self.keepalive_interval = keepalive_interval
+
+        self.executor = None
+        self.servers = []
+        self.buffer_targets = {tuple(size): buffer_size for size in buffered_sizes}
+        self.buffers = {size: deque() for size in self.buffer_targets} #size -> ready grids as JSON
+        self.pending = {} #size -> deque of GridRequests waiting for grids
+        self.batchers = {} #size -> running batch task
+
+        #Metrics
+        self.requests = 0
+        self.errors = 0
+        self.cancelled = 0
+        self.grids_from_buffer = 0
+        self.grids_generated = 0
+        self.batches = 0
+        self.jobs_in_flight = 0
+        self.latency_count = 0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.latency_buckets = [0] * len(LATENCY_BUCKETS)
+
+    async def start(self, host="127.0.0.1", port=8765, unix_path=None):
+        """Starts the worker processes and listens on host:port, or on a Unix socket if unix_path is given."""
+        self.workers = self.workers or os.cpu_count() or 1
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker,
+                                            initargs=(self.word_list, self.max_difficulty))
+
+        #Start every worker now so the first requests do not pay for process startup
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.executor, generate_grids, (15, 15), 0)
+                               for _ in range(self.workers)))
+
+        if unix_path:
+            server = await asyncio.start_unix_server(self.handle, path=unix_path)
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+        self.servers.append(server)
+        for size in self.buffer_targets:
+            self.schedule(size)
+        logger.info("Listening on %s", unix_path or f"{host}:{server.sockets[0].getsockname()[1]}")
+        return server
+
+    async def close(self):
+        """Stops listening, cancels generation and shuts the worker processes down."""
+        for server in self.servers:
+            server.close()
+            await server.wait_closed()
+        self.servers = []
+        for task in self.batchers.values():
+            task.cancel()
+        self.batchers = {}
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+
+    async def get_grids(self, size, count):
+        """Yields count grids of the given size as JSON strings, buffered ones first."""
+        buffer = self.buffers.get(size)
+        while buffer and count:
+            count -= 1
+            self.grids_from_buffer += 1
+            yield buffer.popleft()
+
+        request = None
+        if count:
+            request = GridRequest(count)
+            self.pending.setdefault(size, deque()).append(request)
+        self.schedule(size) #Generate the requested grids and top the buffer back up
+
+        try:
+            for _ in range(count):
+                yield await request.queue.get()
+        finally:
+            if request is not None and request.remaining:
+                self.cancel(size, request)
+
+    def cancel(self, size, request):
+        """Withdraws a request that no longer wants its grids, for example because the client went
+        away, and stops generating grids of size if nothing else wants them."""
+        pending = self.pending.get(size)
+        if pending and request in pending:
+            self.cancelled += 1
+            pending.remove(request)
+            if not pending:
+                del self.pending[size]
+        if self.demand(size) <= 0 and size in self.batchers:
+            self.batchers.pop(size).cancel()
+
+    def schedule(self, size):
+        """Starts a batch task for size unless one is already running."""
+        if size not in self.batchers:
+            self.batchers[size] = asyncio.create_task(self.run_batches(size))
+
+    def demand(self, size):
+        """Returns the number of grids of size wanted by waiting requests and the buffer."""
+        waiting = sum(request.remaining for request in self.pending.get(size, ()))
+        return waiting + self.buffer_targets.get(size, 0) - len(self.buffers.get(size, ()))
+
+    def job_done(self, job):
+        """Counts a finished, failed or cancelled generation job."""
+        self.jobs_in_flight -= 1
+
+    async def run_batches(self, size):
+        """Generates grids of size in rounds until no request or buffer wants more. Each round
+        collects the requests that arrived within batch_window and splits the grids they need
+        into jobs for the workers. Jobs that have not started yet are dropped if the task is
+        cancelled. Cancelling a running job, or timing it out here, only drops its result: the
+        worker keeps going until generate_grids() reaches its own timeout."""
+        try:
+            await asyncio.sleep(self.batch_window)
+            loop = asyncio.get_running_loop()
+            while True:
+                demand = min(self.demand(size), self.max_batch)
+                if demand <= 0:
+                    break
+
+                #Several small jobs per worker so one slow grid does not hold up the rest of the round
+                per_job = max(1, demand // (4 * self.workers))
+                jobs = []
+                for start in range(0, demand, per_job):
+                    future = loop.run_in_executor(self.executor, generate_grids, size, min(per_job, demand - start),
+                                                  self.job_timeout)
+                    job = asyncio.ensure_future(asyncio.wait_for(future, self.job_timeout))
+                    job.add_done_callback(self.job_done)
+                    jobs.append(job)
+                self.batches += 1
+                self.jobs_in_flight += len(jobs)
+
+                try:
+                    for job in asyncio.as_completed(jobs):
+                        for grid in await job:
+                            self.deliver(size, grid)
+                finally:
+                    for job in jobs:
+                        job.cancel()
+        except Exception:
+            logger.exception("Generating %s grids failed", size)
+            for request in self.pending.pop(size, ()):
+                request.queue.put_nowait(None)
+        finally:
+            if self.batchers.get(size) is asyncio.current_task():
+                del self.batchers[size]
+
+    def deliver(self, size, grid):
+        """Hands a generated grid to the oldest waiting request, or to the buffer if none is waiting."""
+        self.grids_generated += 1
+        pending = self.pending.get(size)
+        if pending:
+            request = pending[0]
+            request.remaining -= 1
+            if not request.remaining:
+                pending.popleft()
+                if not pending:
+                    del self.pending[size]
+            request.queue.put_nowait(grid)
+        elif size in self.buffers:
+            self.buffers[size].append(grid)
+
+    def record_latency(self, seconds):
+        """Adds a request latency to the statistics."""
+        self.latency_count += 1
+        self.latency_sum += seconds
+        self.latency_max = max(self.latency_max, seconds)
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.latency_buckets[i] += 1
+
+    def stats(self):
+        """Returns the server statistics as a dictionary."""
+        def size_key(size):
+            return f"{size[0]}x{size[1]}"
+
+        return {"requests": self.requests,
+                "errors": self.errors,
+                "cancelled": self.cancelled,
+                "grids_from_buffer": self.grids_from_buffer,
+                "grids_generated": self.grids_generated,
+                "batches": self.batches,
+                "jobs_in_flight": self.jobs_in_flight,
+                "queued_grids": {size_key(size): sum(request.remaining for request in requests)
+                                 for size, requests in self.pending.items()},
+                "buffered_grids": {size_key(size): len(buffer) for size, buffer in self.buffers.items()},
+                "latency": {"count": self.latency_count,
+                            "mean": self.latency_sum / self.latency_count if self.latency_count else 0.0,
+                            "max": self.latency_max}}
+
+    def to_prometheus(self, prefix="crossbuild_server"):
+        """Returns the server statistics in the Prometheus text exposition format."""
+        stats = self.stats()
+        lines = [f"# HELP {prefix}_requests_total Number of generate requests.",
+                 f"# TYPE {prefix}_requests_total counter",
+                 f"{prefix}_requests_total {self.requests}",
+                 f"# HELP {prefix}_errors_total Number of rejected or failed requests.",
+                 f"# TYPE {prefix}_errors_total counter",
+                 f"{prefix}_errors_total {self.errors}",
+                 f"# HELP {prefix}_cancelled_total Number of requests abandoned by their client.",
+                 f"# TYPE {prefix}_cancelled_total counter",
+                 f"{prefix}_cancelled_total {self.cancelled}",
+                 f"# HELP {prefix}_grids_total Number of grids served by source.",
+                 f"# TYPE {prefix}_grids_total counter",
+                 f'{prefix}_grids_total{{source="buffer"}} {self.grids_from_buffer}',
+                 f'{prefix}_grids_total{{source="generated"}} {self.grids_generated}',
+                 f"# HELP {prefix}_batches_total Number of generation rounds.",
+                 f"# TYPE {prefix}_batches_total counter",
+                 f"{prefix}_batches_total {self.batches}",
+                 f"# HELP {prefix}_jobs_in_flight Generation jobs running in worker processes.",
+                 f"# TYPE {prefix}_jobs_in_flight gauge",
+                 f"{prefix}_jobs_in_flight {self.jobs_in_flight}",
+                 f"# HELP {prefix}_queued_grids Grids waiting to be generated for requests.",
+                 f"# TYPE {prefix}_queued_grids gauge"]
+        for size, count in sorted(stats["queued_grids"].items()):
+            lines.append(f'{prefix}_queued_grids{{size="{size}"}} {count}')
+        lines += [f"# HELP {prefix}_buffered_grids Ready grids in the buffer.",
+                  f"# TYPE {prefix}_buffered_grids gauge"]
+        for size, count in sorted(stats["buffered_grids"].items()):
+            lines.append(f'{prefix}_buffered_grids{{size="{size}"}} {count}')
+
+        lines += [f"# HELP {prefix}_request_seconds Time to serve generate requests.",
+                  f"# TYPE {prefix}_request_seconds histogram"]
+        for bound, count in zip(LATENCY_BUCKETS, self.latency_buckets):
+            lines.append(f'{prefix}_request_seconds_bucket{{le="{bound}"}} {count}')
+        lines += [f'{prefix}_request_seconds_bucket{{le="+Inf"}} {self.latency_count}',
+                  f"{prefix}_request_seconds_sum {self.latency_sum:.6f}",
+                  f"{prefix}_request_seconds_count {self.latency_count}"]
+        return '\n'.join(lines) + '\n'
+
+    async def handle(self, reader, writer):
+        """Serves one HTTP request on a connection."""
+        try:
+            request_line = (await reader.readline()).decode("latin-1").split()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass #Headers are not needed
+
+            if len(request_line) < 2 or request_line[0] != "GET":
+                await self.respond(writer, 405, {"error": "only GET is supported"})
+                return
+            url = urlsplit(request_line[1])
+            if url.path == "/generate":
+                await self.handle_generate(writer, parse_qs(url.query))
+            elif url.path == "/stats":
+                await self.respond(writer, 200, self.stats())
+            elif url.path == "/metrics":
+                await self.respond(writer, 200, self.to_prometheus(), "text/plain; version=0.0.4")
+            else:
+                await self.respond(writer, 404, {"error": f"no route {url.path}"})
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, writer, status, body, content_type="application/json"):
+        """Writes a complete response."""
+        if status >= 400:
+            self.errors += 1
+        data = (json.dumps(body) if content_type == "application/json" else body).encode("utf-8")
+        writer.write(f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\nContent-Type: {content_type}\r\n"
+                     f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode("latin-1") + data)
+        await writer.drain()
+
+    async def cancel_on_disconnect(self, writer, task, write_chunk):
+        """Cancels task once the connection is lost. The end of the request stream is not a
+        disconnect, since clients may shut down their sending side after the request, so a
+        whitespace chunk is written every keepalive_interval seconds instead and a failed write
+        closes the transport."""
+        while not writer.transport.is_closing():
+            await asyncio.sleep(self.keepalive_interval)
+            if not writer.transport.is_closing():
+                write_chunk(" ") #Whitespace between JSON values, ignored by the client
+        task.cancel()
+
+    async def handle_generate(self, writer, query):
+        """Streams the grids of a generate request as they become available. The request is
+        withdrawn if the client disconnects before all its grids are ready."""
+        start = time.perf_counter()
+        try:
+            size = parse_size(query.get("size", ["15x15"])[0])
+        except argparse.ArgumentTypeError as error:
+            await self.respond(writer, 400, {"error": str(error)})
+            return
+        try:
+            count = int(query.get("count", ["1"])[0])
+        except ValueError:
+            await self.respond(writer, 400, {"error": "count must be a number"})
+            return
+        if max(size) > self.max_dimension:
+            await self.respond(writer, 400, {"error": f"sizes must be at most {self.max_dimension}"})
+            return
+        if not 1 <= count <= self.max_count:
+            await self.respond(writer, 400, {"error": f"count must be between 1 and {self.max_count}"})
+            return
+
+        self.requests += 1
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                     b"Transfer-Encoding: chunked\r\nConnection: close\r\n\r\n")
+
+        def write_chunk(text):
+            data = text.encode("utf-8")
+            writer.write(f"{len(data):x}\r\n".encode("latin-1") + data + b"\r\n")
+
+        write_chunk(f'{{"size": [{size[0]}, {size[1]}], "grids": [')
+        separator = ""
+        grids = self.get_grids(size, count)
+        watcher = asyncio.create_task(self.cancel_on_disconnect(writer, asyncio.current_task(), write_chunk))
+        try:
+            async for grid in grids:
+                if grid is None:
+                    self.errors += 1
+                    break #Generation failed, end the list early
+                write_chunk(separator + grid)
+                separator = ", "
+                await writer.drain()
+        except asyncio.CancelledError:
+            if not watcher.done():
+                raise
+            return #The client went away
+        finally:
+            watcher.cancel()
+            await grids.aclose() #Withdraws the request if it still wants grids
+        write_chunk("]}\n")
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+        self.record_latency(time.perf_counter() - start)
+
+
+async def serve(host="127.0.0.1", port=8765, unix_path=None, **kwargs):
+    """Runs a GridServer until cancelled. Keyword arguments go to GridServer()."""
+    grid_server = GridServer(**kwargs)
+    server = await grid_server.start(host, port, unix_path)
+    try:
+        await server.serve_forever()
+    finally:
+        await grid_server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve generated crossword grids over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", default=None, help="listen on a Unix socket instead of host:port")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--word-list", default=None, help="word list generated grids must pass the fill prescreen against")
+    parser.add_argument("--sizes", nargs="*", type=parse_size, default=[(15, 15)], help="sizes to keep ready grids for")
+    parser.add_argument("--buffer-size", type=int, default=8)
+    parser.add_argument("--job-timeout", type=float, default=60.0, help="seconds before a generation job is given up on")
+    arguments = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(serve(arguments.host, arguments.port, arguments.unix, workers=arguments.workers,
+                          word_list=arguments.word_list, buffered_sizes=arguments.sizes,
+                          buffer_size=arguments.buffer_size, job_timeout=arguments.job_timeout))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
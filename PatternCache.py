@@ -0,0 +1,94 @@
+from collections import OrderedDict
+
+
+class PatternCache():
+    """Bounded LRU memo for WordList pattern and count queries. The size of an entry is the
+    number of words it holds (counts take one slot), and the least recently used entries are
+    evicted once the total passes max_size.
+
+    Entries are keyed by the cache token of the WordList that computed them, so a changed word
+    list or score cutoff never gets stale results. A dict shared between processes (for example
+    multiprocessing.Manager().dict()) can be given as shared: entries missing locally are looked
+    up there and new entries are published to it while it holds fewer than max_shared_entries."""
+
+    def __init__(self, max_size=1000000, shared=None, max_shared_entries=100000):
+        self.max_size = max_size
+        self.shared = shared
+        self.max_shared_entries = max_shared_entries
+
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def __getstate__(self):
+        """Only the shared store and the limits travel to other processes."""
+        return {"max_size": self.max_size, "shared": self.shared, "max_shared_entries": self.max_shared_entries}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    @staticmethod
+    def entry_size(value):
+        """Returns the number of slots an entry takes up."""
+        return len(value) + 1 if isinstance(value, tuple) else 1
+
+    def get_or_compute(self, key, compute):
+        """Returns the cached value for key, computing and storing it with compute() on a miss."""
+        value = self.entries.get(key)
+        if value is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+        if self.shared is not None:
+            value = self.shared.get(key)
+            if value is not None:
+                self.shared_hits += 1
+                self.store(key, value)
+                return value
+
+        self.misses += 1
+        value = compute()
+        self.store(key, value)
+        if self.shared is not None and len(self.shared) < self.max_shared_entries:
+            self.shared[key] = value
+        return value
+
+    def store(self, key, value):
+        """Adds an entry locally, evicting least recently used entries to stay within max_size."""
+        size = self.entry_size(value)
+        if size > self.max_size:
+            return
+
+        self.entries[key] = value
+        self.size += size
+        while self.size > self.max_size:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= self.entry_size(evicted)
+
+    def invalidate(self, token):
+        """Drops the local entries computed by a WordList with the given cache token to free their
+        space. Entries can never go stale since tokens are content hashes, so the shared store,
+        which other processes with the same word list may still be using, is left alone."""
+        for key in [key for key in self.entries if key[0] == token]:
+            self.size -= self.entry_size(self.entries.pop(key))
+
+    def clear(self):
+        """Drops every local entry and resets the statistics."""
+        self.entries.clear()
+        self.size = 0
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def stats(self):
+        """Returns a dictionary of hit and miss counts, the hit rate and the current size."""
+        lookups = self.hits + self.shared_hits + self.misses
+        return {"hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+                "entries": len(self.entries),
+                "size": self.size}
@@ -0,0 +1,102 @@
+import time
+from functools import wraps
+
+
+class Profiler():
+    """Counts calls and cumulative time of instrumented methods and counts named events such as
+    generation restarts. Methods are only wrapped while the profiler is enabled, so a disabled
+    profiler adds no overhead to the instrumented methods. Restarts are counted while the
+    profiler is enabled or count_restarts is set, which does not wrap anything."""
+
+    def __init__(self):
+        self.enabled = False
+        self.count_restarts = False
+        self.targets = [] #(class, method name) pairs to wrap when enabled
+        self.originals = {}
+        self.calls = {}
+        self.total_time = {}
+        self.restarts = {}
+
+    def instrument(self, cls, method_names):
+        """Registers methods of cls to be timed while the profiler is enabled."""
+        for name in method_names:
+            self.targets.append((cls, name))
+            if self.enabled:
+                self.wrap(cls, name)
+
+    def wrap(self, cls, name):
+        """Replaces cls.name with a wrapper that counts calls and time spent in the method."""
+        original = getattr(cls, name)
+        self.originals[(cls, name)] = original
+        key = cls.__name__ + '.' + name
+        self.calls.setdefault(key, 0)
+        self.total_time.setdefault(key, 0.0)
+
+        @wraps(original)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                self.calls[key] += 1
+                self.total_time[key] += time.perf_counter() - start
+
+        setattr(cls, name, wrapper)
+
+    def enable(self):
+        """Starts counting. Instrumented methods are wrapped until disable() is called."""
+        if self.enabled:
+            return
+        for cls, name in self.targets:
+            self.wrap(cls, name)
+        self.enabled = True
+
+    def disable(self):
+        """Stops counting and restores the original methods. Collected stats are kept."""
+        if not self.enabled:
+            return
+        for (cls, name), original in self.originals.items():
+            setattr(cls, name, original)
+        self.originals.clear()
+        self.enabled = False
+
+    def counting_restarts(self):
+        """Returns True if restarts are being counted."""
+        return self.enabled or self.count_restarts
+
+    def count_restart(self, reason):
+        """Counts a restart with the given reason."""
+        self.restarts[reason] = self.restarts.get(reason, 0) + 1
+
+    def reset(self):
+        """Clears all collected stats."""
+        for key in self.calls:
+            self.calls[key] = 0
+            self.total_time[key] = 0.0
+        self.restarts.clear()
+
+    def stats(self):
+        """Returns the collected stats as a dictionary of the form
+        {'calls': {method: count}, 'time': {method: seconds}, 'restarts': {reason: count}}."""
+        return {"calls": dict(self.calls),
+                "time": dict(self.total_time),
+                "restarts": dict(self.restarts)}
+
+    def to_prometheus(self, prefix="crossbuild"):
+        """Returns the collected stats in the Prometheus text exposition format."""
+        lines = [f"# HELP {prefix}_calls_total Number of calls to instrumented methods.",
+                 f"# TYPE {prefix}_calls_total counter"]
+        for key, count in sorted(self.calls.items()):
+            lines.append(f'{prefix}_calls_total{{method="{key}"}} {count}')
+
+        lines += [f"# HELP {prefix}_seconds_total Cumulative time spent in instrumented methods.",
+                  f"# TYPE {prefix}_seconds_total counter"]
+        for key, seconds in sorted(self.total_time.items()):
+            lines.append(f'{prefix}_seconds_total{{method="{key}"}} {seconds:.6f}')
+
+        lines += [f"# HELP {prefix}_restarts_total Number of generation restarts by reason.",
+                  f"# TYPE {prefix}_restarts_total counter"]
+        for reason, count in sorted(self.restarts.items()):
+            lines.append(f'{prefix}_restarts_total{{reason="{reason}"}} {count}')
+
+        return '\n'.join(lines) + '\n'
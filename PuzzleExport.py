@@ -0,0 +1,272 @@
+import os
+import json
+import struct
+import zipfile
+
+from CrossBuild import CrosswordGrid, split_puzzle
+
+
+"""Export of crossword puzzles to the Across Lite .puz format and ipuz JSON, and reading them
+back into CrosswordGrids. PuzzleWriter streams any number of puzzles into a zip file or a
+directory one at a time, and read_puzzles() streams them back out, so batches of thousands of
+puzzles never have to be held in memory at once.
+
+Squares without a letter are written as '-' in .puz solutions and as null in ipuz solutions.
+Words without a clue get an empty clue rather than the placeholder clue."""
+
+
+PUZ_MAGIC = b"ACROSS&DOWN\0"
+PUZ_VERSION = b"1.3\0"
+PUZ_ENCODING = "latin-1"
+PUZ_HEADER = struct.Struct("<H12sHII4s2sH12sBBHHH")
+
+IPUZ_VERSION = "http://ipuz.org/v2"
+IPUZ_KIND = "http://ipuz.org/crossword#1"
+
+
+def puz_checksum(data, checksum=0):
+    """The Across Lite checksum of a region of bytes, continuing from checksum."""
+    for byte in data:
+        checksum = (checksum >> 1 | (checksum & 1) << 15) + byte & 0xFFFF
+    return checksum
+
+
+def puz_text_checksum(title, author, copyright, clues, notes, checksum=0):
+    """The checksum of the strings section. Title, author, copyright and notes count with their
+    terminating NUL when not empty, clues without it."""
+    for text in (title, author, copyright):
+        if text:
+            checksum = puz_checksum(text + b"\0", checksum)
+    for clue in clues:
+        checksum = puz_checksum(clue, checksum)
+    if notes:
+        checksum = puz_checksum(notes + b"\0", checksum)
+    return checksum
+
+
+def numbered_clues(grid):
+    """Returns (number, direction, word) for every word of the grid in clue order: by number,
+    across before down."""
+    clues = [(int(key[:-1]), 0, word) for key, word in grid.across_words.items()]
+    clues += [(int(key[:-1]), 1, word) for key, word in grid.down_words.items()]
+    clues.sort(key=lambda clue: clue[:2])
+    return [(number, "across" if direction == 0 else "down", word) for number, direction, word in clues]
+
+
+def encode_text(text):
+    """Encodes a string for a .puz file, replacing characters latin-1 can not hold."""
+    return text.encode(PUZ_ENCODING, errors="replace")
+
+
+def to_puz(crossword, title="", author="", copyright="", notes=""):
+    """Returns a CrosswordGrid or CrosswordPuzzle as the bytes of an Across Lite .puz file."""
+    grid, _ = split_puzzle(crossword)
+    rows, cols = grid.size
+    cells = [cell for row in grid.grid for cell in row]
+    solution = bytes(ord('.') if cell == '#' else ord('-') if cell == ' ' else ord(cell) for cell in cells)
+    fill = bytes(ord('.') if cell == '#' else ord('-') for cell in cells)
+
+    title, author, copyright, notes = (encode_text(text) for text in (title, author, copyright, notes))
+    clues = [encode_text(word.clue_text()) for _, _, word in numbered_clues(grid)]
+
+    #Puzzle type 1 (normal), unscrambled
+    cib = struct.pack("<BBHHH", cols, rows, len(clues), 1, 0)
+    cib_checksum = puz_checksum(cib)
+    solution_checksum = puz_checksum(solution)
+    fill_checksum = puz_checksum(fill)
+    text_checksum = puz_text_checksum(title, author, copyright, clues, notes)
+    checksum = puz_text_checksum(title, author, copyright, clues, notes,
+                                 puz_checksum(fill, puz_checksum(solution, cib_checksum)))
+
+    masked = (cib_checksum, solution_checksum, fill_checksum, text_checksum)
+    masked_low = bytes(ord(mask) ^ (value & 0xFF) for mask, value in zip("ICHE", masked))
+    masked_high = bytes(ord(mask) ^ (value >> 8) for mask, value in zip("ATED", masked))
+
+    header = PUZ_HEADER.pack(checksum, PUZ_MAGIC, cib_checksum, int.from_bytes(masked_low, "little"),
+                             int.from_bytes(masked_high, "little"), PUZ_VERSION, b"\0\0", 0, b"\0" * 12,
+                             cols, rows, len(clues), 1, 0)
+    strings = b"".join(text + b"\0" for text in [title, author, copyright] + clues + [notes])
+    return header + solution + fill + strings
+
+
+def read_puz(data, verify=True):
+    """Reads the bytes of a .puz file into a CrosswordGrid with its clues. Raises ValueError if
+    the data is not a .puz file or, with verify, if its checksums do not match."""
+    if len(data) < PUZ_HEADER.size:
+        raise ValueError("Too short for a .puz file.")
+    (checksum, magic, cib_checksum, _, _, _, _, scrambled_checksum, _,
+     cols, rows, clue_count, _, scrambled) = PUZ_HEADER.unpack_from(data)
+    if magic != PUZ_MAGIC:
+        raise ValueError("Not a .puz file.")
+    if scrambled:
+        raise ValueError("Scrambled .puz files are not supported.")
+
+    start = PUZ_HEADER.size
+    solution = data[start:start + rows * cols]
+    fill = data[start + rows * cols:start + 2 * rows * cols]
+    strings = data[start + 2 * rows * cols:].split(b"\0")
+    if len(solution) != rows * cols or len(strings) < 4 + clue_count:
+        raise ValueError("Truncated .puz file.")
+    title, author, copyright = strings[:3]
+    clues = strings[3:3 + clue_count]
+    notes = strings[3 + clue_count]
+
+    if verify:
+        expected = puz_text_checksum(title, author, copyright, clues, notes,
+                                     puz_checksum(fill, puz_checksum(solution, puz_checksum(data[0x2C:0x34]))))
+        if expected != checksum or puz_checksum(data[0x2C:0x34]) != cib_checksum:
+            raise ValueError("The .puz checksums do not match.")
+
+    text = solution.decode(PUZ_ENCODING).replace('.', '#').replace('-', ' ')
+    grid = CrosswordGrid.from_rows([text[row * cols:(row + 1) * cols] for row in range(rows)])
+    for (_, _, word), clue in zip(numbered_clues(grid), clues):
+        word.clue = clue.decode(PUZ_ENCODING)
+    return grid
+
+
+def to_ipuz(crossword, title="", author="", copyright="", notes=""):
+    """Returns a CrosswordGrid or CrosswordPuzzle as an ipuz dictionary (json.dumps() it to write it)."""
+    grid, _ = split_puzzle(crossword)
+    rows, cols = grid.size
+    numbers = {}
+    clues = {"Across": [], "Down": []}
+    for number, direction, word in numbered_clues(grid):
+        numbers[(word.row, word.col)] = number
+        clues["Across" if direction == "across" else "Down"].append([number, word.clue_text()])
+
+    puzzle = [["#" if grid.grid[row][col] == '#' else numbers.get((row, col), 0) for col in range(cols)]
+              for row in range(rows)]
+    solution = [["#" if cell == '#' else None if cell == ' ' else cell for cell in row] for row in grid.grid]
+    ipuz = {"version": IPUZ_VERSION,
+            "kind": [IPUZ_KIND],
+            "dimensions": {"width": cols, "height": rows},
+            "block": "#",
+            "empty": 0,
+            "puzzle": puzzle,
+            "solution": solution,
+            "clues": clues}
+    for key, value in (("title", title), ("author", author), ("copyright", copyright), ("notes", notes)):
+        if value:
+            ipuz[key] = value
+    return ipuz
+
+
+def read_ipuz(data):
+    """Reads an ipuz dictionary, JSON string or bytes into a CrosswordGrid with its clues."""
+    if isinstance(data, (str, bytes)):
+        data = json.loads(data)
+    block = data.get("block", "#")
+
+    def cell_value(cell):
+        if isinstance(cell, dict):
+            cell = cell.get("value", cell.get("cell"))
+        return cell
+
+    rows = []
+    for solution_row, puzzle_row in zip(data["solution"], data["puzzle"]):
+        row = ""
+        for solution_cell, puzzle_cell in zip(solution_row, puzzle_row):
+            letter = cell_value(solution_cell)
+            if letter == block or cell_value(puzzle_cell) == block or letter is None and puzzle_cell is None:
+                row += '#'
+            elif isinstance(letter, str) and len(letter) == 1 and letter.isalpha():
+                row += letter.upper()
+            else:
+                row += ' '
+        rows.append(row)
+
+    grid = CrosswordGrid.from_rows(rows)
+    for direction, words in (("Across", grid.across_words), ("Down", grid.down_words)):
+        numbered = {int(key[:-1]): word for key, word in words.items()}
+        for clue in data.get("clues", {}).get(direction, []):
+            if isinstance(clue, dict):
+                number, text = clue.get("number"), clue.get("clue", "")
+            else:
+                number, text = clue[0], clue[1]
+            word = numbered.get(int(number))
+            if word is not None:
+                word.clue = text
+    return grid
+
+
+class PuzzleWriter():
+    """Writes puzzles one at a time into a zip file (if path ends in .zip) or a directory as
+    .puz or .ipuz files, so exporting a batch of any size only holds one puzzle in memory.
+
+        with PuzzleWriter("puzzles.zip", "puz") as writer:
+            for puzzle in puzzles:
+                writer.write(puzzle, title=...)"""
+
+    def __init__(self, path, format="puz", compression=zipfile.ZIP_DEFLATED):
+        if format not in ("puz", "ipuz"):
+            raise ValueError(f"Unknown puzzle format {format}, expected 'puz' or 'ipuz'.")
+        self.path = path
+        self.format = format
+        self.count = 0
+        if path.lower().endswith(".zip"):
+            self.archive = zipfile.ZipFile(path, "w", compression)
+        else:
+            self.archive = None
+            os.makedirs(path, exist_ok=True)
+
+    def write(self, crossword, name=None, **metadata):
+        """Writes a CrosswordGrid or CrosswordPuzzle. metadata (title, author, copyright, notes) is
+        stored with it. Files are named 000000.puz, 000001.puz, ... unless name is given.
+        Returns the name of the written file."""
+        if self.format == "puz":
+            data = to_puz(crossword, **metadata)
+        else:
+            data = json.dumps(to_ipuz(crossword, **metadata)).encode("utf-8")
+        name = name or f"{self.count:06d}.{self.format}"
+
+        if self.archive is not None:
+            self.archive.writestr(name, data)
+        else:
+            with open(os.path.join(self.path, name), "wb") as file:
+                file.write(data)
+        self.count += 1
+        return name
+
+    def close(self):
+        """Finishes the zip file, if writing to one."""
+        if self.archive is not None:
+            self.archive.close()
+            self.archive = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def export_puzzles(crosswords, path, format="puz", **metadata):
+    """Writes an iterable of CrosswordGrids or CrosswordPuzzles to a zip file or directory with
+    PuzzleWriter. Returns the number of puzzles written."""
+    with PuzzleWriter(path, format) as writer:
+        for crossword in crosswords:
+            writer.write(crossword, **metadata)
+        return writer.count
+
+
+def read_puzzle(name, data, verify=True):
+    """Reads the bytes of a .puz or .ipuz file into a CrosswordGrid, going by the file extension."""
+    if name.lower().endswith(".puz"):
+        return read_puz(data, verify)
+    return read_ipuz(data)
+
+
+def read_puzzles(path, verify=True):
+    """Yields (name, CrosswordGrid) for every .puz and .ipuz file in a zip file or directory, in
+    name order, reading one file at a time."""
+    extensions = (".puz", ".ipuz")
+    if path.lower().endswith(".zip"):
+        with zipfile.ZipFile(path) as archive:
+            for name in sorted(archive.namelist()):
+                if name.lower().endswith(extensions):
+                    yield name, read_puzzle(name, archive.read(name), verify)
+    else:
+        for name in sorted(os.listdir(path)):
+            if name.lower().endswith(extensions):
+                with open(os.path.join(path, name), "rb") as file:
+                    yield name, read_puzzle(name, file.read(), verify)
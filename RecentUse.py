@@ -0,0 +1,154 @@
+import math
+import time
+import pickle
+import hashlib
+
+from CrossBuild import split_puzzle
+
+
+"""Tracks which answers and clues were used in recently published puzzles without storing them.
+Uses are counted in a counting Bloom filter per window of puzzles (or of time), and the oldest
+window is dropped as a new one starts, so the memory use is fixed by the capacity and the number
+of windows however many puzzles are recorded. Counts are never underestimated, but a word that
+was never used can occasionally look used (about error_rate of the time at full capacity)."""
+
+
+FILTER_VERSION = 1
+MAX_COUNT = 255
+
+
+class RecentUseFilter():
+    def __init__(self, capacity=100000, error_rate=0.01, windows=4, window_puzzles=100, window_seconds=None):
+        """capacity is the number of distinct answers and clues a window holds at error_rate.
+        A new window is started after window_puzzles recorded puzzles, or window_seconds seconds
+        if given, and uses are remembered for the last windows windows."""
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.window_puzzles = window_puzzles
+        self.window_seconds = window_seconds
+
+        #Standard Bloom filter sizing: counters per window and hashes per key
+        self.size = max(8, int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+
+        self.windows = [bytearray(self.size) for _ in range(windows)] #Newest first, saturating counters
+        self.puzzles_in_window = 0
+        self.window_start = time.time()
+
+    def positions(self, key):
+        """Returns the counter positions of a key, from two 64 bit hashes (double hashing)."""
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hash_count)]
+
+    def add(self, key, count=1):
+        """Records count uses of a key in the current window."""
+        window = self.windows[0]
+        for position in self.positions(key):
+            window[position] = min(window[position] + count, MAX_COUNT)
+
+    def count(self, key):
+        """Returns the (possibly overestimated) number of uses of a key in the remembered windows."""
+        self.expire()
+        positions = self.positions(key)
+        return sum(min(window[position] for position in positions) for window in self.windows)
+
+    def __contains__(self, key):
+        """Returns True if a key was (probably) used in a remembered window."""
+        self.expire()
+        positions = self.positions(key)
+        return any(all(window[position] for position in positions) for window in self.windows)
+
+    def add_answer(self, answer):
+        """Records a use of an answer."""
+        self.add("A:" + answer)
+
+    def add_clue(self, clue):
+        """Records a use of a clue."""
+        self.add("C:" + clue)
+
+    def answer_count(self, answer):
+        """Returns how often an answer was used recently."""
+        return self.count("A:" + answer)
+
+    def clue_count(self, clue):
+        """Returns how often a clue was used recently."""
+        return self.count("C:" + clue)
+
+    def record_puzzle(self, puzzle):
+        """Records the answers and clues of a CrosswordPuzzle (or CrosswordGrid), starting a new
+        window first if the current one is full or too old."""
+        self.expire()
+        if self.puzzles_in_window >= self.window_puzzles:
+            self.rotate()
+
+        grid, _ = split_puzzle(puzzle)
+        for words in (grid.across_words, grid.down_words):
+            for word in words.values():
+                self.add_answer(word.word)
+                if word.clue_text(): #Words without a clue only have CrossBuild.PLACEHOLDER_CLUE
+                    self.add_clue(word.clue)
+        self.puzzles_in_window += 1
+
+    def expire(self):
+        """With window_seconds, starts one new window for every window_seconds that have passed
+        since the current window started, so uses older than all windows are forgotten however
+        long the filter went unused."""
+        if self.window_seconds is None:
+            return
+        elapsed = int((time.time() - self.window_start) // self.window_seconds)
+        if elapsed > 0:
+            window_start = self.window_start + elapsed * self.window_seconds
+            self.rotate(min(elapsed, len(self.windows)))
+            self.window_start = window_start #Windows stay aligned to whole window_seconds
+
+    def rotate(self, count=1):
+        """Starts count new windows, forgetting as many of the oldest."""
+        for _ in range(count):
+            oldest = self.windows.pop()
+            oldest[:] = bytes(self.size)
+            self.windows.insert(0, oldest)
+        self.puzzles_in_window = 0
+        self.window_start = time.time()
+
+    def save(self, filename):
+        """Writes the filter to a file."""
+        with open(filename, "wb") as file:
+            pickle.dump({"version": FILTER_VERSION,
+                         "capacity": self.capacity,
+                         "error_rate": self.error_rate,
+                         "window_puzzles": self.window_puzzles,
+                         "window_seconds": self.window_seconds,
+                         "windows": [bytes(window) for window in self.windows],
+                         "puzzles_in_window": self.puzzles_in_window,
+                         "window_start": self.window_start}, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, filename):
+        """Reads a filter written by save()."""
+        with open(filename, "rb") as file:
+            data = pickle.load(file)
+        if data.get("version") != FILTER_VERSION:
+            raise ValueError(f"{filename} is not a version {FILTER_VERSION} recent use filter.")
+
+        recent = cls(data["capacity"], data["error_rate"], len(data["windows"]), data["window_puzzles"],
+                     data["window_seconds"])
+        recent.windows = [bytearray(window) for window in data["windows"]]
+        recent.puzzles_in_window = data["puzzles_in_window"]
+        recent.window_start = data["window_start"]
+        recent.expire()
+        return recent
+
+    @classmethod
+    def load_or_create(cls, filename, **kwargs):
+        """Loads the filter from filename, or creates a new one with kwargs if the file does not exist yet."""
+        try:
+            return cls.load(filename)
+        except FileNotFoundError:
+            return cls(**kwargs)
+
+    def __repr__(self):
+        """Returns a string representation of the filter."""
+        return (f"RecentUseFilter with {len(self.windows)} windows of {self.size} counters "
+                f"and {self.hash_count} hashes per key.")
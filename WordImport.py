@@ -0,0 +1,257 @@
+import os
+import re
+import csv
+import heapq
+import itertools
+import argparse
+import tempfile
+import unicodedata
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+
+"""Imports raw word lists and clue files into the formats WordList (WordList.txt) and ClueDict
+(ClueDict.csv) load. Sources are streamed in chunks, each chunk is normalized, sorted and
+deduplicated in a worker process and written to a temporary run file, and the runs are merged
+with an external merge sort, so memory use does not depend on the size of the sources.
+
+Source kinds:
+    'list'   - one word per line
+    'scored' - one WORD;SCORE entry per line
+    'clues'  - CSV rows of answer, clue, optionally after a header row such as answer,clue"""
+
+
+NON_LETTERS = re.compile(r"[^A-Z]")
+WHITESPACE = re.compile(r"\s+")
+CLUE_HEADER_ANSWERS = {"answer", "answers", "word", "solution"}
+CLUE_HEADER_CLUES = {"clue", "clues", "hint"}
+
+#Most run files merged at once, well below the usual limit of 1024 open files
+MAX_MERGE_RUNS = 128
+
+
+def normalize_word(word, min_length=3, max_length=21):
+    """Returns word in capitals with accents and everything but the letters A-Z removed, or None
+    if the result is not between min_length and max_length letters long."""
+    word = unicodedata.normalize("NFKD", word).upper()
+    word = NON_LETTERS.sub("", word)
+    if min_length <= len(word) <= max_length:
+        return word
+    return None
+
+
+def normalize_chunk(lines, kind, min_length, max_length, default_score, separator):
+    """Normalizes a chunk of raw lines, or of CSV rows for clue sources. Returns a sorted,
+    duplicate free list of (word, score) pairs for word sources (keeping the highest score of a
+    word) or (answer, clue) pairs for clue sources."""
+    if kind == "clues":
+        records = set()
+        for row in lines:
+            if len(row) < 2:
+                continue
+            answer = normalize_word(row[0], min_length, max_length)
+            clue = WHITESPACE.sub(" ", row[1]).strip()
+            if answer and clue:
+                records.add((answer, clue))
+        return sorted(records)
+
+    scores = {}
+    for line in lines:
+        score = default_score
+        if kind == "scored":
+            word, _, raw_score = line.rpartition(separator)
+            try:
+                score = int(float(raw_score))
+            except ValueError:
+                continue
+        else:
+            word = line
+        word = normalize_word(word, min_length, max_length)
+        if word and (word not in scores or score > scores[word]):
+            scores[word] = score
+    return sorted(scores.items())
+
+
+def is_clue_header(row):
+    """Returns True if a CSV row is a header naming the answer and clue columns."""
+    return len(row) >= 2 and row[0].strip().lower() in CLUE_HEADER_ANSWERS \
+        and row[1].strip().lower() in CLUE_HEADER_CLUES
+
+
+def read_chunks(filename, chunk_size, kind="list"):
+    """Yields lists of at most chunk_size lines from a file without reading the whole file. For
+    clue sources the chunks hold the rows of csv.reader instead, so quoted clues spanning
+    several lines stay whole, and a header row is skipped."""
+    with open(filename, "r", encoding="utf-8", errors="replace", newline="") as file:
+        if kind == "clues":
+            records = csv.reader(file)
+            first = next(records, None)
+            if first is not None and not is_clue_header(first):
+                records = itertools.chain([first], records)
+        else:
+            records = (line.rstrip("\r\n") for line in file)
+
+        chunk = []
+        for record in records:
+            chunk.append(record)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def write_run(records, temp_dir):
+    """Writes sorted records to a temporary run file as tab separated lines. Returns its path."""
+    file_descriptor, path = tempfile.mkstemp(suffix=".run", dir=temp_dir)
+    with os.fdopen(file_descriptor, "w", encoding="utf-8") as file:
+        for key, value in records:
+            file.write(f"{key}\t{value}\n")
+    return path
+
+
+def read_run(path, numeric):
+    """Yields the (key, value) records of a run file in order."""
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            key, value = line.rstrip("\n").split("\t", 1)
+            yield key, int(value) if numeric else value
+
+
+def sort_runs(sources, chunk_size, processes, temp_dir, normalize_arguments):
+    """Normalizes every chunk of the (filename, kind) sources in a process pool and writes the
+    results to run files. At most two chunks per process are in flight at a time.
+    Returns the paths of the run files."""
+    runs = []
+    pending = deque()
+    max_pending = 2 * (processes or os.cpu_count() or 1)
+
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        for filename, kind in sources:
+            for chunk in read_chunks(filename, chunk_size, kind):
+                pending.append(executor.submit(normalize_chunk, chunk, kind, *normalize_arguments))
+                while len(pending) >= max_pending:
+                    runs.append(write_run(pending.popleft().result(), temp_dir))
+        while pending:
+            runs.append(write_run(pending.popleft().result(), temp_dir))
+
+    return runs
+
+
+def merge_runs(runs, numeric, temp_dir, fan_in=MAX_MERGE_RUNS):
+    """Merges sorted run files, yielding each key once. For word runs the highest score of a
+    word is kept; for clue runs identical (answer, clue) pairs are dropped. At most fan_in runs
+    are open at a time: while there are more, groups of fan_in runs are merged into intermediate
+    runs in temp_dir and deleted."""
+    runs = list(runs)
+    while len(runs) > fan_in:
+        merged_runs = []
+        for start in range(0, len(runs), fan_in):
+            group = runs[start:start + fan_in]
+            if len(group) == 1:
+                merged_runs.append(group[0])
+                continue
+            merged_runs.append(write_run(unique_records(group, numeric), temp_dir))
+            for path in group:
+                os.remove(path)
+        runs = merged_runs
+
+    yield from unique_records(runs, numeric)
+
+
+def unique_records(runs, numeric):
+    """Merges sorted run files in one pass, yielding each record once (see merge_runs())."""
+    merged = heapq.merge(*(read_run(path, numeric) for path in runs))
+    previous = None
+    for record in merged:
+        if previous is None:
+            previous = record
+        elif numeric and record[0] == previous[0]:
+            previous = (previous[0], max(previous[1], record[1]))
+        elif record != previous:
+            yield previous
+            previous = record
+    if previous is not None:
+        yield previous
+
+
+def as_sources(sources, default_kind):
+    """Turns a list of filenames or (filename, kind) pairs into (filename, kind) pairs."""
+    return [(source, default_kind) if isinstance(source, str) else tuple(source) for source in sources]
+
+
+def import_word_lists(sources, output="WordList.txt", scored_output=None, min_score=0, min_length=3,
+                      max_length=21, default_score=50, separator=";", chunk_size=100000, processes=None,
+                      temp_dir=None):
+    """Imports word sources (filenames of 'list' sources or (filename, kind) pairs) into a sorted,
+    duplicate free WordList file holding the words scoring at least min_score. Words from plain
+    lists get default_score. If scored_output is given every word is also written there as
+    WORD;SCORE. Returns the number of words written to output."""
+    count = 0
+    with tempfile.TemporaryDirectory(dir=temp_dir) as run_dir:
+        runs = sort_runs(as_sources(sources, "list"), chunk_size, processes, run_dir,
+                         (min_length, max_length, default_score, separator))
+
+        scored_file = open(scored_output, "w", encoding="utf-8") if scored_output else None
+        try:
+            with open(output, "w", encoding="utf-8") as file:
+                for word, score in merge_runs(runs, numeric=True, temp_dir=run_dir):
+                    if scored_file:
+                        scored_file.write(f"{word}{separator}{score}\n")
+                    if score >= min_score:
+                        file.write(word + "\n")
+                        count += 1
+        finally:
+            if scored_file:
+                scored_file.close()
+    return count
+
+
+def import_clues(sources, output="ClueDict.csv", min_length=3, max_length=21, chunk_size=100000,
+                 processes=None, temp_dir=None):
+    """Imports clue CSV sources (answer, clue rows) into a ClueDict file sorted by answer with
+    duplicate clues removed. Returns the number of clues written."""
+    count = 0
+    with tempfile.TemporaryDirectory(dir=temp_dir) as run_dir:
+        runs = sort_runs(as_sources(sources, "clues"), chunk_size, processes, run_dir,
+                         (min_length, max_length, 0, ","))
+
+        with open(output, "w", encoding="utf-8", newline="") as file:
+            writer = csv.writer(file)
+            for answer, clue in merge_runs(runs, numeric=False, temp_dir=run_dir):
+                writer.writerow([answer, clue])
+                count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import and clean up word lists and clues for CrossBuild.")
+    parser.add_argument("--words", nargs="*", default=[], help="plain word lists, one word per line")
+    parser.add_argument("--scored", nargs="*", default=[], help="scored word lists, one WORD;SCORE per line")
+    parser.add_argument("--clues", nargs="*", default=[], help="clue CSV files with answer, clue rows")
+    parser.add_argument("--word-output", default="WordList.txt")
+    parser.add_argument("--scored-output", default=None)
+    parser.add_argument("--clue-output", default="ClueDict.csv")
+    parser.add_argument("--min-score", type=int, default=0)
+    parser.add_argument("--min-length", type=int, default=3)
+    parser.add_argument("--max-length", type=int, default=21)
+    parser.add_argument("--chunk-size", type=int, default=100000)
+    parser.add_argument("--processes", type=int, default=None)
+    arguments = parser.parse_args()
+
+    word_sources = [(filename, "list") for filename in arguments.words] \
+                 + [(filename, "scored") for filename in arguments.scored]
+    if word_sources:
+        count = import_word_lists(word_sources, arguments.word_output, arguments.scored_output,
+                                  arguments.min_score, arguments.min_length, arguments.max_length,
+                                  chunk_size=arguments.chunk_size, processes=arguments.processes)
+        print(f"Wrote {count} words to {arguments.word_output}")
+
+    if arguments.clues:
+        count = import_clues(arguments.clues, arguments.clue_output, arguments.min_length,
+                             arguments.max_length, arguments.chunk_size, arguments.processes)
+        print(f"Wrote {count} clues to {arguments.clue_output}")
+
+
+if __name__ == "__main__":
+    main()
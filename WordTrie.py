@@ -0,0 +1,112 @@
+from array import array
+from bisect import bisect_left
+from collections import deque
+
+
+class WordTrie():
+    """A static trie over a list of words for prefix queries. Built with reverse=True it indexes
+    the reversed words and answers suffix queries instead.
+
+    Words are kept in one sorted list and every node stores the range of that list holding
+    the words below it, so a query walks the prefix once and returns a slice of the list: the
+    cost is proportional to the length of the prefix plus the number of words returned.
+    Nodes are stored column-wise in flat arrays (compact=True, the default) or plain lists,
+    and a branch holding a single word is not expanded any further."""
+
+    def __init__(self, words, reverse=False, compact=True):
+        self.reverse = reverse
+        self.keys = sorted(word[::-1] for word in words) if reverse else sorted(words)
+        self.words = [key[::-1] for key in self.keys] if reverse else self.keys
+
+        new_column = (lambda: array('i')) if compact else list
+        self.labels = new_column() #Code point of the letter leading into each node
+        self.lo = new_column() #Range [lo, hi) of self.keys below each node
+        self.hi = new_column()
+        self.first_child = new_column()
+        self.child_count = new_column()
+
+        self.add_node(0, 0, len(self.keys))
+        self.build()
+
+    def add_node(self, label, lo, hi):
+        """Appends a node to the node arrays and returns its index."""
+        self.labels.append(label)
+        self.lo.append(lo)
+        self.hi.append(hi)
+        self.first_child.append(0)
+        self.child_count.append(0)
+        return len(self.labels) - 1
+
+    def build(self):
+        """Expands the nodes breadth first so that the children of every node are contiguous."""
+        keys = self.keys
+        queue = deque([(0, 0)])
+        while queue:
+            node, depth = queue.popleft()
+            lo, hi = self.lo[node], self.hi[node]
+            if hi - lo < 2:
+                continue
+
+            #Keys ending at this node sort first
+            i = lo
+            while i < hi and len(keys[i]) == depth:
+                i += 1
+
+            self.first_child[node] = len(self.labels)
+            count = 0
+            while i < hi:
+                letter = keys[i][depth]
+                j = bisect_left(keys, keys[i][:depth] + chr(ord(letter) + 1), i, hi)
+                child = self.add_node(ord(letter), i, j)
+                queue.append((child, depth + 1))
+                count += 1
+                i = j
+            self.child_count[node] = count
+
+    def find(self, key):
+        """Returns the range (lo, hi) of self.keys starting with key."""
+        node = 0
+        for depth, letter in enumerate(key):
+            count = self.child_count[node]
+            if count == 0:
+                #Unexpanded branch holding at most one key
+                lo = self.lo[node]
+                if lo < self.hi[node] and self.keys[lo].startswith(key):
+                    return lo, lo + 1
+                return 0, 0
+
+            code = ord(letter)
+            first = self.first_child[node]
+            for child in range(first, first + count):
+                if self.labels[child] == code:
+                    node = child
+                    break
+            else:
+                return 0, 0
+
+        return self.lo[node], self.hi[node]
+
+    def query(self, affix):
+        """Returns all words starting with affix, or ending with it for a reversed trie.
+        Prefix results are alphabetical, suffix results are ordered by their reversed spelling."""
+        lo, hi = self.find(affix[::-1] if self.reverse else affix)
+        return self.words[lo:hi]
+
+    def count(self, affix):
+        """Returns the number of words starting (or, reversed, ending) with affix."""
+        lo, hi = self.find(affix[::-1] if self.reverse else affix)
+        return hi - lo
+
+    def __contains__(self, word):
+        """Returns True if word is in the trie."""
+        key = word[::-1] if self.reverse else word
+        lo, hi = self.find(key)
+        return lo < hi and self.keys[lo] == key
+
+    def __len__(self):
+        """Returns the number of words in the trie."""
+        return len(self.keys)
+
+    def __repr__(self):
+        """Returns a string representation of the trie."""
+        return f"WordTrie with {len(self.keys)} words and {len(self.labels)} nodes."
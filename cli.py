@@ -0,0 +1,282 @@
+import sys
+import argparse
+
+
+"""Command line interface for CrossBuild. Subcommands read and write grids as JSON lines (one
+CrosswordGrid.to_dict() per line) so they can be chained in shell pipelines:
+
+    crossbuild generate --size 15x15 --count 10 | crossbuild fill | crossbuild clue | crossbuild export -o out
+
+Only argparse is imported at startup. Each subcommand imports the modules it needs and loads
+word lists and clue files when it runs, so short invocations do not pay for the rest."""
+
+
+def parse_size(text):
+    """Parses a size such as '15x15' (or '15') into a (rows, columns) tuple."""
+    rows, _, cols = text.lower().partition('x')
+    try:
+        size = (int(rows), int(cols or rows))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid size {text!r}, expected something like 15x15")
+    if min(size) <= 10:
+        raise argparse.ArgumentTypeError(f"invalid size {text!r}, minis are not supported yet")
+    return size
+
+
+def open_input(filename):
+    """Returns the input file, stdin for '-'."""
+    return sys.stdin if filename == "-" else open(filename, "r", encoding="utf-8")
+
+
+def read_grids(filename):
+    """Yields the CrosswordGrids of a JSON lines file or stdin, or of the .puz and .ipuz files in
+    a zip file, directory or single puzzle file."""
+    import os
+    if filename.lower().endswith((".zip", ".puz", ".ipuz")) or os.path.isdir(filename):
+        import PuzzleExport
+        if os.path.isfile(filename) and not filename.lower().endswith(".zip"):
+            with open(filename, "rb") as file:
+                yield PuzzleExport.read_puzzle(filename, file.read())
+            return
+        for _, grid in PuzzleExport.read_puzzles(filename):
+            yield grid
+        return
+
+    import json
+    from CrossBuild import CrosswordGrid
+
+    file = open_input(filename)
+    try:
+        for line in file:
+            if line.strip():
+                yield CrosswordGrid.from_dict(json.loads(line))
+    finally:
+        if file is not sys.stdin:
+            file.close()
+
+
+def write_grid(grid):
+    """Writes a grid to stdout as a JSON line."""
+    import json
+    sys.stdout.write(json.dumps(grid.to_dict()) + "\n")
+
+
+def load_word_list(filename):
+    """Loads a WordList."""
+    from ClueDatabase import WordList
+    return WordList(filename)
+
+
+def load_clue_dict(filename):
+    """Loads a ClueDict from a CSV file or a SQLiteClueDict from a .db file."""
+    if filename.endswith(".db"):
+        from ClueDatabase import SQLiteClueDict
+        return SQLiteClueDict(filename)
+    from ClueDatabase import ClueDict
+    return ClueDict(filename)
+
+
+def seed(arguments):
+    """Seeds the random number generator if --seed was given."""
+    if arguments.seed is not None:
+        import random
+        random.seed(arguments.seed)
+
+
+def generate(arguments):
+    from CrossBuild import CrosswordGrid
+    seed(arguments)
+    word_list = load_word_list(arguments.words) if arguments.words else None
+    failures = 0
+    for i in range(arguments.count):
+        grid = CrosswordGrid(arguments.size)
+        if word_list is not None:
+            grid.enable_fill_prescreen(word_list, arguments.max_difficulty)
+        if not grid.generate_black_squares(max_iterations=arguments.max_attempts):
+            failures += 1
+            print(f"Grid {i} could not be generated in {arguments.max_attempts} attempts", file=sys.stderr)
+        elif arguments.text:
+            grid.display()
+        else:
+            write_grid(grid)
+    return 1 if failures else 0
+
+
+def load_recent(filename):
+    """Loads a RecentUseFilter, or creates a new one if the file does not exist yet."""
+    from RecentUse import RecentUseFilter
+    return RecentUseFilter.load_or_create(filename)
+
+
+def fill(arguments):
+    import random
+    import GridFill
+    seed(arguments)
+    word_list = load_word_list(arguments.words)
+    recent = load_recent(arguments.recent) if arguments.recent else None
+    failures = 0
+    for i, grid in enumerate(read_grids(arguments.input)):
+        if GridFill.fill_grid(grid, word_list, arguments.max_steps, random, recent, arguments.exclude_recent):
+            write_grid(grid)
+        else:
+            failures += 1
+            print(f"Grid {i} could not be filled", file=sys.stderr)
+    return 1 if failures else 0
+
+
+def clue(arguments):
+    from CrossBuild import CrosswordPuzzle
+    seed(arguments)
+    clue_dict = load_clue_dict(arguments.clues)
+    recent = load_recent(arguments.recent) if arguments.recent else None
+    for i, grid in enumerate(read_grids(arguments.input)):
+        puzzle = CrosswordPuzzle(grid)
+        missing = puzzle.generate_clues(clue_dict, recent)
+        if missing:
+            print(f"Grid {i} has no clues for {', '.join(missing)}", file=sys.stderr)
+        if recent is not None:
+            recent.record_puzzle(puzzle)
+        write_grid(grid)
+    if recent is not None:
+        recent.save(arguments.recent)
+    return 0
+
+
+def validate(arguments):
+    import json
+    word_list = load_word_list(arguments.words) if arguments.words else None
+    invalid = 0
+    for i, grid in enumerate(read_grids(arguments.input)):
+        problems = grid.validation_problems(word_list)
+        invalid += bool(problems)
+        print(json.dumps({"grid": i, "valid": not problems, "problems": problems}))
+    return 1 if invalid else 0
+
+
+def export(arguments):
+    if arguments.format in ("puz", "ipuz"):
+        import PuzzleExport
+        metadata = {"title": arguments.title, "author": arguments.author, "copyright": arguments.copyright}
+        count = PuzzleExport.export_puzzles(read_grids(arguments.input), arguments.output, arguments.format, **metadata)
+        print(f"Wrote {count} puzzles to {arguments.output}", file=sys.stderr)
+        return 0
+
+    import os
+    import GridRenderer
+    os.makedirs(arguments.output, exist_ok=True)
+    count = 0
+    for i, grid in enumerate(read_grids(arguments.input)):
+        filename = os.path.join(arguments.output, f"{i:06d}.{arguments.format}")
+        GridRenderer.render_file(grid, filename, arguments.cell_size, arguments.clues or None)
+        count += 1
+    print(f"Wrote {count} files to {arguments.output}", file=sys.stderr)
+    return 0
+
+
+def bench(arguments):
+    import time
+    from CrossBuild import CrosswordGrid, profiler
+    seed(arguments)
+    word_list = load_word_list(arguments.words) if arguments.words else None
+    profiler.count_restarts = True #Cheap, so the restart report is always shown
+    if arguments.profile:
+        profiler.enable()
+
+    times = []
+    failures = 0
+    for _ in range(arguments.count):
+        grid = CrosswordGrid(arguments.size)
+        if word_list is not None:
+            grid.enable_fill_prescreen(word_list, arguments.max_difficulty)
+        start = time.perf_counter()
+        if grid.generate_black_squares(max_iterations=arguments.max_attempts):
+            times.append(time.perf_counter() - start)
+        else:
+            failures += 1
+
+    times.sort()
+    if times:
+        print(f"{len(times)} grids of {arguments.size[0]}x{arguments.size[1]}: "
+              f"mean {sum(times) / len(times):.3f} s, median {times[len(times) // 2]:.3f} s, max {times[-1]:.3f} s")
+    if failures:
+        print(f"{failures} grids could not be generated in {arguments.max_attempts} attempts")
+    stats = profiler.stats()
+    for reason, count in sorted(stats["restarts"].items()):
+        print(f"  {count} restarts: {reason}")
+    if arguments.profile:
+        for method, seconds in sorted(stats["time"].items(), key=lambda item: -item[1]):
+            print(f"  {method}: {stats['calls'][method]} calls, {seconds:.3f} s")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="crossbuild", description="Build crossword grids and puzzles.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add_input(subparser):
+        subparser.add_argument("input", nargs="?", default="-",
+                               help="JSON lines file of grids (default: stdin), or .puz/.ipuz files in a zip file or directory")
+
+    def add_generation(subparser, count):
+        subparser.add_argument("--size", type=parse_size, default=(15, 15), help="grid size such as 15x15")
+        subparser.add_argument("--count", type=int, default=count)
+        subparser.add_argument("--words", default=None, help="only keep grids that pass the fill prescreen against this word list")
+        subparser.add_argument("--max-difficulty", type=float, default=1.0)
+        subparser.add_argument("--max-attempts", type=int, default=100, help="give up on a grid after this many restarts")
+        subparser.add_argument("--seed", type=int, default=None)
+
+    subparser = subparsers.add_parser("generate", help="generate black square layouts")
+    add_generation(subparser, 1)
+    subparser.add_argument("--text", action="store_true", help="print the grids instead of JSON")
+    subparser.set_defaults(run=generate)
+
+    subparser = subparsers.add_parser("fill", help="fill grids with words")
+    add_input(subparser)
+    subparser.add_argument("--words", default="WordList.txt")
+    subparser.add_argument("--max-steps", type=int, default=20000)
+    subparser.add_argument("--recent", default=None, help="recent use filter file, recently used answers are tried last")
+    subparser.add_argument("--exclude-recent", action="store_true", help="leave recently used answers out entirely")
+    subparser.add_argument("--seed", type=int, default=None)
+    subparser.set_defaults(run=fill)
+
+    subparser = subparsers.add_parser("clue", help="add clues to filled grids")
+    add_input(subparser)
+    subparser.add_argument("--clues", default="ClueDict.csv", help="clue CSV file or SQLite .db file")
+    subparser.add_argument("--recent", default=None,
+                           help="recent use filter file; the least recently used clues are picked and the puzzles recorded in it")
+    subparser.add_argument("--seed", type=int, default=None)
+    subparser.set_defaults(run=clue)
+
+    subparser = subparsers.add_parser("validate", help="check grids against the construction rules")
+    add_input(subparser)
+    subparser.add_argument("--words", default=None, help="also check words against this word list")
+    subparser.set_defaults(run=validate)
+
+    subparser = subparsers.add_parser("export", help="export grids as images or .puz/ipuz puzzles")
+    add_input(subparser)
+    subparser.add_argument("-o", "--output", default="Exports", help="directory, or a .zip file for puz and ipuz")
+    subparser.add_argument("--format", choices=["png", "svg", "puz", "ipuz"], default="png")
+    subparser.add_argument("--cell-size", type=int, default=32)
+    subparser.add_argument("--clues", action="store_true", help="draw the clue lists next to png and svg grids")
+    subparser.add_argument("--title", default="")
+    subparser.add_argument("--author", default="")
+    subparser.add_argument("--copyright", default="")
+    subparser.set_defaults(run=export)
+
+    subparser = subparsers.add_parser("bench", help="time black square generation")
+    add_generation(subparser, 20)
+    subparser.add_argument("--profile", action="store_true", help="also report time per instrumented method")
+    subparser.set_defaults(run=bench)
+    return parser
+
+
+def main(argv=None):
+    arguments = build_parser().parse_args(argv)
+    try:
+        return arguments.run(arguments)
+    except BrokenPipeError:
+        return 1 #The rest of the pipeline went away
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,53 @@
+import os
+import sys
+import json
+import subprocess
+
+import pytest
+
+import cli
+
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "crossbuild")
+
+
+def run(*arguments, input=None):
+    """Runs the crossbuild script, returning (exit code, stdout)."""
+    result = subprocess.run([sys.executable, SCRIPT, *arguments], input=input, capture_output=True, text=True,
+                            timeout=120)
+    return result.returncode, result.stdout
+
+
+def test_generate_pipes_into_validate():
+    code, grids = run("generate", "--count", "2", "--seed", "1")
+    assert code == 0
+    lines = grids.splitlines()
+    assert len(lines) == 2
+    assert all(json.loads(line)["size"] == [15, 15] for line in lines)
+
+    code, report = run("validate", input=grids)
+    assert code == 0
+    assert [json.loads(line) for line in report.splitlines()] == [{"grid": 0, "valid": True, "problems": []},
+                                                                   {"grid": 1, "valid": True, "problems": []}]
+
+
+def test_validate_reports_broken_grid(tmp_path, capsys):
+    assert cli.main(["generate", "--seed", "2"]) == 0
+    grid = json.loads(capsys.readouterr().out)
+    #Flipping the top left square breaks rotational symmetry
+    row = grid["grid"][0]
+    grid["grid"][0] = ("#" if row[0] != "#" else " ") + row[1:]
+    path = tmp_path / "grids.jsonl"
+    path.write_text(json.dumps(grid) + "\n")
+
+    assert cli.main(["validate", str(path)]) == 1
+    result = json.loads(capsys.readouterr().out)
+    assert result["grid"] == 0 and not result["valid"] and result["problems"]
+
+
+@pytest.mark.parametrize("size", ["9x9", "15by15", "x15"])
+def test_generate_rejects_bad_sizes(size, capsys):
+    with pytest.raises(SystemExit) as error:
+        cli.main(["generate", "--size", size])
+    assert error.value.code == 2
+    assert "invalid size" in capsys.readouterr().err
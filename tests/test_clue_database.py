@@ -0,0 +1,101 @@
+import os
+import csv
+import threading
+
+import pytest
+
+from ClueDatabase import SQLiteClueDict
+
+
+"""Tests for SQLiteClueDict."""
+
+
+@pytest.fixture
+def clue_dict(tmp_path):
+    clue_dict = SQLiteClueDict(str(tmp_path / "ClueDict.db"), pool_size=2)
+    yield clue_dict
+    clue_dict.close()
+
+
+def answer(i):
+    return f"WORD{i:04d}"
+
+
+def test_get_clues_for_words_in_batches(clue_dict):
+    count = SQLiteClueDict.BATCH_SIZE * 2 + 10
+    clue_dict.add_clues([(answer(i), f"Clue {i}") for i in range(count)] + [(answer(3), "Another clue")])
+
+    #More answers than one batch, with duplicates and answers that have no clues
+    words = [answer(i) for i in range(count + 5)] + [answer(3), answer(0)]
+    clues = clue_dict.get_clues_for_words(words)
+    assert list(clues) == list(dict.fromkeys(words))
+    assert clues[answer(3)] == ["Clue 3", "Another clue"]
+    assert clues[answer(count - 1)] == [f"Clue {count - 1}"]
+    assert clues[answer(count + 1)] == []
+    assert all(clues[answer(i)] == clue_dict.get_clues_for_word(answer(i)) for i in range(0, count, 37))
+    assert clue_dict.get_clues_for_words([]) == {}
+
+
+def test_import_csv(clue_dict, tmp_path):
+    path = tmp_path / "ClueDict.csv"
+    with open(path, "w", newline="") as file:
+        csv.writer(file).writerows([(answer(i), f"Clue, {i}") for i in range(25)] + [("BAD",)])
+
+    assert clue_dict.import_csv(str(path), batch_size=4) == 25
+    assert len(clue_dict) == 25
+    assert clue_dict.get_clues_for_word(answer(7)) == ["Clue, 7"]
+    assert list(clue_dict.items())[:2] == [(answer(0), "Clue, 0"), (answer(1), "Clue, 1")]
+    assert clue_dict.get_random_clue_for_word(answer(24)) == "Clue, 24"
+    assert clue_dict.get_random_clue_for_word("MISSING") is None
+
+
+def test_concurrent_thread_reads(clue_dict):
+    clue_dict.add_clues([(answer(i), f"Clue {i}") for i in range(200)])
+    errors = []
+
+    def read(offset):
+        try:
+            for i in range(offset, 200, 8):
+                assert clue_dict.get_clues_for_word(answer(i)) == [f"Clue {i}"]
+                assert clue_dict.get_clues_for_words([answer(i), answer(i - 1)])[answer(i)] == [f"Clue {i}"]
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=read, args=(offset,)) for offset in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert clue_dict.pool.qsize() <= clue_dict.pool_size
+
+
+def test_pool_is_reset_after_fork(clue_dict):
+    clue_dict.add_clues([("OPERA", "Grand work")])
+    assert clue_dict.get_clues_for_word("OPERA") == ["Grand work"]
+    parent_pool = clue_dict.pool
+    assert parent_pool.qsize() == 1
+
+    read_end, write_end = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            clues = clue_dict.get_clues_for_word("OPERA")
+            ok = clues == ["Grand work"] and clue_dict.pool is not parent_pool and parent_pool.qsize() == 1
+            os.write(write_end, b"ok" if ok else repr(clues).encode())
+        finally:
+            os._exit(0)
+
+    os.close(write_end)
+    result = os.read(read_end, 100)
+    os.close(read_end)
+    os.waitpid(pid, 0)
+    assert result == b"ok"
+    assert clue_dict.pool is parent_pool
+    assert clue_dict.get_clues_for_word("OPERA") == ["Grand work"]
+
+
+@pytest.mark.parametrize("database", [":memory:", ""])
+def test_in_memory_databases_are_rejected(database):
+    with pytest.raises(ValueError):
+        SQLiteClueDict(database)
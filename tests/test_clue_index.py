@@ -0,0 +1,150 @@
+import os
+import re
+import csv
+import pickle
+import random
+
+import pytest
+
+from ClueIndex import ClueIndex, tokenize, INDEX_VERSION
+from ClueDatabase import ClueDict, SQLiteClueDict, WordList
+
+
+"""Tests for ClueIndex. search() is compared with a brute force scan of a random clue corpus
+drawn from a small vocabulary, so most queries have several matches and repeated terms."""
+
+
+VOCABULARY = ["opera", "grand", "star", "river", "in", "the", "of", "a", "french", "city", "old",
+              "film", "role", "sea", "bird", "king", "music", "note", "part", "200", "go"]
+
+QUERIES = ["opera", "grand opera", '"grand opera"', '"opera grand"', "the the", '"the the"',
+           "river sea", '"of the" king', "200", "Star!", '"star" bird', "missing", '"grand missing"',
+           '"a"', "", "French, city", '"old film role"']
+
+PATTERNS = ["A??", "?O*", "*E", "B???", "XYZ", "*"]
+
+
+def random_clues(count, seed=0):
+    random_generator = random.Random(seed)
+    answers = ["".join(random_generator.choice("ABEGORST") for _ in range(random_generator.randint(3, 5)))
+               for _ in range(count // 4)]
+    clues = []
+    for _ in range(count):
+        words = [random_generator.choice(VOCABULARY) for _ in range(random_generator.randint(1, 8))]
+        words[0] = words[0].capitalize()
+        clues.append((random_generator.choice(answers), " ".join(words) + random_generator.choice(["", ".", "?"])))
+    return clues
+
+
+def brute_force(clues, query, answer_pattern=None):
+    phrases = [tokens for tokens in (tokenize(phrase or term) for phrase, term in re.findall(r'"([^"]*)"|(\S+)', query))
+               if tokens]
+    if not phrases and answer_pattern is None:
+        return []
+    regex = re.compile(answer_pattern.replace('?', '.').replace('*', '.*')) if answer_pattern else None
+
+    results = []
+    for answer, clue in sorted(clues, key=lambda pair: pair[0]):
+        if regex is not None and not regex.fullmatch(answer):
+            continue
+        clue_tokens = tokenize(clue)
+        if all(any(clue_tokens[start:start + len(tokens)] == tokens for start in range(len(clue_tokens)))
+               for tokens in phrases):
+            results.append((answer, clue))
+    return results
+
+
+@pytest.fixture(scope="module")
+def clues():
+    return random_clues(2000)
+
+
+@pytest.fixture(scope="module")
+def index(clues):
+    return ClueIndex(clues)
+
+
+@pytest.fixture(scope="module")
+def word_list(clues, tmp_path_factory):
+    path = tmp_path_factory.mktemp("words") / "WordList.txt"
+    path.write_text("\n".join(sorted({answer for answer, _ in clues} | {"ZZZ", "BEEF"})) + "\n")
+    return WordList(str(path))
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_search_matches_brute_force(clues, index, query):
+    assert index.search(query) == brute_force(clues, query)
+
+
+@pytest.mark.parametrize("pattern", PATTERNS)
+@pytest.mark.parametrize("query", ["", "opera", '"of the"', "river sea"])
+def test_search_answer_pattern_matches_brute_force(clues, index, word_list, query, pattern):
+    expected = brute_force(clues, query, pattern)
+    assert index.search(query, answer_pattern=pattern) == expected
+    assert index.search(query, answer_pattern=pattern, word_list=word_list) == expected
+
+
+def test_search_limit(clues, index):
+    expected = brute_force(clues, "opera")
+    assert len(expected) > 5
+    assert index.search("opera", limit=5) == expected[:5]
+
+
+def test_save_and_load(clues, index, tmp_path):
+    filename = str(tmp_path / "clues.index")
+    index.save(filename)
+    loaded = ClueIndex.load(filename)
+    for query in QUERIES:
+        assert loaded.search(query) == index.search(query)
+
+
+def write_clues(path, clues):
+    with open(path, "w", newline="") as file:
+        csv.writer(file).writerows(clues)
+
+
+def test_load_or_build_rebuilds_after_csv_changes(tmp_path):
+    csv_path = str(tmp_path / "ClueDict.csv")
+    filename = str(tmp_path / "clues.index")
+    write_clues(csv_path, [("OPERA", "Grand work"), ("STAR", "Film lead")])
+
+    index = ClueIndex.load_or_build(filename, ClueDict(csv_path))
+    assert index.search("grand") == [("OPERA", "Grand work")]
+    assert os.path.exists(filename)
+
+    #An unchanged source loads the saved index
+    assert ClueIndex.load_or_build(filename, ClueDict(csv_path)).source == index.source
+
+    write_clues(csv_path, [("OPERA", "Grand work"), ("STAR", "Film lead"), ("ARIA", "Grand solo")])
+    stat = os.stat(csv_path)
+    os.utime(csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    rebuilt = ClueIndex.load_or_build(filename, ClueDict(csv_path))
+    assert rebuilt.search("grand") == [("ARIA", "Grand solo"), ("OPERA", "Grand work")]
+    assert ClueIndex.load(filename).search("solo") == [("ARIA", "Grand solo")]
+
+
+def test_load_or_build_rebuilds_after_sqlite_changes(tmp_path):
+    clue_dict = SQLiteClueDict(str(tmp_path / "ClueDict.db"))
+    clue_dict.add_clues([("OPERA", "Grand work")])
+    filename = str(tmp_path / "clues.index")
+    assert ClueIndex.load_or_build(filename, clue_dict).search("opera") == []
+
+    #New clues go to the write ahead log, so the database file itself is unchanged
+    clue_dict.add_clues([("ARIA", "Opera solo")])
+    assert ClueIndex.load_or_build(filename, clue_dict).search("opera") == [("ARIA", "Opera solo")]
+
+
+def test_load_or_build_rebuilds_damaged_index(tmp_path):
+    csv_path = str(tmp_path / "ClueDict.csv")
+    filename = str(tmp_path / "clues.index")
+    write_clues(csv_path, [("OPERA", "Grand work")])
+    ClueIndex.load_or_build(filename, ClueDict(csv_path))
+
+    with open(filename, "rb") as file:
+        data = file.read()
+    for damaged in (data[:len(data) // 2], b"", pickle.dumps({"version": INDEX_VERSION})):
+        with open(filename, "wb") as file:
+            file.write(damaged)
+        assert ClueIndex.load_or_build(filename, ClueDict(csv_path)).search("grand") == [("OPERA", "Grand work")]
+    #No temporary files are left behind
+    assert sorted(os.listdir(tmp_path)) == ["ClueDict.csv", "clues.index"]
@@ -0,0 +1,197 @@
+import random
+
+from CrossBuild import CrosswordGrid
+from ClueDatabase import WordList
+
+
+def rows_of(grid):
+    return [''.join(row) for row in grid.grid]
+
+
+def black_squares(grid):
+    return sum(row.count('#') for row in grid.grid)
+
+
+#First row of grid_with_slot() before any word is added
+EMPTY_ROW = '     #' + ' ' * 9
+
+
+def grid_with_slot():
+    """Returns a 15x15 grid whose first across slot is five squares long."""
+    grid = CrosswordGrid((15, 15))
+    grid.place_black_square(0, 5)
+    grid.commit()
+    return grid
+
+
+def test_rollback_to_checkpoint():
+    grid = CrosswordGrid((15, 15))
+    grid.place_black_square(0, 4)
+    checkpoint = grid.checkpoint()
+    grid.place_black_square(3, 3)
+    grid.set_cell(7, 7, 'A')
+    grid.rollback(checkpoint)
+
+    assert grid.grid[3][3] == ' ' and grid.grid[11][11] == ' ' and grid.grid[7][7] == ' '
+    assert grid.grid[0][4] == '#' and grid.grid[14][10] == '#'
+    assert grid.num_black_squares == black_squares(grid) == 2
+    assert len(grid.journal) == checkpoint
+
+
+def test_rollback_drops_commits_after_checkpoint():
+    grid = CrosswordGrid((15, 15))
+    checkpoint = grid.checkpoint()
+    grid.set_cell(0, 0, 'A')
+    grid.commit()
+    grid.rollback(checkpoint)
+
+    assert grid.journal.marks == [0]
+    assert not grid.undo()
+
+
+def test_undo_redo():
+    grid = grid_with_slot()
+    before = rows_of(grid)
+    assert grid.add_word('HELLO', 0, 0, 'across')
+
+    assert grid.undo()
+    assert rows_of(grid) == before
+    assert grid.redo()
+    assert rows_of(grid)[0].startswith('HELLO#')
+    assert grid.across_words['1A'].word == 'HELLO'
+    assert not grid.redo()
+
+    assert grid.undo() and grid.undo()
+    assert rows_of(grid)[0] == ' ' * 15
+    assert grid.num_black_squares == black_squares(grid) == 0
+    assert not grid.undo()
+
+
+def test_redo_after_new_edit():
+    grid = grid_with_slot()
+    assert grid.add_word('HELLO', 0, 0, 'across')
+    assert grid.undo()
+    grid.set_cell(7, 7, '#')
+
+    #The new edit discards the undone word instead of merging with it
+    assert not grid.redo()
+    assert rows_of(grid)[0] == EMPTY_ROW
+    assert grid.undo()
+    assert grid.grid[7][7] == ' '
+    assert grid.redo()
+    assert grid.grid[7][7] == '#' and rows_of(grid)[0] == EMPTY_ROW
+
+
+def test_new_edit_is_its_own_undo_step():
+    grid = grid_with_slot()
+    assert grid.add_word('HELLO', 0, 0, 'across')
+    grid.set_cell(7, 7, '#')
+    assert not grid.redo()
+
+    assert grid.undo()
+    assert grid.grid[7][7] == ' ' and rows_of(grid)[0].startswith('HELLO')
+    assert grid.undo()
+    assert rows_of(grid)[0] == EMPTY_ROW
+
+
+def test_num_black_squares_tracks_edits():
+    grid = CrosswordGrid((15, 15))
+    grid.place_black_square(0, 4)
+    grid.place_black_square(7, 7)
+    grid.set_cell(0, 4, ' ')
+    grid.set_cell(0, 4, '#')
+    grid.set_cell(0, 4, '#')
+    assert grid.num_black_squares == black_squares(grid) == 3
+
+    checkpoint = grid.checkpoint()
+    grid.remove_black_square(0, 4)
+    grid.set_cell(1, 1, '#')
+    assert grid.num_black_squares == black_squares(grid) == 2
+    grid.rollback(checkpoint)
+    assert grid.num_black_squares == black_squares(grid) == 3
+
+    grid.commit()
+    grid.set_cell(2, 2, '#')
+    assert grid.undo()
+    assert grid.num_black_squares == black_squares(grid) == 3
+    assert grid.redo()
+    assert grid.num_black_squares == black_squares(grid) == 4
+    while grid.undo():
+        assert grid.num_black_squares == black_squares(grid)
+    assert grid.num_black_squares == 0
+
+
+def word_list(tmp_path, words):
+    path = tmp_path / "WordList.txt"
+    path.write_text("\n".join(sorted(words)) + "\n")
+    return WordList(str(path))
+
+
+def test_add_word_must_fill_a_slot():
+    grid = grid_with_slot()
+    assert not grid.add_word('CAT', 0, 0, 'across')
+    assert not grid.add_word('HELLOS', 0, 0, 'across')
+    assert not grid.add_word('ELLO', 0, 1, 'across')
+    assert not grid.add_word('HELLO', 0, 5, 'across')
+    assert not grid.add_word('HELLO', 0, 11, 'across')
+    assert rows_of(grid)[0] == EMPTY_ROW
+    assert len(grid.journal) == 2
+
+    assert grid.add_word('hello', 0, 0, 'across')
+    assert rows_of(grid)[0] == 'HELLO' + EMPTY_ROW[5:]
+    assert grid.add_word('H' * 15, 0, 0, 'down')
+    assert grid.down_words['1D'].word == 'H' * 15
+
+
+def test_add_word_must_agree_with_placed_letters():
+    grid = grid_with_slot()
+    assert grid.add_word('HELLO', 0, 0, 'across')
+    assert not grid.add_word('X' * 15, 0, 1, 'down')
+    assert grid.add_word('L' * 15, 0, 2, 'down')
+
+
+def test_add_word_checks_crossing_slots(tmp_path):
+    grid = grid_with_slot()
+    words = word_list(tmp_path, ['HELLO', 'WORLD'] + [letter * 15 for letter in 'HELO'])
+    before = rows_of(grid)
+    changes = len(grid.journal)
+
+    #No down word starts with W, so the placement is rolled back
+    assert not grid.add_word('WORLD', 0, 0, 'across', words)
+    assert rows_of(grid) == before
+    assert len(grid.journal) == changes
+
+    assert grid.add_word('HELLO', 0, 0, 'across', words)
+    before = rows_of(grid)
+    changes = len(grid.journal)
+
+    #The across slot of the last row is only nine squares long
+    assert not grid.add_word('H' * 15, 0, 0, 'down', words)
+    assert rows_of(grid) == before
+    assert len(grid.journal) == changes
+    assert grid.num_black_squares == black_squares(grid)
+
+    assert grid.undo()
+    assert rows_of(grid)[0] == EMPTY_ROW
+
+
+def test_themed_black_squares_keep_theme_slots():
+    random.seed(0)
+    grid = CrosswordGrid((15, 15))
+    assert grid.generate_themed_black_squares([15, (3, 0, 4, 'down')])
+    assert sorted(grid.theme_slots) == [(0, 4, 'down', 3), (7, 0, 'across', 15), (12, 10, 'down', 3)]
+    assert grid.theme_slots_intact()
+    assert all(grid.grid[row][col] != '#' for row, col in grid.fixed_white_squares)
+    assert all(grid.grid[row][col] == '#' for row, col in grid.fixed_black_squares)
+    assert grid.num_black_squares == black_squares(grid)
+
+
+def test_themed_black_squares_reject_conflicting_entries():
+    grid = CrosswordGrid((15, 15))
+    #Overlapping slots, a slot ending in a black square inside another one, a slot off the grid
+    #and a single even length that can not be its own symmetric counterpart
+    for entries in ([(5, 3, 0, 'across'), (5, 3, 2, 'across')], [(7, 3, 0, 'across'), (3, 0, 4, 'down')],
+                    [(16, 0, 0, 'across')], [14]):
+        assert not grid.generate_themed_black_squares(entries, max_iterations=5)
+        assert grid.theme_slots == [] and not grid.fixed_white_squares and not grid.fixed_black_squares
+        assert black_squares(grid) == 0
@@ -0,0 +1,73 @@
+import random
+
+import GridFill
+from CrossBuild import CrosswordGrid, profiler
+from ClueDatabase import WordList
+
+
+"""Tests for the fill prescreen and fill search of GridFill."""
+
+
+#BAT/ORE/WED across crosses BOW/ARE/TED down
+WORDS = ["ARE", "BAT", "BOW", "ORE", "TED", "WED", "DOG", "EAR"]
+
+
+def word_list(tmp_path, words=WORDS):
+    path = tmp_path / "WordList.txt"
+    path.write_text("\n".join(sorted(words)) + "\n")
+    return WordList(str(path))
+
+
+def grid_of(rows):
+    return CrosswordGrid.from_dict({"size": [len(rows), len(rows[0])], "grid": rows})
+
+
+def test_prescreen_accepts_fillable_grid(tmp_path):
+    result = GridFill.prescreen(grid_of(["   ", "   ", "   "]), word_list(tmp_path))
+    assert result["fillable"] and result["reason"] is None
+    assert 0 <= result["difficulty"] <= 1
+    assert result["min_candidates"] >= 1
+
+    result = GridFill.prescreen(grid_of(["B  ", "   ", "   "]), word_list(tmp_path))
+    assert result["fillable"]
+    assert result["min_candidates"] <= 2 and result["tightest_slot"] in ("1A", "1D")
+
+
+def test_prescreen_rejects_supply_shortfall(tmp_path):
+    result = GridFill.prescreen(grid_of(["   ", "   ", "   "]), word_list(tmp_path, WORDS[:4]))
+    assert not result["fillable"]
+    assert result["reason"] == "6 slots of length 3 but 4 words"
+
+
+def test_prescreen_rejects_impossible_crossing(tmp_path):
+    #No word starts with Q, so neither slot through the corner has a candidate
+    result = GridFill.prescreen(grid_of(["Q  ", "   ", "   "]), word_list(tmp_path))
+    assert not result["fillable"]
+    assert result["reason"] in ("no words left for 1A", "no words left for 1D")
+
+
+def test_prescreen_max_difficulty(tmp_path):
+    grid = grid_of(["B  ", "   ", "   "])
+    result = GridFill.prescreen(grid, word_list(tmp_path), max_difficulty=0.1)
+    assert not result["fillable"] and result["reason"].startswith("difficulty")
+    assert grid.prescreen(word_list(tmp_path))["fillable"]
+
+
+def test_fill_grid(tmp_path):
+    grid = grid_of(["B  ", "   ", "   "])
+    assert GridFill.fill_grid(grid, word_list(tmp_path), rng=random.Random(1))
+    assert [''.join(row) for row in grid.grid] in (["BAT", "ORE", "WED"], ["BOW", "ARE", "TED"])
+    assert not GridFill.fill_grid(grid_of(["Q  ", "   ", "   "]), word_list(tmp_path))
+
+
+def test_generation_gives_up_when_nothing_passes_the_prescreen(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiler, "count_restarts", True)
+    monkeypatch.setattr(profiler, "restarts", {})
+    random.seed(0)
+    grid = CrosswordGrid((15, 15))
+    grid.enable_fill_prescreen(word_list(tmp_path))
+    assert not grid.generate_black_squares(max_iterations=40)
+    assert sum(profiler.restarts.values()) == 40 and profiler.restarts.get("fill_prescreen", 0) >= 1
+
+    grid.enable_fill_prescreen(None)
+    assert grid.generate_black_squares()
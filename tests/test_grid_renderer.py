@@ -0,0 +1,80 @@
+import os
+import zlib
+import struct
+import xml.etree.ElementTree as ElementTree
+
+import GridRenderer
+from CrossBuild import CrosswordGrid, CrosswordPuzzle
+
+
+ROWS = ["CAT#", "ORE#", "#ATE", "#PEN"]
+
+
+def read_png(data):
+    """Returns (width, height, pixel rows) of an 8 bit grayscale PNG, checking every chunk's CRC."""
+    assert data[:8] == b"\x89PNG\r\n\x1a\n"
+    chunks = []
+    position = 8
+    while position < len(data):
+        length, tag = struct.unpack(">I4s", data[position:position + 8])
+        body = data[position + 8:position + 8 + length]
+        crc, = struct.unpack(">I", data[position + 8 + length:position + 12 + length])
+        assert crc == zlib.crc32(tag + body) & 0xFFFFFFFF
+        chunks.append((tag, body))
+        position += 12 + length
+
+    assert [tag for tag, _ in chunks] == [b"IHDR", b"IDAT", b"IEND"]
+    width, height, depth, color_type = struct.unpack(">IIBB", chunks[0][1][:10])
+    assert (depth, color_type) == (8, 0)
+    raw = zlib.decompress(chunks[1][1])
+    assert len(raw) == height * (width + 1)
+    return width, height, [raw[row * (width + 1) + 1:(row + 1) * (width + 1)] for row in range(height)]
+
+
+def test_render_png_size(tmp_path):
+    grid = CrosswordGrid.from_rows(ROWS)
+    filename = str(tmp_path / "grid.png")
+    data = GridRenderer.render_png(grid, filename, cell_size=20, margin=5)
+    with open(filename, "rb") as file:
+        assert file.read() == data
+
+    width, height, pixels = read_png(data)
+    assert (width, height) == (4 * 20 + 2 * 5 + 1, 4 * 20 + 2 * 5 + 1)
+    #Margin is white, the middle of a black square is black and of a white square is white
+    assert pixels[0][0] == 255
+    assert pixels[5 + 10][5 + 3 * 20 + 10] == 0
+    assert pixels[5 + 2 * 20 + 10][5 + 10] == 0
+    assert pixels[5 + 3 * 20 + 10][5 + 3 * 20 + 18] == 255
+
+
+def test_render_png_puzzle_has_clue_panel():
+    grid = CrosswordGrid.from_rows(ROWS)
+    width, height, _ = read_png(GridRenderer.render_png(grid, cell_size=20, margin=5))
+    puzzle_width, puzzle_height, _ = read_png(GridRenderer.render_png(CrosswordPuzzle(grid), cell_size=20, margin=5))
+    assert puzzle_width > width and puzzle_height >= height
+    assert read_png(GridRenderer.render_png(grid, cell_size=20, margin=5, clues=True))[:2] == (puzzle_width, puzzle_height)
+
+
+def test_render_svg(tmp_path):
+    grid = CrosswordGrid.from_rows(ROWS)
+    filename = str(tmp_path / "grid.svg")
+    svg = GridRenderer.render_svg(grid, filename, cell_size=20, margin=5)
+    with open(filename, encoding="utf-8") as file:
+        assert file.read() == svg
+
+    root = ElementTree.fromstring(svg)
+    assert (root.get("width"), root.get("height")) == ("90", "90")
+    squares = root.findall("{http://www.w3.org/2000/svg}rect")[1:]
+    assert len(squares) == 16
+    assert [square.get("fill") for square in squares].count("black") == 4
+    texts = [text.text for text in root.findall("{http://www.w3.org/2000/svg}text")]
+    assert "".join(text for text in texts if text.isalpha()) == "".join(ROWS).replace("#", "")
+
+
+def test_render_batch(tmp_path):
+    grids = [CrosswordGrid.from_rows(ROWS), CrosswordPuzzle(CrosswordGrid.from_rows(ROWS))]
+    filenames = GridRenderer.render_batch(grids, str(tmp_path / "out"), processes=1, cell_size=16)
+    assert [os.path.basename(filename) for filename in filenames] == ["000000.png", "000001.png"]
+    for filename in filenames:
+        with open(filename, "rb") as file:
+            read_png(file.read())
@@ -0,0 +1,109 @@
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import GridScoring
+from CrossBuild import CrosswordGrid
+
+
+"""Tests for GridScoring. grid_metrics() is compared with plain Python counts on generated
+grids and on random grids, which have many more black islands and cheater squares."""
+
+
+SIZE = (15, 15)
+
+
+def slots(rows):
+    """Returns the lengths of the across and down runs of at least two white squares."""
+    lengths = []
+    for lines in (rows, ["".join(column) for column in zip(*rows)]):
+        for line in lines:
+            lengths += [len(run) for run in line.split('#') if len(run) >= 2]
+    return lengths
+
+
+def black(rows, row, col):
+    return not (0 <= row < len(rows) and 0 <= col < len(rows[0])) or rows[row][col] == '#'
+
+
+def islands(rows):
+    """Returns the sizes of the black square islands, found by flood fill."""
+    seen = set()
+    sizes = []
+    for row in range(len(rows)):
+        for col in range(len(rows[0])):
+            if rows[row][col] != '#' or (row, col) in seen:
+                continue
+            seen.add((row, col))
+            queue = [(row, col)]
+            for current in queue:
+                for d_row, d_col in ((0, 1), (1, 0), (0, -1), (-1, 0)):
+                    square = (current[0] + d_row, current[1] + d_col)
+                    if (0 <= square[0] < len(rows) and 0 <= square[1] < len(rows[0])
+                            and rows[square[0]][square[1]] == '#' and square not in seen):
+                        seen.add(square)
+                        queue.append(square)
+            sizes.append(len(queue))
+    return sizes
+
+
+def plain_metrics(rows, long_length=7):
+    lengths = slots(rows)
+    sizes = islands(rows)
+    cells = [(row, col) for row in range(len(rows)) for col in range(len(rows[0]))]
+    return {"words": len(lengths),
+            "three_letter_words": lengths.count(3),
+            "long_slots": sum(length >= long_length for length in lengths),
+            "black_squares": sum(row.count('#') for row in rows),
+            "cheater_squares": sum(rows[row][col] == '#'
+                                   and black(rows, row, col - 1) != black(rows, row, col + 1)
+                                   and black(rows, row - 1, col) != black(rows, row + 1, col)
+                                   for row, col in cells),
+            "black_islands": len(sizes),
+            "max_black_island": max(sizes, default=0),
+            "open_area": sum(all(rows[row + i][col + j] != '#' for i in range(3) for j in range(3))
+                             for row, col in cells if row + 3 <= len(rows) and col + 3 <= len(rows[0]))}
+
+
+@pytest.fixture(scope="module")
+def grids():
+    random.seed(0)
+    rows = []
+    for _ in range(3):
+        grid = CrosswordGrid(SIZE)
+        assert grid.generate_black_squares()
+        rows.append(["".join(row) for row in grid.grid])
+    random_generator = random.Random(1)
+    for p in (0.0, 0.2, 0.4, 0.6, 1.0):
+        rows.append(["".join('#' if random_generator.random() < p else ' ' for _ in range(SIZE[1]))
+                     for _ in range(SIZE[0])])
+    return rows
+
+
+def test_grid_metrics_match_plain_counts(grids):
+    metrics = GridScoring.grid_metrics(GridScoring.grids_to_array(grids))
+    for index, rows in enumerate(grids):
+        for name, expected in plain_metrics(rows).items():
+            assert metrics[name][index] == expected, (name, rows)
+
+
+def test_black_island_labels(grids):
+    black = GridScoring.grids_to_array(grids)
+    labels = GridScoring.black_island_labels(black)
+    assert (labels[~black] == -1).all()
+    for index, rows in enumerate(grids):
+        island_labels, sizes = np.unique(labels[index][black[index]], return_counts=True)
+        assert sorted(sizes.tolist()) == sorted(islands(rows))
+        #Each island is labelled with the flat index of its first square in the stack
+        for label in island_labels:
+            assert np.flatnonzero(labels == label).min() == label
+
+
+def test_rank_grids():
+    rows = [["   ", "   ", "   "], ["#  ", "   ", "  #"], ["# #", "   ", "# #"]]
+    black = GridScoring.grids_to_array(rows)
+    scores = GridScoring.score_grids(black, weights={"black_squares": -1.0})
+    assert scores.tolist() == [0.0, -2.0, -4.0]
+    assert GridScoring.rank_grids(black, weights={"black_squares": 1.0}, top_k=2).tolist() == [2, 1]
@@ -0,0 +1,121 @@
+import json
+import asyncio
+
+import pytest
+
+from GridServer import GridServer
+
+
+"""Tests for GridServer against a real server on a local port with one worker process."""
+
+
+def run(test, **kwargs):
+    """Runs the coroutine function test(server, port) against a started GridServer."""
+    async def main():
+        server = GridServer(workers=1, **kwargs)
+        listener = await server.start(port=0)
+        try:
+            await test(server, listener.sockets[0].getsockname()[1])
+        finally:
+            await server.close()
+    asyncio.run(main())
+
+
+async def get(port, path, half_close=False):
+    """Returns (status, headers, body) of a GET request, with the chunked body decoded."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode("latin-1"))
+    if half_close:
+        writer.write_eof()
+    data = await reader.read()
+    writer.close()
+
+    head, _, body = data.partition(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    headers = dict(line.split(": ", 1) for line in lines[1:])
+    if headers.get("Transfer-Encoding") == "chunked":
+        chunks = b""
+        while True:
+            length, _, body = body.partition(b"\r\n")
+            length = int(length, 16)
+            if not length:
+                break
+            chunks += body[:length]
+            body = body[length + 2:]
+        body = chunks
+    return int(lines[0].split()[1]), headers, body.decode("utf-8")
+
+
+async def wait_for(condition, timeout=30):
+    for _ in range(int(timeout / 0.05)):
+        if condition():
+            return True
+        await asyncio.sleep(0.05)
+    return False
+
+
+def test_generate_streams_json():
+    async def test(server, port):
+        status, headers, body = await get(port, "/generate?size=13x13&count=2", half_close=True)
+        assert status == 200 and headers["Transfer-Encoding"] == "chunked"
+        result = json.loads(body)
+        assert result["size"] == [13, 13]
+        assert len(result["grids"]) == 2
+        assert all(len(grid["grid"]) == 13 and grid["size"] == [13, 13] for grid in result["grids"])
+
+        stats = json.loads((await get(port, "/stats"))[2])
+        assert stats["requests"] == 1 and stats["grids_generated"] >= 2
+        assert stats["queued_grids"] == {}
+        assert stats["cancelled"] == 0
+    run(test, buffered_sizes=(), keepalive_interval=0.05)
+
+
+def test_concurrent_requests_share_a_batch():
+    async def test(server, port):
+        responses = await asyncio.gather(get(port, "/generate?size=13x13"), get(port, "/generate?size=13"))
+        assert [len(json.loads(body)["grids"]) for _, _, body in responses] == [1, 1]
+        assert server.batches == 1
+        assert server.grids_generated == 2
+    run(test, buffered_sizes=(), batch_window=0.25)
+
+
+def test_buffered_grids_are_served_first():
+    async def test(server, port):
+        assert await wait_for(lambda: len(server.buffers[(13, 13)]) == 2)
+        status, _, body = await get(port, "/generate?size=13x13&count=2")
+        assert status == 200 and len(json.loads(body)["grids"]) == 2
+        assert server.grids_from_buffer == 2
+    run(test, buffered_sizes=((13, 13),), buffer_size=2)
+
+
+def test_disconnect_cancels_request():
+    async def test(server, port):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"GET /generate?size=21x21&count=100 HTTP/1.1\r\n\r\n")
+        await writer.drain()
+        await reader.readuntil(b"\r\n\r\n")
+        writer.close()
+
+        assert await wait_for(lambda: server.cancelled == 1)
+        assert server.stats()["queued_grids"] == {}
+        assert server.latency_count == 0
+    #The job timeout makes the worker drop the abandoned grids so the server can shut down
+    run(test, buffered_sizes=(), keepalive_interval=0.05, job_timeout=1.0)
+
+
+@pytest.mark.parametrize("query", ["size=9x9", "size=axb", "size=30x30", "count=0", "count=101", "count=two"])
+def test_bad_requests(query):
+    async def test(server, port):
+        status, _, body = await get(port, "/generate?" + query)
+        assert status == 400 and "error" in json.loads(body)
+        assert server.errors == 1 and server.requests == 0
+    run(test, buffered_sizes=())
+
+
+def test_other_routes():
+    async def test(server, port):
+        assert (await get(port, "/missing"))[0] == 404
+        status, headers, body = await get(port, "/metrics")
+        assert status == 200 and headers["Content-Type"].startswith("text/plain")
+        assert "crossbuild_server_requests_total 0" in body
+    run(test, buffered_sizes=())
@@ -0,0 +1,91 @@
+from multiprocessing import Manager
+
+from PatternCache import PatternCache
+from ClueDatabase import WordList
+
+
+SCORED_WORDS = ["ABLE;50", "ACHE;20", "ACME;60", "BEAR;40", "BEAN;70", "CARE;30", "CART;55"]
+
+
+def scored_list(tmp_path, cache):
+    path = tmp_path / "WordList.txt"
+    path.write_text("\n".join(SCORED_WORDS) + "\n")
+    return WordList(str(path), cache=cache)
+
+
+def test_score_cutoff_changes_results(tmp_path):
+    cache = PatternCache()
+    words = scored_list(tmp_path, cache)
+    assert words.get_words_matching_pattern("A???") == ["ABLE", "ACHE", "ACME"]
+    assert words.count_words_matching_pattern("?EA?") == 2
+
+    words.set_score_cutoff(50)
+    assert words.get_words_matching_pattern("A???") == ["ABLE", "ACME"]
+    assert words.count_words_matching_pattern("?EA?") == 1
+
+    words.set_score_cutoff(None)
+    assert words.get_words_matching_pattern("A???") == ["ABLE", "ACHE", "ACME"]
+    assert words.get_words_matching_pattern("C*") == ["CARE", "CART"]
+
+
+def test_hit_and_miss_counts(tmp_path):
+    cache = PatternCache()
+    words = scored_list(tmp_path, cache)
+    words.get_words_matching_pattern("A???")
+    words.get_words_matching_pattern("A???")
+    words.count_words_matching_pattern("A???")
+    words.count_words_matching_pattern("A???")
+    words.get_words_matching_pattern("B???")
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["shared_hits"], stats["misses"]) == (2, 0, 3)
+    assert stats["hit_rate"] == 2 / 5
+    assert stats["entries"] == 3
+    #Three words and two words take one slot more than their length, a count takes one
+    assert stats["size"] == 4 + 1 + 3
+
+    cache.clear()
+    assert cache.stats() == {"hits": 0, "shared_hits": 0, "misses": 0, "hit_rate": 0.0, "entries": 0, "size": 0}
+
+
+def test_lru_eviction_respects_max_size():
+    cache = PatternCache(max_size=6)
+    cache.get_or_compute("a", lambda: ("A", "B"))
+    cache.get_or_compute("b", lambda: ("C",))
+    cache.get_or_compute("c", lambda: 1)
+    assert cache.size == 6
+
+    #Using "a" makes "b" the least recently used entry
+    cache.get_or_compute("a", lambda: None)
+    cache.get_or_compute("d", lambda: 2)
+    assert list(cache.entries) == ["c", "a", "d"]
+    assert cache.size == 5 <= cache.max_size
+
+    #Entries larger than the whole cache are returned but not kept
+    assert cache.get_or_compute("e", lambda: tuple("ABCDEFG")) == tuple("ABCDEFG")
+    assert "e" not in cache.entries and cache.size <= cache.max_size
+
+
+def test_shared_store_serves_another_cache(tmp_path):
+    with Manager() as manager:
+        shared = manager.dict()
+        first = PatternCache(shared=shared)
+        second = PatternCache(shared=shared)
+        computed = []
+
+        def compute():
+            computed.append(True)
+            return ("ABLE", "ACHE")
+
+        assert first.get_or_compute("A???", compute) == ("ABLE", "ACHE")
+        assert second.get_or_compute("A???", compute) == ("ABLE", "ACHE")
+        assert len(computed) == 1
+        assert second.stats()["shared_hits"] == 1 and first.stats()["misses"] == 1
+
+        #Invalidation only frees local entries
+        words = scored_list(tmp_path, second)
+        words.get_words_matching_pattern("A???")
+        assert len(shared) == 2
+        words.set_score_cutoff(50)
+        assert len(shared) == 2
+        assert words.get_words_matching_pattern("A???") == ["ABLE", "ACME"]
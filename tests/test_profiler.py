@@ -0,0 +1,95 @@
+import re
+import random
+
+import CrossBuild
+from Profiler import Profiler
+
+
+class Counter():
+    def add(self, a, b):
+        return a + b
+
+    def fail(self):
+        raise ValueError("fail")
+
+
+SAMPLE = re.compile(r'[a-z_]+\{[a-z]+="[^"]*"\} \d+(\.\d+)?')
+
+
+def test_enable_and_disable_restore_originals():
+    profiler = Profiler()
+    add, fail = Counter.add, Counter.fail
+    profiler.instrument(Counter, ["add", "fail"])
+    #Nothing is wrapped while disabled
+    assert Counter.add is add and Counter.fail is fail
+
+    profiler.enable()
+    profiler.enable()
+    assert Counter.add is not add and Counter.add.__name__ == "add"
+    assert Counter().add(1, 2) == 3
+    try:
+        Counter().fail()
+    except ValueError:
+        pass
+    profiler.disable()
+    assert Counter.add is add and Counter.fail is fail
+
+    #Calls while disabled are not counted, stats are kept until reset()
+    Counter().add(1, 2)
+    stats = profiler.stats()
+    assert stats["calls"] == {"Counter.add": 1, "Counter.fail": 1}
+    assert all(seconds >= 0 for seconds in stats["time"].values())
+    profiler.reset()
+    assert profiler.stats()["calls"] == {"Counter.add": 0, "Counter.fail": 0}
+
+
+def test_methods_instrumented_while_enabled_are_wrapped():
+    profiler = Profiler()
+    add = Counter.add
+    profiler.enable()
+    profiler.instrument(Counter, ["add"])
+    Counter().add(1, 2)
+    profiler.disable()
+    assert Counter.add is add
+    assert profiler.stats()["calls"] == {"Counter.add": 1}
+
+
+def test_generation_restarts_are_counted():
+    profiler = CrossBuild.profiler
+    profiler.reset()
+    random.seed(0)
+    grid = CrossBuild.CrosswordGrid((15, 15))
+
+    #Neither enabled nor counting restarts, nothing is recorded
+    assert grid.generate_black_squares(iterations_per_try=1, max_iterations=3) is False
+    assert profiler.stats()["restarts"] == {}
+
+    profiler.count_restarts = True
+    try:
+        assert grid.generate_black_squares(iterations_per_try=1, max_iterations=3) is False
+    finally:
+        profiler.count_restarts = False
+    assert sum(profiler.stats()["restarts"].values()) == 3
+    #count_restarts does not wrap the instrumented methods
+    assert profiler.stats()["calls"].get("CrosswordGrid.connected", 0) == 0
+    profiler.reset()
+
+
+def test_prometheus_format():
+    profiler = Profiler()
+    profiler.instrument(Counter, ["add"])
+    profiler.enable()
+    Counter().add(1, 2)
+    profiler.disable()
+    profiler.count_restart("iterations_per_try")
+    profiler.count_restart("iterations_per_try")
+
+    text = profiler.to_prometheus(prefix="test")
+    assert text.endswith("\n")
+    lines = text.splitlines()
+    for name in ("test_calls_total", "test_seconds_total", "test_restarts_total"):
+        assert f"# TYPE {name} counter" in lines
+        assert any(line.startswith(f"# HELP {name} ") for line in lines)
+    assert 'test_calls_total{method="Counter.add"} 1' in lines
+    assert 'test_restarts_total{reason="iterations_per_try"} 2' in lines
+    assert all(SAMPLE.fullmatch(line) for line in lines if not line.startswith("#"))
@@ -0,0 +1,153 @@
+import os
+import json
+import struct
+
+import pytest
+
+import CrossBuild
+import PuzzleExport
+
+
+"""Tests for PuzzleExport. fixtures/puzzle.puz was written by puzpy (an independent .puz
+implementation) from FIXTURE_ROWS with the clues of fixture_clues() and FIXTURE_METADATA, so
+it is a known-good file to check the checksums and layout of to_puz() and read_puz() against."""
+
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "puzzle.puz")
+
+FIXTURE_ROWS = ["TYPIC#ADAPA#OTO",
+                "AGORA#SAHEB#TIN",
+                "AHEAP#INERUDITE",
+                "SET#IND#MITOSIS",
+                "###AVIE##OID###",
+                "UNGUIS#TAEL#ALP",
+                "ROUT##PECCO#REE",
+                "ASSOCIATEINARTS",
+                "LET#OGLER##KECK",
+                "IDO#NAIL#SNITHY",
+                "###ICS##SKEN###",
+                "FLANEUR#LIE#POI",
+                "ELECTRIFY#DYAKS",
+                "MYO#TICAL#LOURI",
+                "ERN#OCHRY#YUMAS"]
+
+FIXTURE_METADATA = {"title": "CrossBuild test puzzle", "author": "CrossBuild", "copyright": "Public domain"}
+
+
+def fixture_clues(grid):
+    """Returns the fixture's clue text for each word in clue order, some with a latin-1 letter."""
+    return [f"{'Café' if number % 7 == 0 else 'Clue'} {number} {direction}"
+            for number, direction, _ in PuzzleExport.numbered_clues(grid)]
+
+
+def clued_grid(rows):
+    """Returns a grid of the given rows with the fixture's clues."""
+    grid = CrossBuild.CrosswordGrid.from_rows(rows)
+    for (_, _, word), clue in zip(PuzzleExport.numbered_clues(grid), fixture_clues(grid)):
+        word.clue = clue
+    return grid
+
+
+def rows_of(grid):
+    return [''.join(row) for row in grid.grid]
+
+
+def clues_of(grid):
+    return [(number, direction, word.clue) for number, direction, word in PuzzleExport.numbered_clues(grid)]
+
+
+@pytest.fixture
+def fixture_data():
+    with open(FIXTURE, "rb") as file:
+        return file.read()
+
+
+def test_read_puz_fixture(fixture_data):
+    grid = PuzzleExport.read_puz(fixture_data)
+    assert rows_of(grid) == FIXTURE_ROWS
+    assert [clue for _, _, clue in clues_of(grid)] == fixture_clues(grid)
+
+
+def test_to_puz_matches_fixture(fixture_data):
+    assert PuzzleExport.to_puz(clued_grid(FIXTURE_ROWS), **FIXTURE_METADATA) == fixture_data
+
+
+def test_puz_checksums_match_fixture(fixture_data):
+    data = PuzzleExport.to_puz(clued_grid(FIXTURE_ROWS), **FIXTURE_METADATA)
+    #Global checksum, CIB checksum and the masked checksums
+    assert data[0x00:0x02] == fixture_data[0x00:0x02]
+    assert data[0x0E:0x20] == fixture_data[0x0E:0x20]
+    assert struct.unpack_from("<H", data, 0x0E)[0] == PuzzleExport.puz_checksum(data[0x2C:0x34])
+
+
+def test_read_puz_rejects_bad_checksum(fixture_data):
+    solution_start = PuzzleExport.PUZ_HEADER.size
+    corrupted = bytearray(fixture_data)
+    corrupted[solution_start] = ord('X')
+    with pytest.raises(ValueError):
+        PuzzleExport.read_puz(bytes(corrupted))
+    assert rows_of(PuzzleExport.read_puz(bytes(corrupted), verify=False))[0].startswith("X")
+
+
+def test_read_puz_rejects_other_files():
+    with pytest.raises(ValueError):
+        PuzzleExport.read_puz(b"not a puzzle")
+    with pytest.raises(ValueError):
+        PuzzleExport.read_puz(b"\0" * PuzzleExport.PUZ_HEADER.size)
+
+
+def test_puz_round_trip_with_blank_squares():
+    rows = [row[:7] + ''.join('#' if cell == '#' else ' ' for cell in row[7:]) for row in FIXTURE_ROWS]
+    grid = clued_grid(rows)
+    read = PuzzleExport.read_puz(PuzzleExport.to_puz(grid, **FIXTURE_METADATA))
+    assert rows_of(read) == rows
+    assert clues_of(read) == clues_of(grid)
+
+
+def test_ipuz_round_trip():
+    grid = clued_grid(FIXTURE_ROWS)
+    ipuz = PuzzleExport.to_ipuz(grid, **FIXTURE_METADATA)
+    assert ipuz["dimensions"] == {"width": 15, "height": 15}
+    assert ipuz["title"] == FIXTURE_METADATA["title"]
+    assert ipuz["puzzle"][0][:6] == [1, 2, 3, 4, 5, "#"]
+
+    read = PuzzleExport.read_ipuz(json.dumps(ipuz))
+    assert rows_of(read) == FIXTURE_ROWS
+    assert clues_of(read) == clues_of(grid)
+
+
+def test_ipuz_round_trip_with_blank_squares():
+    rows = [row.replace('E', ' ') for row in FIXTURE_ROWS]
+    ipuz = PuzzleExport.to_ipuz(clued_grid(rows))
+    assert None in ipuz["solution"][2]
+    assert rows_of(PuzzleExport.read_ipuz(json.dumps(ipuz).encode("utf-8"))) == rows
+
+
+def test_ipuz_to_puz_matches_fixture(fixture_data):
+    grid = PuzzleExport.read_ipuz(PuzzleExport.to_ipuz(PuzzleExport.read_puz(fixture_data)))
+    assert PuzzleExport.to_puz(grid, **FIXTURE_METADATA) == fixture_data
+
+
+@pytest.mark.parametrize("format", ["puz", "ipuz"])
+@pytest.mark.parametrize("container", ["puzzles.zip", "puzzles"])
+def test_writer_round_trip(tmp_path, format, container):
+    grids = [clued_grid(FIXTURE_ROWS), clued_grid([row[::-1] for row in FIXTURE_ROWS])]
+    path = str(tmp_path / container)
+    assert PuzzleExport.export_puzzles(grids, path, format, **FIXTURE_METADATA) == 2
+
+    read = list(PuzzleExport.read_puzzles(path))
+    assert [name for name, _ in read] == [f"000000.{format}", f"000001.{format}"]
+    for grid, (_, read_grid) in zip(grids, read):
+        assert rows_of(read_grid) == rows_of(grid)
+        assert clues_of(read_grid) == clues_of(grid)
+
+
+def test_unclued_words_get_empty_clues():
+    grid = CrossBuild.CrosswordGrid.from_rows(FIXTURE_ROWS)
+    words = list(grid.across_words.values()) + list(grid.down_words.values())
+    assert all(word.clue == CrossBuild.PLACEHOLDER_CLUE for word in words)
+
+    ipuz = PuzzleExport.to_ipuz(grid)
+    assert {clue for _, clue in ipuz["clues"]["Across"] + ipuz["clues"]["Down"]} == {""}
+    read = PuzzleExport.read_puz(PuzzleExport.to_puz(grid))
+    assert {clue for _, _, clue in clues_of(read)} == {""}
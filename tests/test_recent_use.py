@@ -0,0 +1,90 @@
+import pytest
+
+import RecentUse
+from CrossBuild import CrosswordGrid
+from RecentUse import RecentUseFilter
+
+
+class Clock():
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(RecentUse.time, "time", clock.time)
+    return clock
+
+
+def puzzle(answer="OPERA", clue=None):
+    grid = CrosswordGrid.from_rows([answer + "#"])
+    if clue is not None:
+        grid.across_words["1A"].clue = clue
+    return grid
+
+
+def test_counts_answers_and_clues():
+    recent = RecentUseFilter(capacity=1000)
+    recent.record_puzzle(puzzle(clue="Grand work"))
+    recent.record_puzzle(puzzle())
+
+    assert recent.answer_count("OPERA") == 2
+    assert recent.clue_count("Grand work") == 1
+    assert recent.answer_count("ARIA") == 0
+    assert "A:OPERA" in recent and "A:ARIA" not in recent
+    #Placeholder clues are not recorded
+    assert recent.clue_count("TEST") == 0
+
+
+def test_puzzle_windows_rotate():
+    recent = RecentUseFilter(capacity=1000, windows=2, window_puzzles=2)
+    recent.record_puzzle(puzzle("OPERA"))
+    recent.record_puzzle(puzzle("OPERA"))
+    recent.record_puzzle(puzzle("ARIAS"))
+    recent.record_puzzle(puzzle("ARIAS"))
+    assert recent.answer_count("OPERA") == 2
+
+    recent.record_puzzle(puzzle("SOLOS"))
+    assert recent.answer_count("OPERA") == 0
+    assert recent.answer_count("ARIAS") == 2
+
+
+def test_time_windows_expire(clock):
+    recent = RecentUseFilter(capacity=1000, windows=4, window_seconds=10)
+    recent.record_puzzle(puzzle("OPERA"))
+
+    clock.now += 25
+    assert recent.answer_count("OPERA") == 1
+    recent.record_puzzle(puzzle("ARIAS"))
+    clock.now += 10
+    assert recent.answer_count("OPERA") == 1 and recent.answer_count("ARIAS") == 1
+
+    #Four windows of ten seconds after the use it is forgotten, however long the gap
+    clock.now += 10
+    assert recent.answer_count("OPERA") == 0
+    assert recent.answer_count("ARIAS") == 1
+    clock.now += 1000
+    assert recent.answer_count("ARIAS") == 0
+    recent.record_puzzle(puzzle("SOLOS"))
+    assert recent.answer_count("SOLOS") == 1
+
+
+def test_save_and_load(tmp_path, clock):
+    filename = str(tmp_path / "recent.filter")
+    recent = RecentUseFilter(capacity=1000, windows=3, window_puzzles=5, window_seconds=60)
+    recent.record_puzzle(puzzle(clue="Grand work"))
+    recent.save(filename)
+
+    loaded = RecentUseFilter.load(filename)
+    assert loaded.answer_count("OPERA") == 1 and loaded.clue_count("Grand work") == 1
+    assert (loaded.size, loaded.hash_count, loaded.puzzles_in_window) == (recent.size, recent.hash_count, 1)
+
+    #A filter loaded long after it was saved has forgotten its uses
+    clock.now += 3 * 60
+    assert RecentUseFilter.load(filename).answer_count("OPERA") == 0
+
+    assert RecentUseFilter.load_or_create(str(tmp_path / "missing"), capacity=10).capacity == 10
@@ -0,0 +1,39 @@
+import WordImport
+
+
+def write_lines(path, lines):
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return str(path)
+
+
+def test_negative_scores_are_kept(tmp_path):
+    source = write_lines(tmp_path / "scored.txt", ["zebra;-5", "apple;10", "Apple;20", "pear;-3", "pear;-8"])
+    output = str(tmp_path / "WordList.txt")
+    scored = str(tmp_path / "Scored.txt")
+    count = WordImport.import_word_lists([(source, "scored")], output, scored, min_score=-4, processes=1)
+
+    assert (tmp_path / "Scored.txt").read_text().splitlines() == ["APPLE;20", "PEAR;-3", "ZEBRA;-5"]
+    assert (tmp_path / "WordList.txt").read_text().splitlines() == ["APPLE", "PEAR"]
+    assert count == 2
+
+
+def test_merge_runs_with_bounded_fan_in(tmp_path):
+    runs = [WordImport.write_run([(f"WORD{i % 7:02d}", i), (f"WORD{50 + i:02d}", -i)], str(tmp_path))
+            for i in range(40)]
+    expected = {}
+    for i in range(40):
+        for word, score in ((f"WORD{i % 7:02d}", i), (f"WORD{50 + i:02d}", -i)):
+            expected[word] = max(score, expected.get(word, score))
+
+    merged = list(WordImport.merge_runs(runs, True, str(tmp_path), fan_in=3))
+    assert merged == sorted(expected.items())
+    #Intermediate runs replace the runs they were merged from
+    assert len(list(tmp_path.iterdir())) <= 3
+
+
+def test_import_with_many_runs(tmp_path):
+    words = [f"{chr(65 + i % 26)}{chr(65 + i // 26 % 26)}{chr(65 + i // 676)}X" for i in range(3000)]
+    source = write_lines(tmp_path / "words.txt", reversed(words))
+    output = str(tmp_path / "WordList.txt")
+    assert WordImport.import_word_lists([source], output, chunk_size=10, processes=1) == 3000
+    assert (tmp_path / "WordList.txt").read_text().splitlines() == sorted(words)
@@ -0,0 +1,60 @@
+import pytest
+
+from WordTrie import WordTrie
+from ClueDatabase import WordList
+
+
+"""Tests for WordTrie and the trie backend of WordList, checked against the list backend."""
+
+
+WORDS = ["AREA", "ARENA", "ARE", "ARID", "BEE", "BEEF", "BEEFS", "QUIZ", "STAR", "STARE", "STARS",
+         "TARS", "XYLEM", "ZEBRA", "EAR", "EARS", "OREO", "SERA", "ERA", "AREAS", "ZOO"]
+
+AFFIXES = ["", "A", "AR", "ARE", "AREA", "AREAS", "AREASX", "B", "BEEF", "Q", "QU", "QUIZ", "QUIZZ",
+           "QX", "S", "STAR", "X", "XYL", "XYLEM", "Y", "ZE", "ZO", "ZOO", "RA", "A", "EA", "ARS", "Z",
+           "ZIUQ", "MELYX", "MEL", "ERA", "E", "SS"]
+
+
+@pytest.fixture(params=[True, False], ids=["compact", "lists"])
+def compact(request):
+    return request.param
+
+
+@pytest.fixture
+def word_lists(tmp_path, compact):
+    path = tmp_path / "WordList.txt"
+    path.write_text("\n".join(sorted(WORDS)) + "\n")
+    return WordList(str(path)), WordList(str(path), backend="trie", compact=compact)
+
+
+@pytest.mark.parametrize("affix", AFFIXES)
+def test_prefix_queries_match_list_backend(word_lists, affix):
+    words, trie_words = word_lists
+    assert trie_words.get_words_starting_with(affix) == words.get_words_starting_with(affix)
+
+
+@pytest.mark.parametrize("affix", AFFIXES)
+def test_suffix_queries_match_list_backend(word_lists, affix):
+    words, trie_words = word_lists
+    assert trie_words.get_words_ending_with(affix) == words.get_words_ending_with(affix)
+
+
+@pytest.mark.parametrize("reverse", [False, True])
+def test_count_and_contains(compact, reverse):
+    trie = WordTrie(WORDS, reverse=reverse, compact=compact)
+    assert len(trie) == len(WORDS)
+    for affix in AFFIXES:
+        matches = [word for word in WORDS if (word.endswith(affix) if reverse else word.startswith(affix))]
+        assert trie.count(affix) == len(matches)
+        assert sorted(trie.query(affix)) == sorted(matches)
+        assert (affix in trie) == (affix in WORDS)
+
+
+def test_empty_word_and_empty_trie(compact):
+    trie = WordTrie(["", "A", "AB"], compact=compact)
+    assert "" in trie and "A" in trie and "B" not in trie
+    assert trie.query("") == ["", "A", "AB"]
+    assert trie.count("A") == 2
+
+    empty = WordTrie([], compact=compact)
+    assert empty.query("") == [] and empty.count("A") == 0 and "" not in empty